@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fixtures and options of the benchmark suite.
+
+The benchmarks run on synthetic FITS files made for each combination of
+the following options:
+
+    --bench-shape    the comma separated image shapes, in FITS order
+                     (e.g. "1024x1024,64x256x256"); default: 1024x1024
+    --bench-bitpix   the comma separated BITPIX values; default: 8,16,32,-32,-64
+    --bench-hdus     the number of image HDUs of each file; default: 2
+
+Each benchmark is run --bench-repeat times (default: 3); its best and mean
+wall times and its peak RSS (the peak resident memory above the resident
+memory at the start of the benchmark) are reported at the end of the session.
+
+Results can be saved with --bench-save FILE (JSON) and compared with a
+previous run with --bench-compare FILE: benchmarks slower than
+--bench-tolerance (default: 1.5) times their previous best time fail.
+
+Run with: python -m pytest benchmarks -v
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+DEFAULT_SHAPES = "1024x1024"
+DEFAULT_BITPIX = "8,16,32,-32,-64"
+DEFAULT_NUM_HDUS = 2
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 1.5
+
+# The period (in seconds) of the resident memory sampling
+RSS_SAMPLING_PERIOD = 0.001
+
+BITPIX_TO_DTYPE = {
+        8: np.dtype('uint8'),
+        16: np.dtype('int16'),
+        32: np.dtype('int32'),
+        -32: np.dtype('float32'),
+        -64: np.dtype('float64')
+    }
+
+# The results of the session (see Benchmark)
+RESULTS = []
+
+###############################################################################
+
+def pytest_addoption(parser):
+    group = parser.getgroup("fitsviewer benchmarks")
+    group.addoption("--bench-shape", default=DEFAULT_SHAPES,
+                    help="the comma separated shapes (in FITS order, e.g. 1024x1024 or 64x256x256) "
+                         "of the synthetic images")
+    group.addoption("--bench-bitpix", default=DEFAULT_BITPIX,
+                    help="the comma separated BITPIX values of the synthetic images")
+    group.addoption("--bench-hdus", type=int, default=DEFAULT_NUM_HDUS,
+                    help="the number of image HDUs of the synthetic files")
+    group.addoption("--bench-repeat", type=int, default=DEFAULT_REPEAT,
+                    help="the number of runs of each benchmark")
+    group.addoption("--bench-save", default=None, metavar="FILE",
+                    help="save the results in this JSON file")
+    group.addoption("--bench-compare", default=None, metavar="FILE",
+                    help="fail the benchmarks that are slower than in this JSON file (see --bench-save)")
+    group.addoption("--bench-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="the accepted slowdown factor with --bench-compare")
+
+
+def pytest_generate_tests(metafunc):
+    if "fits_spec" in metafunc.fixturenames:
+        config = metafunc.config
+        num_hdus = config.getoption("--bench-hdus")
+
+        specs = []
+        for shape_str in config.getoption("--bench-shape").split(","):
+            # FITS order (NAXIS1 x NAXIS2 x ...) -> Numpy order
+            shape = tuple(int(dim) for dim in reversed(shape_str.strip().split("x")))
+            for bitpix_str in config.getoption("--bench-bitpix").split(","):
+                specs.append((shape, int(bitpix_str), num_hdus))
+
+        metafunc.parametrize("fits_spec", specs, ids=[get_spec_id(spec) for spec in specs], scope="session")
+
+
+def get_spec_id(fits_spec):
+    shape, bitpix, num_hdus = fits_spec
+    return "{}-bitpix{}-{}hdus".format("x".join(str(dim) for dim in reversed(shape)), bitpix, num_hdus)
+
+
+def make_image(shape, bitpix, seed=0):
+    """
+    Return a noisy image (with a gradient) of the given shape and BITPIX.
+    """
+    rng = np.random.default_rng(seed)
+    dtype = BITPIX_TO_DTYPE[bitpix]
+
+    image_array = rng.normal(loc=100., scale=20., size=shape).astype(np.float32)
+    image_array += np.linspace(0., 50., shape[-1], dtype=np.float32)
+
+    if dtype.kind == 'f':
+        return image_array.astype(dtype)
+
+    info = np.iinfo(dtype)
+    return np.clip(image_array, info.min, info.max).astype(dtype)
+
+
+def make_fits_file(file_path, shape, bitpix, num_hdus):
+    """
+    Write a FITS file with an empty primary HDU and `num_hdus` image HDUs.
+    """
+    hdu_list = fits.HDUList([fits.PrimaryHDU()])
+    for hdu_index in range(num_hdus):
+        hdu_list.append(fits.ImageHDU(make_image(shape, bitpix, seed=hdu_index)))
+    hdu_list.writeto(file_path, overwrite=True)
+
+
+@pytest.fixture(scope="session")
+def fits_file(fits_spec, tmp_path_factory):
+    """The path of the synthetic FITS file of `fits_spec`."""
+    file_path = str(tmp_path_factory.mktemp("fits") / (get_spec_id(fits_spec) + ".fits"))
+    make_fits_file(file_path, *fits_spec)
+    return file_path
+
+
+###############################################################################
+
+def get_rss():
+    """
+    Return the resident memory of this process (in bytes), or None if it
+    can't be read (the peak of the process is used instead).
+    """
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def get_max_rss():
+    """Return the peak resident memory of this process (in bytes)."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class RSSSampler:
+    """
+    Sample the resident memory of this process in a background thread to
+    get its peak during a `with` block.
+    """
+
+    def __init__(self):
+        self.start_rss = None
+        self.peak_rss = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+
+    def _sample(self):
+        while not self._stopped.wait(RSS_SAMPLING_PERIOD):
+            self.peak_rss = max(self.peak_rss, get_rss())
+
+
+    def __enter__(self):
+        self.start_rss = get_rss()
+        if self.start_rss is None:
+            self.start_rss = get_max_rss()
+        else:
+            self.peak_rss = self.start_rss
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        if self._thread is None:
+            self.peak_rss = get_max_rss()
+        else:
+            self._stopped.set()
+            self._thread.join()
+            self.peak_rss = max(self.peak_rss, get_rss())
+
+
+    @property
+    def peak_increase(self):
+        """The peak resident memory above the one at the start (in bytes)."""
+        return max(self.peak_rss - self.start_rss, 0)
+
+
+class Benchmark:
+    """
+    Time a function (see `__call__`) and record the result for the report
+    of the session.
+    """
+
+    def __init__(self, name, repeat, previous_results=None, tolerance=DEFAULT_TOLERANCE):
+        self.name = name
+        self.repeat = repeat
+        self.previous_results = previous_results or {}
+        self.tolerance = tolerance
+
+
+    def __call__(self, func, *args, setup=None, **kwargs):
+        """
+        Call `func(*args, **kwargs)` `repeat` times (`setup` is called before
+        each run and isn't timed) and return the result of the last call.
+        """
+        wall_times = []
+        peak_rss = 0
+        result = None
+
+        for run in range(self.repeat):
+            if setup is not None:
+                setup()
+
+            with RSSSampler() as sampler:
+                start_time = time.perf_counter()
+                result = func(*args, **kwargs)
+                wall_times.append(time.perf_counter() - start_time)
+
+            peak_rss = max(peak_rss, sampler.peak_increase)
+
+        record = {"name": self.name,
+                  "best": min(wall_times),
+                  "mean": sum(wall_times) / len(wall_times),
+                  "peak_rss": peak_rss}
+        RESULTS.append(record)
+
+        previous_record = self.previous_results.get(self.name)
+        if (previous_record is not None) and (record["best"] > previous_record["best"] * self.tolerance):
+            pytest.fail("{} is slower than before: {:.4f} s instead of {:.4f} s".format(self.name,
+                                                                                      record["best"],
+                                                                                      previous_record["best"]))
+
+        return result
+
+
+@pytest.fixture(scope="session")
+def previous_results(pytestconfig):
+    file_path = pytestconfig.getoption("--bench-compare")
+    if file_path is None:
+        return {}
+    with open(file_path) as fd:
+        return {record["name"]: record for record in json.load(fd)}
+
+
+@pytest.fixture
+def bench(request, pytestconfig, previous_results):
+    """The `Benchmark` of the current test."""
+    return Benchmark(request.node.nodeid.split("::")[-1],
+                     pytestconfig.getoption("--bench-repeat"),
+                     previous_results,
+                     pytestconfig.getoption("--bench-tolerance"))
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not RESULTS:
+        return
+
+    terminalreporter.section("benchmarks")
+    name_width = max(len(record["name"]) for record in RESULTS)
+    terminalreporter.write_line("{:<{}}  {:>10}  {:>10}  {:>12}".format("name", name_width, "best (s)", "mean (s)", "peak RSS (MB)"))
+    for record in RESULTS:
+        terminalreporter.write_line("{:<{}}  {:>10.4f}  {:>10.4f}  {:>12.1f}".format(record["name"],
+                                                                                    name_width,
+                                                                                    record["best"],
+                                                                                    record["mean"],
+                                                                                    record["peak_rss"] / 2**20))
+
+    file_path = config.getoption("--bench-save")
+    if file_path is not None:
+        with open(file_path, "w") as fd:
+            json.dump(RESULTS, fd, indent=4)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks of the hot paths of the viewer and of the converters: opening
+files, drawing figures and histograms, converting FITS files to PNG images
+and PNG images to FITS files (see conftest.py for the options).
+
+The benchmarks of the Tk viewer are skipped without a display (run them
+with xvfb-run): its figure is rendered by Agg (TkAgg canvas).  The headless
+rendering engine (fitsviewer-nox) is benchmarked in any case.
+
+Run with: python -m pytest benchmarks/test_hotpaths.py -v
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from fitsviewer.core.hdu import open_fits
+from fitsviewer.core.histogram import compute_histogram
+from fitsviewer.gui import tk_matplotlib
+from fitsviewer.gui.figure import draw_histogram
+from fitsviewer.gui.nox import get_image_hdu, get_render_data, render_figure
+from fitsviewer.utils import fits2png
+from fitsviewer.utils import png2fits
+
+# The maximum time (in seconds) to wait for the background loadings of the
+# viewer
+LOADING_TIMEOUT = 600
+
+###############################################################################
+
+@pytest.fixture
+def gui():
+    """A TkGUI in a withdrawn Tk window."""
+    try:
+        root = tk_matplotlib.tk.Tk()
+    except tk_matplotlib.tk.TclError as e:
+        pytest.skip("no display: {}".format(e))
+
+    root.withdraw()
+    gui = tk_matplotlib.TkGUI(root)
+    gui.preview_cache = None      # Always measure the cold path
+
+    yield gui
+
+    gui.loader.shutdown()
+    root.destroy()
+
+
+def wait_loading(gui):
+    """Process the Tk events until the background loadings of `gui` are done."""
+    start_time = time.time()
+    while gui.loader.is_busy(ignored_channels=(tk_matplotlib.PREFETCH_CHANNEL,)):
+        if time.time() - start_time > LOADING_TIMEOUT:
+            raise Exception("Loading timeout.")
+        gui.root.update()
+        time.sleep(0.001)
+    gui.root.update()
+
+
+def open_and_draw(gui, file_path):
+    """Open `file_path` in `gui` and wait until its first image is drawn."""
+    gui.open_fits_file(file_path)
+    wait_loading(gui)
+    gui.select_hdu(1)
+    wait_loading(gui)
+
+
+###############################################################################
+
+# TkGUI #######################################################################
+
+def test_open_fits_file(bench, gui, fits_file):
+    def close_fits_file():
+        if gui.hdu_list is not None:
+            gui.close_fits_file()
+
+    bench(open_and_draw, gui, fits_file, setup=close_fits_file)
+
+
+def test_update_hdu_menu(bench, gui, fits_file):
+    open_and_draw(gui, fits_file)
+    bench(gui.update_hdu_menu)
+
+
+def test_draw_figure(bench, gui, fits_file):
+    open_and_draw(gui, fits_file)
+
+    def draw_figure():
+        gui.draw_figure()
+        wait_loading(gui)
+
+    # The render cache is emptied before each run (cold drawing, the figure
+    # is rendered by Agg)
+    bench(draw_figure, setup=gui.clear_render_cache)
+
+
+# Headless rendering engine (Agg) #############################################
+
+def load_render_data(file_path):
+    hdu_list = open_fits(file_path)
+    hdu_index, hdu = get_image_hdu(hdu_list)
+    return hdu_list, hdu, get_render_data(hdu)
+
+
+def test_render_figure_nox(bench, fits_file):
+    def draw_figure():
+        hdu_list, hdu, render_data = load_render_data(fits_file)
+        try:
+            fig = render_figure(hdu, render_data, show_histogram=True)
+            fig.canvas.draw()
+        finally:
+            hdu_list.close()
+
+    bench(draw_figure)
+
+
+def test_draw_histogram(bench, fits_file):
+    hdu_list, hdu, render_data = load_render_data(fits_file)
+
+    def draw_histogram_figure():
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        draw_histogram(fig.add_subplot(111), *compute_histogram(render_data.image_array, 512))
+        fig.canvas.draw()
+
+    try:
+        bench(draw_histogram_figure)
+    finally:
+        hdu_list.close()
+
+
+# Converters ##################################################################
+
+def test_fits2png(bench, fits_file, tmp_path):
+    def convert():
+        num_images = 0
+        for hdu_index, plane_index, image_array in fits2png.load_fits_file(fits_file):
+            fits2png.save_to_png(image_array, str(tmp_path / "{}.png".format(num_images)))
+            num_images += 1
+        return num_images
+
+    assert bench(convert) > 0
+
+
+def test_png2fits_save_fits_file(bench, fits_spec, tmp_path):
+    shape, bitpix, num_hdus = fits_spec
+    image_array = (np.random.default_rng(0).random(shape[-2:]) * 255).astype(np.uint8)
+    bench(png2fits.save_fits_file, image_array, str(tmp_path / "image.fits"))
+
+
+def test_png2fits_16bit(bench, fits_spec, tmp_path):
+    shape, bitpix, num_hdus = fits_spec
+    input_file_path = str(tmp_path / "image.png")
+    output_file_path = str(tmp_path / "image.fits")
+    image_array = np.random.default_rng(0).random(shape[-2:]).astype(np.float32)
+    fits2png.save_to_png(image_array, input_file_path, 0., 1., bit_depth=16)
+
+    bench(lambda: png2fits.save_fits_file(png2fits.load_image(input_file_path), output_file_path))
+
+    with open_fits(output_file_path) as hdu_list:
+        assert hdu_list[0].header["BITPIX"] == 16
+        assert hdu_list[0].data.dtype == np.uint16
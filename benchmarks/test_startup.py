@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup time benchmarks: fail if the cold start of the viewer or of the
+command line tools regresses.
+
+Each measure is made in a new Python interpreter (the best of
+STARTUP_NUM_RUNS runs).  Budgets are in seconds; they can be scaled with
+the FITSVIEWER_STARTUP_BUDGET_SCALE environment variable on slow machines.
+
+Run with: python -m pytest benchmarks/test_startup.py -v
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+STARTUP_NUM_RUNS = 5
+
+BUDGET_SCALE = float(os.environ.get("FITSVIEWER_STARTUP_BUDGET_SCALE", "1"))
+
+# Time budgets (in seconds) of the startup of each command (`--help`) of
+# the entry points of setup.py (but the viewer)
+COMMAND_BUDGETS = {
+        "fitsviewer.gui.nox": 0.35,
+        "fitsviewer.utils.fits2png": 0.35,
+        "fitsviewer.utils.png2fits": 0.35,
+        "fitsviewer.utils.fits2gif": 0.35,
+        "fitsviewer.utils.fitsindex": 0.35,
+        "fitsviewer.utils.fitsinfo": 0.35,
+        "fitsviewer.utils.fitsstats": 0.35,
+    }
+
+# Time budget (in seconds) of the import of the viewer (the Tk window can't
+# be created without a display); most of it is the import of matplotlib
+# (about 0.65 s with matplotlib 3.11)
+VIEWER_MODULE = "fitsviewer.gui.tk_matplotlib"
+VIEWER_BUDGET = 1.0
+
+# Modules that should only be imported on first use
+LAZY_MODULES = {
+        "fitsviewer.gui.tk_matplotlib": ("astropy", "matplotlib.pyplot"),
+        "fitsviewer.gui.nox": ("astropy", "PIL", "matplotlib"),
+        "fitsviewer.utils.fits2png": ("astropy", "PIL", "matplotlib"),
+        "fitsviewer.utils.png2fits": ("astropy", "PIL"),
+        "fitsviewer.utils.fits2gif": ("astropy", "PIL", "matplotlib"),
+        "fitsviewer.utils.fitsindex": ("astropy", "PIL", "matplotlib"),
+        "fitsviewer.utils.fitsinfo": ("astropy", "PIL", "matplotlib"),
+        "fitsviewer.utils.fitsstats": ("astropy",),
+    }
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+###############################################################################
+
+def run_python(args):
+    """
+    Run a new Python interpreter with the given arguments (from the root of
+    the package) and return its wall time (in seconds) and its output.
+    """
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIRECTORY)
+
+    start_time = time.perf_counter()
+    process = subprocess.run([sys.executable] + list(args),
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,
+                             universal_newlines=True,
+                             cwd=PACKAGE_DIRECTORY,
+                             env=env)
+    elapsed_time = time.perf_counter() - start_time
+
+    if process.returncode != 0:
+        raise Exception("{} failed: {}".format(" ".join(args), process.stderr))
+
+    return elapsed_time, process.stdout
+
+
+def get_startup_time(args):
+    """Return the best wall time of STARTUP_NUM_RUNS runs of Python with `args`."""
+    return min(run_python(args)[0] for run in range(STARTUP_NUM_RUNS))
+
+
+###############################################################################
+
+@pytest.mark.parametrize("module", sorted(COMMAND_BUDGETS))
+def test_command_startup_time(module):
+    budget = COMMAND_BUDGETS[module] * BUDGET_SCALE
+    startup_time = get_startup_time(["-m", module, "--help"])
+    print("{} --help: {:.3f} s (budget {:.3f} s)".format(module, startup_time, budget))
+    assert startup_time <= budget
+
+
+def test_viewer_import():
+    # The viewer module must be importable with the installed matplotlib
+    # (even without a display)
+    process = subprocess.run([sys.executable, "-c", "import " + VIEWER_MODULE],
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,
+                             universal_newlines=True,
+                             cwd=PACKAGE_DIRECTORY,
+                             env=dict(os.environ, PYTHONPATH=PACKAGE_DIRECTORY))
+    assert process.returncode == 0, process.stderr
+
+
+def test_viewer_startup_time():
+    budget = VIEWER_BUDGET * BUDGET_SCALE
+    startup_time = get_startup_time(["-c", "import " + VIEWER_MODULE])
+    print("import {}: {:.3f} s (budget {:.3f} s)".format(VIEWER_MODULE, startup_time, budget))
+    assert startup_time <= budget
+
+
+@pytest.mark.parametrize("module", sorted(LAZY_MODULES))
+def test_lazy_imports(module):
+    code = "import sys, {}; print(' '.join(sorted(sys.modules)))".format(module)
+    imported_modules = set(run_python(["-c", code])[1].split())
+    assert not imported_modules.intersection(LAZY_MODULES[module])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Chunked access to (possibly memory-mapped) Numpy arrays.
+
+The helpers of this module iterate over large arrays by blocks along their
+first axis so that only one block at a time is paged in (or converted).
+"""
+
+__all__ = ['iter_chunk_indices',
+           'iter_chunks',
+           'get_range']
+
+import numpy as np
+
+###############################################################################
+
+# Approximate number of elements per chunk (4 Mi elements = 16 MiB of float32)
+CHUNK_SIZE = 2**22
+
+###############################################################################
+
+def iter_chunk_indices(shape, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over the indices (tuples of slices and integers) that split an
+    array of the given `shape` in blocks of about `chunk_size` elements.
+
+    Arrays are split along their first axis; when a single item of the first
+    axis is larger than `chunk_size` (e.g. a large plane of a cube), it is
+    split along the next axis, and so on.  Blocks always contain at least one
+    full row (last axis).
+    """
+    if len(shape) <= 1:
+        step = chunk_size
+    else:
+        row_size = max(1, int(np.prod(shape[1:])))
+
+        if (row_size > chunk_size) and (len(shape) > 2):
+            for index in range(shape[0]):
+                for sub_index in iter_chunk_indices(shape[1:], chunk_size):
+                    yield (index,) + sub_index
+            return
+
+        step = max(1, chunk_size // row_size)
+
+    for start in range(0, shape[0], step):
+        yield (slice(start, start + step),)
+
+
+def iter_chunks(array, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over `array` by blocks of about `chunk_size` elements (see
+    `iter_chunk_indices`).
+
+    `array` can be a Numpy array (blocks are views on it) or any object with
+    a `shape` attribute that supports Numpy-like indexing, e.g. the
+    `hdu.section` of an Astropy HDU (blocks are read on demand).
+    """
+    for index in iter_chunk_indices(array.shape, chunk_size):
+        yield np.asarray(array[index])
+
+
+def get_range(array, chunk_size=CHUNK_SIZE):
+    """
+    Return the (min, max) values of `array` ignoring NaN and infinite values.
+
+    (0., 1.) is returned if the array doesn't contain any finite value.
+    """
+    min_val, max_val = np.inf, -np.inf
+
+    for chunk in iter_chunks(array, chunk_size):
+        if np.issubdtype(chunk.dtype, np.floating):
+            chunk = chunk[np.isfinite(chunk)]
+        if chunk.size > 0:
+            min_val = min(min_val, chunk.min())
+            max_val = max(max_val, chunk.max())
+
+    if min_val > max_val:
+        min_val, max_val = 0., 1.
+
+    return float(min_val), float(max_val)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Batch processing of files for the command line tools: selection of the
+input files and processing of each file in a pool of worker processes, with
+errors reported per file.
+"""
+
+__all__ = ['get_output_file_path_prefix',
+           'iter_input_files',
+           'list_input_files',
+           'run_batch']
+
+import concurrent.futures
+import glob
+import os
+import sys
+
+from fitsviewer.core.header import FITS_EXTENSIONS
+
+###############################################################################
+
+def get_output_file_path_prefix(input_file_path):
+    """
+    Return the path of the files made from `input_file_path` without their
+    extension, i.e. `input_file_path` without its FITS extension (including
+    the .gz extension of compressed files).
+    """
+    for extension in FITS_EXTENSIONS:
+        if input_file_path.lower().endswith(extension):
+            return input_file_path[:-len(extension)]
+    return os.path.splitext(input_file_path)[0]
+
+
+def iter_input_files(path_list, extensions=FITS_EXTENSIONS):
+    """
+    Iterate over the files designated by `path_list`: file paths,
+    directories (searched recursively for the files whose name ends with
+    one of `extensions`) or glob patterns.
+
+    Paths that don't match anything are yielded as is (so that they are
+    reported as errors).
+    """
+    for path in path_list:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    if file_name.lower().endswith(extensions):
+                        yield os.path.join(dir_path, file_name)
+        elif os.path.exists(path):
+            yield path
+        else:
+            matching_paths = sorted(glob.glob(path, recursive=True))
+            if len(matching_paths) > 0:
+                yield from iter_input_files(matching_paths, extensions)
+            else:
+                yield path
+
+
+def list_input_files(path_list, extensions=FITS_EXTENSIONS):
+    """
+    Return the list of the files designated by `path_list` (see
+    `iter_input_files`), where files matched by several paths appear only
+    once.
+    """
+    return list(dict.fromkeys(os.path.normpath(path) for path in iter_input_files(path_list, extensions)))
+
+
+def run_batch(func, input_file_path_list, jobs=1, on_result=None, get_args=None, ordered=False):
+    """
+    Call `func(input_file_path, *get_args(input_file_path))` for each file of
+    `input_file_path_list` in `jobs` worker processes (in the calling
+    process if `jobs` <= 1 or if there is only one file).  `get_args` is
+    called in the calling process.
+
+    `on_result(input_file_path, result)` is called in the calling process
+    for each file processed without error: in the order of the files if
+    `ordered` is True, as soon as possible otherwise.  Errors are reported
+    per file on the standard error: the other files are still processed.
+
+    Return the number of files that failed.
+    """
+    num_failed_files = 0
+
+    def get_func_args(input_file_path):
+        if get_args is None:
+            return (input_file_path,)
+        return (input_file_path,) + tuple(get_args(input_file_path))
+
+    def handle_result(input_file_path, get_result):
+        nonlocal num_failed_files
+        try:
+            result = get_result()
+        except Exception as e:
+            print("Error: {}: {}".format(input_file_path, e), file=sys.stderr)
+            num_failed_files += 1
+        else:
+            if on_result is not None:
+                on_result(input_file_path, result)
+
+    if (jobs <= 1) or (len(input_file_path_list) <= 1):
+        for input_file_path in input_file_path_list:
+            handle_result(input_file_path, lambda: func(*get_func_args(input_file_path)))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            future_dict = {executor.submit(func, *get_func_args(input_file_path)): input_file_path
+                           for input_file_path in input_file_path_list}
+            futures = future_dict if ordered else concurrent.futures.as_completed(future_dict)
+            for future in futures:
+                handle_result(future_dict[future], future.result)
+
+    return num_failed_files
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+In-memory and on-disk caches.
+"""
+
+__all__ = ['LRUCache',
+           'DiskCache',
+           'get_cache_directory',
+           'trim_cache_directory']
+
+import collections
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+
+import numpy as np
+
+###############################################################################
+
+def get_nbytes(value):
+    """
+    Return the memory size (in bytes) of `value`.
+
+    Values should have a `nbytes` attribute (like Numpy arrays); other
+    values are considered as negligible.
+    """
+    return getattr(value, 'nbytes', 0)
+
+###############################################################################
+
+class LRUCache:
+    """
+    A "least recently used" cache bounded by the total size of its values.
+
+    The size of a value is given by its `nbytes` attribute.  Since values may
+    grow after they have been inserted (e.g. lazily built data), sizes are
+    measured each time the cache is trimmed, not only on insertion.
+
+    The cache can be shared between threads (e.g. the GUI thread and the
+    threads that prefetch data).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def __contains__(self, key):
+        return key in self._items
+
+
+    def get(self, key, default=None):
+        """
+        Return the value of `key` (and mark it as the most recently used) or
+        `default` if `key` isn't in the cache.
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            return default
+
+
+    def put(self, key, value):
+        """
+        Add (or replace) the value of `key` then evict the least recently used
+        values if the cache is too large.
+        """
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            self.trim()
+
+
+    def pop(self, key, default=None):
+        """
+        Remove `key` from the cache and return its value.
+        """
+        with self._lock:
+            return self._items.pop(key, default)
+
+
+    def discard_if(self, predicate):
+        """
+        Remove all the keys for which `predicate(key)` is True.
+        """
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+    @property
+    def nbytes(self):
+        """The current size (in bytes) of the cached values."""
+        with self._lock:
+            return sum(get_nbytes(value) for value in self._items.values())
+
+
+    def trim(self):
+        """
+        Evict the least recently used values until the cache size is below
+        `max_bytes`.  The most recently used value is always kept.
+        """
+        with self._lock:
+            sizes = [get_nbytes(value) for value in self._items.values()]
+            total_size = sum(sizes)
+
+            for key, size in zip(list(self._items), sizes):
+                if (total_size <= self.max_bytes) or (len(self._items) <= 1):
+                    break
+                del self._items[key]
+                total_size -= size
+
+###############################################################################
+
+def get_cache_directory(name):
+    """
+    Return the path of the cache directory `name` of fitsviewer
+    ($XDG_CACHE_HOME/fitsviewer/<name> or ~/.cache/fitsviewer/<name>).
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "fitsviewer", name)
+
+
+def trim_cache_directory(cache_directory, max_bytes, keep=None, extension=""):
+    """
+    Remove the least recently used files (the oldest modification times) of
+    `cache_directory` whose name ends with `extension` until their total
+    size is below `max_bytes` (the file `keep` is never removed).
+    """
+    file_stats = []
+
+    for file_name in os.listdir(cache_directory):
+        if file_name.endswith(extension):
+            file_path = os.path.join(cache_directory, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue     # Removed in the meantime (by another process)
+            file_stats.append((file_stat.st_mtime, file_stat.st_size, file_path))
+
+    total_size = sum(size for mtime, size, file_path in file_stats)
+
+    for mtime, size, file_path in sorted(file_stats):
+        if total_size <= max_bytes:
+            break
+        if file_path != keep:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            total_size -= size
+
+###############################################################################
+
+class DiskCache:
+    """
+    A persistent cache of Numpy arrays: one ".npz" file per key in a
+    directory, bounded by the total size of its files (the least recently
+    used files are removed first).
+
+    Keys are made from the path, the size and the modification time of a
+    data file plus other parameters (see `make_key`), thus the entries of a
+    file that has changed are never used.  Entries are written atomically:
+    the cache can be shared between threads and processes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+
+    @staticmethod
+    def make_key(file_path, *params):
+        """
+        Return the key of the entry of `file_path` and `params` (which should
+        have a stable `repr`).
+
+        Raise `OSError` if `file_path` can't be accessed.
+        """
+        file_stat = os.stat(file_path)
+        key = repr((os.path.abspath(file_path), file_stat.st_size, file_stat.st_mtime_ns) + params)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+
+    def get(self, key):
+        """
+        Return the arrays of `key` (a dictionary) or None if there is no such
+        entry (or if it can't be read).
+        """
+        entry_path = self._get_path(key)
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as npz_file:
+                arrays = {name: npz_file[name] for name in npz_file.files}
+            os.utime(entry_path)     # Mark the entry as recently used
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+        return arrays
+
+
+    def put(self, key, arrays):
+        """
+        Write (or replace) the entry of `key` (`arrays` is a dictionary of
+        arrays) then remove the least recently used entries if the cache is
+        too large.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        entry_path = self._get_path(key)
+        fd, temporary_file_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+
+        try:
+            with os.fdopen(fd, "wb") as entry_file:
+                np.savez(entry_file, **arrays)
+            os.replace(temporary_file_path, entry_path)
+        except BaseException:
+            os.remove(temporary_file_path)
+            raise
+
+        trim_cache_directory(self.directory, self.max_bytes, keep=entry_path, extension=".npz")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Colormaps applied as lookup tables (LUT) on quantized images.
+
+A normalized image (values in [0, 1]) is quantized once into an index image
+(uint8 or uint16); applying a colormap is then a single `take` of the
+colormap's RGBA lookup table over the index image, which makes colormap
+changes much cheaper than renormalizing the image.
+
+The last entry of each lookup table is the "bad" color of the colormap, used
+for NaN pixels.
+"""
+
+__all__ = ['get_index_dtype',
+           'quantize',
+           'get_lut',
+           'apply_lut']
+
+import functools
+
+import numpy as np
+
+###############################################################################
+
+# 255 colors + the "bad" color fit in an uint8 index image
+DEFAULT_LUT_SIZE = 255
+
+# 65535 colors + the "bad" color fit in an uint16 index image
+HIGH_PRECISION_LUT_SIZE = 65535
+
+###############################################################################
+
+def get_index_dtype(lut_size):
+    """
+    Return the smallest unsigned integer dtype able to index a lookup table
+    of `lut_size` colors (plus the "bad" color).
+    """
+    if lut_size < 2**8:
+        return np.dtype(np.uint8)
+    elif lut_size < 2**16:
+        return np.dtype(np.uint16)
+    else:
+        raise ValueError("Lookup tables are limited to {} colors.".format(2**16 - 1))
+
+
+def quantize(normalized_array, lut_size=DEFAULT_LUT_SIZE):
+    """
+    Quantize `normalized_array` (values in [0, 1]) into an index image.
+
+    Values are mapped on `lut_size` evenly spaced levels (values out of
+    [0, 1] are clipped) and NaN values are mapped on the "bad" index
+    `lut_size`.
+    """
+    scaled_array = np.multiply(normalized_array, lut_size, dtype=np.float32)
+    np.clip(scaled_array, 0, lut_size - 1, out=scaled_array)
+    scaled_array[np.isnan(scaled_array)] = lut_size
+
+    index_array = np.empty(scaled_array.shape, dtype=get_index_dtype(lut_size))
+    index_array[...] = scaled_array     # truncation
+
+    return index_array
+
+
+@functools.lru_cache(maxsize=32)
+def get_lut(cmap_name, lut_size=DEFAULT_LUT_SIZE):
+    """
+    Return the RGBA lookup table (a (lut_size + 1, 4) uint8 array) of the
+    given colormap.
+    """
+    # Matplotlib is slow to import: it is only imported when a lookup table
+    # is built
+    import matplotlib
+
+    cmap = matplotlib.colormaps[cmap_name]
+
+    lut = np.empty((lut_size + 1, 4), dtype=np.uint8)
+    lut[:lut_size] = cmap((np.arange(lut_size) + 0.5) / lut_size, bytes=True)
+    lut[lut_size] = cmap(np.nan, bytes=True)
+
+    lut.flags.writeable = False    # shared between callers
+    return lut
+
+
+def apply_lut(index_array, lut, out=None):
+    """
+    Return the RGBA (uint8) image of `index_array` colored with `lut`.
+
+    `out` can be a preallocated (height, width, 4) uint8 array.
+    """
+    return lut.take(index_array, axis=0, out=out)
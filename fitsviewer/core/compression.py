@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Fast paths for compressed FITS files.
+
+Gzip-compressed files (.fits.gz, ...) can't be memory-mapped: Astropy
+decompresses them entirely each time they are opened.  They can be
+decompressed once into a local cache directory (see `get_decompressed_file`)
+so that the next openings memory-map the decompressed copy.
+
+(Tile-compressed image HDUs are read by tiles through `hdu.section`, see
+`fitsviewer.core.hdu.PlaneSection`.)
+"""
+
+__all__ = ['is_gzip_file',
+           'get_decompressed_file']
+
+import gzip
+import os
+import shutil
+import tempfile
+
+from fitsviewer.core.cache import DiskCache, get_cache_directory, trim_cache_directory
+
+###############################################################################
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# The name of the cache directory of decompressed files
+DECOMPRESSED_CACHE_NAME = "decompressed"
+
+# The maximum size of the decompressed files kept in the cache directory (the
+# least recently used files are removed first)
+DECOMPRESSED_CACHE_MAX_BYTES = 4 * 2**30
+
+# The size of the blocks decompressed at once
+COPY_BUFFER_SIZE = 16 * 2**20
+
+###############################################################################
+
+def is_gzip_file(file_path):
+    """
+    Return True if the given file is gzip-compressed (whatever its name).
+    """
+    with open(file_path, "rb") as fd:
+        return fd.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def get_decompressed_file(file_path, cache_directory=None, max_bytes=DECOMPRESSED_CACHE_MAX_BYTES):
+    """
+    Return the path of the decompressed copy of the gzip-compressed file
+    `file_path`.
+
+    The file is decompressed (by blocks) the first time only: copies are
+    identified by the path, the size and the modification time of the
+    compressed file, thus a modified file is decompressed again.  The
+    least recently used copies are removed when the cache directory exceeds
+    `max_bytes`.
+    """
+    if cache_directory is None:
+        cache_directory = get_cache_directory(DECOMPRESSED_CACHE_NAME)
+
+    cached_file_path = os.path.join(cache_directory, DiskCache.make_key(file_path) + ".fits")
+
+    if os.path.isfile(cached_file_path):
+        os.utime(cached_file_path)     # Mark the copy as recently used
+        return cached_file_path
+
+    os.makedirs(cache_directory, exist_ok=True)
+
+    # Decompress to a temporary file first: an interrupted decompression
+    # never leaves a truncated copy in the cache
+    fd, temporary_file_path = tempfile.mkstemp(suffix=".tmp", dir=cache_directory)
+
+    try:
+        with gzip.open(file_path, "rb") as input_file, os.fdopen(fd, "wb") as output_file:
+            shutil.copyfileobj(input_file, output_file, COPY_BUFFER_SIZE)
+        os.replace(temporary_file_path, cached_file_path)
+    except BaseException:
+        os.remove(temporary_file_path)
+        raise
+
+    trim_cache_directory(cache_directory, max_bytes, keep=cached_file_path, extension=".fits")
+
+    return cached_file_path
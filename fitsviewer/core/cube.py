@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Navigation in the planes of 3D (and above) images.
+
+The planes of an image are the 2D arrays indexed by its extra axes (NAXIS3,
+NAXIS4, ...).  A plane index is a tuple of integers in Numpy order (i.e. the
+last FITS axis first), as used to index `hdu.section`.
+"""
+
+__all__ = ['get_planes_shape',
+           'get_default_plane_index',
+           'get_neighbour_planes',
+           'get_next_planes']
+
+from fitsviewer.core.hdu import get_image_shape
+
+###############################################################################
+
+def get_planes_shape(header):
+    """
+    Return the shape of the grid of planes of the image described by
+    `header` (an empty tuple for 1D and 2D images).
+    """
+    return get_image_shape(header)[:-2]
+
+
+def get_default_plane_index(header):
+    """
+    Return the index of the first plane of the image described by `header`
+    (None for 1D and 2D images).
+    """
+    planes_shape = get_planes_shape(header)
+    if len(planes_shape) == 0:
+        return None
+    return (0,) * len(planes_shape)
+
+
+def get_neighbour_planes(plane_index, planes_shape, max_planes, axis=-1, direction=1):
+    """
+    Return the indices of the (at most `max_planes`) planes that are the
+    closest to `plane_index` along `axis`, the closest first.
+
+    Planes in the given `direction` (1 or -1, e.g. the direction the user is
+    scrolling to) come first at equal distance.
+    """
+    axis = axis % len(planes_shape)
+    position = plane_index[axis]
+    size = planes_shape[axis]
+
+    neighbour_planes = []
+
+    for distance in range(1, size):
+        for step in (direction * distance, -direction * distance):
+            if (0 <= position + step < size) and (len(neighbour_planes) < max_planes):
+                neighbour_planes.append(plane_index[:axis] + (position + step,) + plane_index[axis + 1:])
+        if len(neighbour_planes) >= max_planes:
+            break
+
+    return neighbour_planes
+
+
+def get_next_planes(plane_index, planes_shape, num_planes, axis=-1):
+    """
+    Return the indices of the `num_planes` planes that follow `plane_index`
+    along `axis`, going back to the first plane after the last one (e.g. to
+    play the planes of a time series in a loop).
+    """
+    axis = axis % len(planes_shape)
+    size = planes_shape[axis]
+
+    return [plane_index[:axis] + ((plane_index[axis] + step) % size,) + plane_index[axis + 1:]
+            for step in range(1, min(num_planes, size - 1) + 1)]
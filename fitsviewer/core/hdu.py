@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+
+"""
+Header-based access to the HDUs of a FITS file.
+
+The functions of this module describe HDUs from their header keywords only
+(NAXISn, BITPIX, BSCALE, BZERO) so that no data block has to be read (or
+decoded) to list the content of a file.
+"""
+
+__all__ = ['open_fits',
+           'get_image_shape',
+           'get_image_dtype',
+           'get_hdu_label',
+           'get_image_data',
+           'get_image_plane',
+           'PlaneSection']
+
+import threading
+
+import numpy as np
+
+from fitsviewer.core.compression import is_gzip_file, get_decompressed_file
+
+###############################################################################
+
+# Numpy dtype of the raw data for each BITPIX value (FITS standard)
+BITPIX_TO_DTYPE = {
+        8: np.dtype('uint8'),
+        16: np.dtype('int16'),
+        32: np.dtype('int32'),
+        64: np.dtype('int64'),
+        -32: np.dtype('float32'),
+        -64: np.dtype('float64')
+    }
+
+# Serializes the reads of image planes (see get_image_plane)
+_read_lock = threading.Lock()
+
+###############################################################################
+
+def open_fits(file_path, memmap=True, gzip_cache=False):
+    """
+    Open the given FITS file without reading any data block.
+
+    HDUs are loaded lazily (only their header is parsed when they are
+    accessed) and, if `memmap` is True, image data are memory-mapped instead
+    of being read into RAM.
+
+    Gzip-compressed files can't be memory-mapped: if `gzip_cache` is True,
+    they are decompressed once in a cache directory and the decompressed
+    copy is opened instead (see `fitsviewer.core.compression`).
+    """
+    # Astropy is slow to import: it is only imported when a file is opened
+    from astropy.io import fits
+
+    if memmap and gzip_cache and is_gzip_file(file_path):
+        file_path = get_decompressed_file(file_path)
+
+    # memmap=None memory-maps the data blocks like memmap=True but, unlike
+    # memmap=True, it still lets Astropy apply BSCALE/BZERO scaling (to a
+    # copy of the requested data only)
+    return fits.open(file_path,
+                     memmap=None if memmap else False,
+                     lazy_load_hdus=True)
+
+
+def get_image_shape(header):
+    """
+    Return the shape (in Numpy order) of the image described by `header`.
+
+    An empty tuple is returned for HDUs without data (NAXIS = 0).
+    """
+    naxis = header.get('NAXIS', 0)
+    return tuple(header['NAXIS{}'.format(axis)] for axis in range(naxis, 0, -1))
+
+
+def get_image_dtype(header):
+    """
+    Return the Numpy dtype of the image described by `header`.
+
+    This is the dtype of `hdu.data` as returned by Astropy, i.e. after
+    BSCALE/BZERO scaling (including the unsigned integer convention).
+    """
+    bitpix = header['BITPIX']
+    bscale = header.get('BSCALE', 1)
+    bzero = header.get('BZERO', 0)
+
+    if bscale == 1 and bzero == 0:
+        return BITPIX_TO_DTYPE[bitpix]
+
+    if bscale == 1:
+        if bitpix == 8 and bzero == -128:
+            return np.dtype('int8')
+        if bitpix in (16, 32, 64) and bzero == 1 << (bitpix - 1):
+            return np.dtype('uint{}'.format(bitpix))
+
+    if bitpix > 16:
+        return np.dtype('float64')
+    elif bitpix > 0:
+        return np.dtype('float32')
+    else:
+        return BITPIX_TO_DTYPE[bitpix]
+
+
+def get_hdu_label(hdu_index, hdu):
+    """
+    Return the label used to describe the given HDU in menus.
+
+    Only the header of the HDU is read.
+    """
+    if hdu.is_image:
+        shape = get_image_shape(hdu.header)
+        if len(shape) == 0:
+            label = "HDU{} (empty)".format(hdu_index)
+        else:
+            label = "HDU{} ({}D image {} {})".format(hdu_index,
+                                                     len(shape),
+                                                     "x".join([str(dim) for dim in shape]),
+                                                     get_image_dtype(hdu.header).name)
+    else:
+        label = "HDU{} (table)".format(hdu_index)
+    return label
+
+
+def get_image_data(hdu):
+    """
+    Return the whole data of the given image HDU without reading it.
+
+    When the data can be used as is from the (memory-mapped) file, this is
+    `hdu.data`.  Otherwise (scaled integers, compressed HDUs, ...), this is
+    `hdu.section`, which reads (and scales) only the requested parts of the
+    data: it should be accessed by blocks (see
+    `fitsviewer.core.arrays.iter_chunks`).
+    """
+    from astropy.io import fits
+
+    header = hdu.header
+    scaled = any(keyword in header for keyword in ('BSCALE', 'BZERO', 'BLANK'))
+
+    if isinstance(hdu, fits.CompImageHDU) or scaled:
+        return hdu.section
+    return hdu.data
+
+
+def get_image_plane(hdu, plane_index=None):
+    """
+    Return the 2D plane `plane_index` (or the 1D array) of the given image
+    HDU.
+
+    `plane_index` is a tuple of indices on the extra axes of 3D (and above)
+    images, in Numpy order (see `fitsviewer.core.cube`); the first plane is
+    returned if it is None.  Only the requested plane is read from the file
+    (through `hdu.section`) instead of the whole data cube.
+
+    Planes of tile-compressed HDUs are not decompressed here: a
+    `PlaneSection` is returned, which decompresses only the tiles of the
+    parts of the plane that are actually read.
+
+    Planes can be read from several threads (e.g. to prefetch the planes
+    next to the displayed one): reads are serialized since Astropy file
+    objects are not thread-safe.
+    """
+    from astropy.io import fits
+
+    ndim = len(get_image_shape(hdu.header))
+
+    if ndim > 2 and plane_index is None:
+        plane_index = (0,) * (ndim - 2)
+
+    if isinstance(hdu, fits.CompImageHDU) and ndim >= 2:
+        return PlaneSection(hdu, plane_index)
+
+    with _read_lock:
+        if ndim <= 2:
+            image_array = hdu.data
+        else:
+            image_array = hdu.section[tuple(plane_index)]
+
+    return image_array
+
+###############################################################################
+
+class PlaneSection:
+    """
+    A 2D plane of an image HDU read on demand, by parts, through
+    `hdu.section`.
+
+    This is meant for tile-compressed HDUs: reading a part of the plane
+    (e.g. the visible part of the image or a block of rows) only decompresses
+    the tiles that intersect it.  It supports the Numpy-like indexing used by
+    `fitsviewer.core` (see `fitsviewer.core.arrays.iter_chunks`); reading the
+    whole plane with `np.asarray` decompresses all its tiles.
+    """
+
+    def __init__(self, hdu, plane_index=None):
+        self._section = hdu.section
+        self._plane_index = () if plane_index is None else tuple(plane_index)
+
+        self.shape = get_image_shape(hdu.header)[len(self._plane_index):]
+        self.ndim = len(self.shape)
+        self.dtype = get_image_dtype(hdu.header)
+
+
+    @property
+    def nbytes(self):
+        """Nothing is kept in memory."""
+        return 0
+
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        with _read_lock:
+            return np.asarray(self._section[self._plane_index + index])
+
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[...], dtype=dtype)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Header-only reading of FITS files.
+
+Headers are parsed directly from the 2880-byte header blocks and the data
+blocks are skipped (seeked over) using the NAXISn, BITPIX, PCOUNT and GCOUNT
+keywords: only a few kilobytes are read per file, whatever its size.
+Astropy isn't used (nor imported).
+"""
+
+__all__ = ['parse_card',
+           'get_header_values',
+           'get_data_size',
+           'get_hdu_type',
+           'get_hdu_shape',
+           'read_headers']
+
+import gzip
+import re
+
+from fitsviewer.core.compression import is_gzip_file
+
+###############################################################################
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# The extensions of FITS file names (searched in directories)
+FITS_EXTENSIONS = ('.fits', '.fit', '.fts', '.fits.gz', '.fit.gz', '.fts.gz')
+
+# Keywords without value (their cards are kept as is)
+COMMENTARY_KEYWORDS = ("COMMENT", "HISTORY", "")
+
+STRING_REGEX = re.compile(r"'((?:[^']|'')*)'\s*(?:/\s?(.*))?$")
+VALUE_REGEX = re.compile(r"([^/]*)(?:/\s?(.*))?$")
+
+###############################################################################
+
+def parse_value(value_str):
+    """
+    Return the Python value of the (non string) value field `value_str`.
+    """
+    value_str = value_str.strip()
+
+    if value_str == "":
+        return None
+    if value_str == "T":
+        return True
+    if value_str == "F":
+        return False
+
+    try:
+        return int(value_str)
+    except ValueError:
+        pass
+
+    try:
+        return float(value_str.replace("D", "E").replace("d", "e"))
+    except ValueError:
+        pass
+
+    if value_str.startswith("(") and value_str.endswith(")"):
+        try:
+            real, imag = value_str[1:-1].split(",")
+            return complex(parse_value(real), parse_value(imag))
+        except (ValueError, TypeError):
+            pass
+
+    return value_str
+
+
+def parse_card(card):
+    """
+    Return the (keyword, value, comment) tuple of an 80 characters card.
+
+    `value` is None for commentary cards (COMMENT, HISTORY, ...), whose text
+    is returned as `comment`.
+    """
+    keyword = card[:8].rstrip()
+
+    if keyword == "HIERARCH" and "=" in card:
+        keyword, value_field = card[9:].split("=", 1)
+        keyword = keyword.strip()
+    elif card[8:10] == "= ":
+        value_field = card[10:]
+    elif keyword == "CONTINUE":
+        value_field = card[8:]
+    else:
+        return keyword, None, card[8:].rstrip()
+
+    value_field = value_field.strip()
+
+    if value_field.startswith("'"):
+        match = STRING_REGEX.match(value_field)
+        if match is not None:
+            value = match.group(1).replace("''", "'").rstrip()
+            return keyword, value, (match.group(2) or "").rstrip()
+
+    match = VALUE_REGEX.match(value_field)
+    return keyword, parse_value(match.group(1)), (match.group(2) or "").rstrip()
+
+
+def get_header_values(cards):
+    """
+    Return the {keyword: value} dictionary of the given cards (the first
+    value of each keyword; long strings continued on CONTINUE cards are
+    joined; commentary cards are ignored).
+    """
+    values = {}
+    last_keyword = None
+
+    for card in cards:
+        keyword, value, comment = parse_card(card)
+
+        if keyword == "CONTINUE":
+            previous_value = values.get(last_keyword)
+            if isinstance(previous_value, str) and previous_value.endswith("&") and isinstance(value, str):
+                values[last_keyword] = previous_value[:-1] + value
+            continue
+
+        if (value is None) and (keyword in COMMENTARY_KEYWORDS):
+            continue
+
+        if keyword not in values:
+            values[keyword] = value
+            last_keyword = keyword
+
+    return values
+
+
+def get_data_size(values):
+    """
+    Return the size (in bytes, without the padding) of the data of the HDU
+    described by the header `values` (see `get_header_values`).
+    """
+    naxis = values.get("NAXIS", 0)
+    if naxis == 0:
+        return 0
+
+    dims = [values.get("NAXIS{}".format(axis), 0) for axis in range(1, naxis + 1)]
+
+    # Random groups: NAXIS1 = 0
+    if values.get("GROUPS") is True and dims[0] == 0:
+        dims = dims[1:]
+
+    num_values = 1
+    for dim in dims:
+        num_values *= dim
+
+    bitpix = abs(values.get("BITPIX", 8))
+    pcount = values.get("PCOUNT", 0)
+    gcount = values.get("GCOUNT", 1)
+
+    return bitpix // 8 * gcount * (pcount + num_values)
+
+
+def get_hdu_type(values):
+    """
+    Return the type of the HDU described by `values`: "image" (possibly
+    empty), "compressed image", "binary table", "ascii table", "random
+    groups" or the XTENSION value.
+    """
+    if "SIMPLE" in values:
+        if values.get("GROUPS") is True and values.get("NAXIS1") == 0:
+            return "random groups"
+        return "image"
+
+    xtension = str(values.get("XTENSION", "")).strip().upper()
+
+    if xtension == "IMAGE":
+        return "image"
+    if xtension == "BINTABLE":
+        return "compressed image" if values.get("ZIMAGE") is True else "binary table"
+    if xtension == "TABLE":
+        return "ascii table"
+    return xtension.lower()
+
+
+def get_hdu_shape(values):
+    """
+    Return the dimensions (NAXIS1, NAXIS2, ...) of the HDU described by
+    `values` (of the uncompressed image for compressed images).
+    """
+    prefix = "ZNAXIS" if get_hdu_type(values) == "compressed image" else "NAXIS"
+    return [values.get("{}{}".format(prefix, axis), 0) for axis in range(1, values.get(prefix, 0) + 1)]
+
+
+def _read_header_cards(fd):
+    """
+    Return the cards of the header that starts at the current position of
+    `fd` (None at the end of the file), the END card excluded.
+    """
+    cards = []
+
+    while True:
+        block = fd.read(BLOCK_SIZE)
+        text = block.decode("ascii", errors="replace")
+
+        if not cards and not text.startswith(("SIMPLE", "XTENSION")):
+            # The end of the file (or garbage after the last HDU)
+            return None
+
+        if len(block) < BLOCK_SIZE:
+            raise ValueError("Truncated header.")
+
+        for position in range(0, BLOCK_SIZE, CARD_SIZE):
+            card = text[position:position + CARD_SIZE]
+            if card.rstrip() == "END":
+                return cards
+            cards.append(card)
+
+
+def read_headers(file_path, hdu_index=None):
+    """
+    Return the list of the (hdu_index, cards) pairs of the HDUs of the given
+    FITS file, where `cards` is the list of the (80 characters) cards of the
+    header of the HDU, the END card excluded.
+
+    Only the header blocks are read: data blocks are skipped.  If
+    `hdu_index` is given, the file is only read up to this HDU.
+
+    Gzip-compressed files are supported, but they have to be decompressed
+    up to the last header (compressed streams can't be seeked).
+    """
+    opener = gzip.open if is_gzip_file(file_path) else open
+
+    headers = []
+
+    with opener(file_path, "rb") as fd:
+        index = 0
+
+        while (hdu_index is None) or (index <= hdu_index):
+            cards = _read_header_cards(fd)
+            if cards is None:
+                break
+
+            if (hdu_index is None) or (index == hdu_index):
+                headers.append((index, cards))
+
+            # Skip the data blocks (padded to a whole number of blocks)
+            data_size = get_data_size(get_header_values(cards))
+            fd.seek(-(-data_size // BLOCK_SIZE) * BLOCK_SIZE, 1)
+
+            index += 1
+
+    if not headers:
+        if hdu_index is None:
+            raise ValueError("{} isn't a FITS file.".format(file_path))
+        raise ValueError("{} has no HDU {}.".format(file_path, hdu_index))
+
+    return headers
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Histograms of (possibly large) images.
+
+Histograms are computed with a bounded number of bins in a single pass over
+the image (by chunks), with exact integer-width bins for integer images.
+NaN and infinite values are ignored.
+"""
+
+__all__ = ['compute_histogram']
+
+import math
+
+import numpy as np
+
+from fitsviewer.core.arrays import iter_chunks, get_range
+
+###############################################################################
+
+DEFAULT_NUM_BINS = 512
+
+###############################################################################
+
+def compute_histogram(image_array, num_bins=DEFAULT_NUM_BINS, value_range=None):
+    """
+    Compute the histogram of `image_array`.
+
+    Return the (counts, bin_edges) pair (as `np.histogram` does) where
+    `counts` contains at most `num_bins` values.  If `value_range` (a
+    (min, max) tuple) is None, it is computed first with an additional pass
+    over the data.
+
+    For integer images, bins have an integer width and are centered on
+    integer values: if the range of values is smaller than `num_bins`, there
+    is exactly one bin per value.
+    """
+    if num_bins < 1:
+        raise ValueError("The number of bins should be a positive integer.")
+
+    if value_range is None:
+        value_range = get_range(image_array)
+
+    min_val, max_val = value_range
+
+    if np.issubdtype(image_array.dtype, np.integer):
+
+        # Integer-aware binning: (max - min + 1) values in bins of bin_width values
+        min_val = int(math.floor(min_val))
+        max_val = int(math.ceil(max_val))
+        bin_width = int(math.ceil((max_val - min_val + 1) / num_bins))
+        num_bins = (max_val - min_val) // bin_width + 1
+
+        counts = np.zeros(num_bins, dtype=np.int64)
+
+        for chunk in iter_chunks(image_array):
+            indices = chunk.astype(np.int64, copy=False).ravel() - min_val
+            if bin_width > 1:
+                indices //= bin_width
+            # Values out of the requested range are ignored
+            indices = indices[(indices >= 0) & (indices < num_bins)]
+            counts += np.bincount(indices, minlength=num_bins)
+
+        bin_edges = min_val - 0.5 + bin_width * np.arange(num_bins + 1)
+
+    else:
+
+        if min_val == max_val:
+            min_val, max_val = min_val - 0.5, max_val + 0.5
+
+        counts = np.zeros(num_bins, dtype=np.int64)
+
+        for chunk in iter_chunks(image_array):
+            chunk = chunk.ravel()
+            chunk = chunk[np.isfinite(chunk)]
+            chunk_counts, _ = np.histogram(chunk,
+                                           bins=num_bins,
+                                           range=(min_val, max_val))
+            counts += chunk_counts
+
+        bin_edges = np.linspace(min_val, max_val, num_bins + 1)
+
+    return counts, bin_edges
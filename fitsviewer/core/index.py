@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+An index of the headers of the FITS files of directory trees, kept in a
+SQLite database.
+
+The directories are crawled incrementally: only the files that are new or
+whose size or modification time changed are read again (header-only reads,
+see fitsviewer.core.header, in a pool of worker processes).  The values of
+the header keywords of each HDU are stored as SQLite values (numbers are
+compared as numbers, strings as strings) so that HDUs can be searched with
+expressions like "OBJECT == M31" or "DATE-OBS >= 2020-01-01".
+"""
+
+__all__ = ['get_default_index_path',
+           'parse_query',
+           'read_file_index',
+           'HeaderIndex']
+
+import concurrent.futures
+import os
+import re
+import sqlite3
+
+from fitsviewer.core.batch import iter_input_files
+from fitsviewer.core.cache import get_cache_directory
+from fitsviewer.core.hdu import get_image_dtype
+from fitsviewer.core.header import read_headers, get_header_values, get_hdu_type, get_hdu_shape, parse_value
+from fitsviewer.core.table import parse_filter
+
+###############################################################################
+
+INDEX_CACHE_NAME = "index"
+INDEX_FILE_NAME = "headers.sqlite"
+
+# The number of files written to the database between two commits (an
+# interrupted crawl keeps the files indexed so far)
+COMMIT_INTERVAL = 256
+
+# The number of files sent at once to each worker process
+CRAWL_CHUNK_SIZE = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS hdus (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    hdu INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    dtype TEXT,
+    PRIMARY KEY (file_id, hdu)
+);
+CREATE TABLE IF NOT EXISTS keywords (
+    file_id INTEGER NOT NULL,
+    hdu INTEGER NOT NULL,
+    keyword TEXT NOT NULL,
+    value,
+    PRIMARY KEY (file_id, hdu, keyword),
+    FOREIGN KEY (file_id, hdu) REFERENCES hdus(file_id, hdu) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS keywords_value ON keywords(keyword, value);
+"""
+
+QUERY_OPERATORS = {
+        "==": "=",
+        "=": "=",
+        "!=": "!=",
+        "<": "<",
+        "<=": "<=",
+        ">": ">",
+        ">=": ">="
+    }
+
+# Query expressions are joined with "and" (outside quotes)
+QUERY_SEPARATOR_REGEX = re.compile(r"""\s+and\s+(?=(?:[^'"]*['"][^'"]*['"])*[^'"]*$)""", re.IGNORECASE)
+
+###############################################################################
+
+def get_default_index_path():
+    """
+    Return the path of the default index database (in the cache directory
+    of fitsviewer, see fitsviewer.core.cache).
+    """
+    return os.path.join(get_cache_directory(INDEX_CACHE_NAME), INDEX_FILE_NAME)
+
+
+def parse_query(text):
+    """
+    Return the list of the expressions of a query such as
+    "OBJECT == M31 and FILTER == R" (see `HeaderIndex.search`).
+    """
+    return [expression for expression in QUERY_SEPARATOR_REGEX.split(text.strip()) if expression]
+
+
+def get_sql_value(value):
+    """
+    Return the value stored in the database for the header value `value`.
+    """
+    if isinstance(value, complex):
+        return str(value)
+    return value
+
+
+def read_file_index(file_path):
+    """
+    Return the list of the (hdu_index, type, shape, dtype, values) tuples of
+    the HDUs of the given FITS file, read from its headers only, where
+    `shape` is a string like "2048x2048" and `values` is the {keyword:
+    value} dictionary of the header.
+
+    `dtype` is the name of the Numpy dtype of the (uncompressed) image data
+    (see fitsviewer.core.hdu.get_image_dtype), None for tables and empty
+    HDUs.
+    """
+    hdu_list = []
+
+    for hdu_index, cards in read_headers(file_path):
+        values = get_header_values(cards)
+        hdu_type = get_hdu_type(values)
+        shape = get_hdu_shape(values)
+
+        dtype = None
+        if shape and hdu_type in ("image", "compressed image"):
+            bitpix_keyword = "ZBITPIX" if hdu_type == "compressed image" else "BITPIX"
+            image_values = dict(values, BITPIX=values.get(bitpix_keyword))
+            try:
+                dtype = get_image_dtype(image_values).name
+            except (KeyError, TypeError):
+                pass     # Invalid BITPIX
+
+        hdu_list.append((hdu_index, hdu_type, "x".join(str(dim) for dim in shape), dtype, values))
+
+    return hdu_list
+
+
+class HeaderIndex:
+    """
+    The SQLite database of the headers of the FITS files of some directory
+    trees (see `update`), which can be searched (see `search`).
+
+    A HeaderIndex can only be used in the thread that created it (as its
+    SQLite connection).
+    """
+
+    def __init__(self, database_path=None):
+        if database_path is None:
+            database_path = get_default_index_path()
+
+        database_directory = os.path.dirname(os.path.abspath(database_path))
+        os.makedirs(database_directory, exist_ok=True)
+
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def _get_indexed_files(self, directory):
+        """
+        Return the {path: (file_id, size, mtime_ns)} dictionary of the indexed
+        files of `directory` (and its subdirectories).
+        """
+        prefix = os.path.join(directory, "")
+        cursor = self.connection.execute("SELECT path, id, size, mtime_ns FROM files "
+                                         "WHERE substr(path, 1, ?) = ?",
+                                         (len(prefix), prefix))
+        return {path: (file_id, size, mtime_ns) for path, file_id, size, mtime_ns in cursor}
+
+
+    def _store_file(self, file_path, size, mtime_ns, hdu_list, error=None):
+        """
+        Replace the HDUs of the given file in the database.
+        """
+        connection = self.connection
+
+        # The HDUs and keywords of the previous version are deleted in cascade
+        connection.execute("DELETE FROM files WHERE path = ?", (file_path,))
+        file_id = connection.execute("INSERT INTO files (path, size, mtime_ns, error) VALUES (?, ?, ?, ?)",
+                                     (file_path, size, mtime_ns, error)).lastrowid
+
+        for hdu_index, hdu_type, shape, dtype, values in hdu_list:
+            connection.execute("INSERT INTO hdus (file_id, hdu, type, shape, dtype) VALUES (?, ?, ?, ?, ?)",
+                               (file_id, hdu_index, hdu_type, shape, dtype))
+            connection.executemany("INSERT INTO keywords (file_id, hdu, keyword, value) VALUES (?, ?, ?, ?)",
+                                   ((file_id, hdu_index, keyword, get_sql_value(value))
+                                    for keyword, value in values.items()))
+
+
+    def update(self, directory_list, jobs=None, check_cancelled=None, progress=None):
+        """
+        Index the FITS files of the given directories (and of their
+        subdirectories).
+
+        Only the files that are new or whose size or modification time
+        changed since the last update are read, by `jobs` worker processes
+        (the number of CPUs if None, no worker process if `jobs` <= 1).
+        The files that were removed from these directories are removed from
+        the index.  Files that can't be read are recorded with their error
+        (they are read again once they are modified).
+
+        `check_cancelled()` is called between files (it can raise an
+        exception to stop the update: the files indexed so far are kept) and
+        `progress(num_done, num_files)` after each file read.
+
+        Return the (num_indexed, num_unchanged, num_removed, num_failed)
+        tuple of the numbers of files.
+        """
+        connection = self.connection
+
+        # FIND THE NEW AND MODIFIED FILES #####################################
+
+        changed_files = []     # (path, size, mtime_ns)
+        num_unchanged = 0
+        removed_file_ids = []
+
+        for directory in directory_list:
+            directory = os.path.abspath(directory)
+            if not os.path.isdir(directory):
+                raise ValueError("{} isn't a directory.".format(directory))
+
+            indexed_files = self._get_indexed_files(directory)
+
+            # The same files as fits2png, fitsinfo, ... (see fitsviewer.core.batch)
+            for file_path in iter_input_files([directory]):
+                if check_cancelled is not None:
+                    check_cancelled()
+
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    continue     # Removed in the meantime
+
+                indexed_file = indexed_files.pop(file_path, None)
+                if (indexed_file is not None) and indexed_file[1:] == (file_stat.st_size, file_stat.st_mtime_ns):
+                    num_unchanged += 1
+                else:
+                    changed_files.append((file_path, file_stat.st_size, file_stat.st_mtime_ns))
+
+            # The remaining files don't exist anymore
+            removed_file_ids.extend(file_id for file_id, size, mtime_ns in indexed_files.values())
+
+        with connection:
+            connection.executemany("DELETE FROM files WHERE id = ?", ((file_id,) for file_id in removed_file_ids))
+
+        # READ THEIR HEADERS ##################################################
+
+        num_failed = 0
+
+        def store_result(file_info, get_result, num_done):
+            nonlocal num_failed
+            file_path, size, mtime_ns = file_info
+            try:
+                hdu_list = get_result()
+            except Exception as e:
+                self._store_file(file_path, size, mtime_ns, [], error=str(e))
+                num_failed += 1
+            else:
+                self._store_file(file_path, size, mtime_ns, hdu_list)
+
+            if num_done % COMMIT_INTERVAL == 0:
+                connection.commit()
+            if progress is not None:
+                progress(num_done, len(changed_files))
+            if check_cancelled is not None:
+                check_cancelled()
+
+        if jobs is None:
+            jobs = os.cpu_count()
+
+        try:
+            if (jobs <= 1) or (len(changed_files) <= 1):
+                for num_done, file_info in enumerate(changed_files, 1):
+                    store_result(file_info, lambda: read_file_index(file_info[0]), num_done)
+            else:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                    futures = []
+                    try:
+                        # Files are submitted by chunks so that a cancellation
+                        # doesn't wait for all the remaining files
+                        chunk_size = jobs * CRAWL_CHUNK_SIZE
+                        for start in range(0, len(changed_files), chunk_size):
+                            chunk = changed_files[start:start + chunk_size]
+                            futures = [executor.submit(read_file_index, file_path) for file_path, size, mtime_ns in chunk]
+                            for num_done, (file_info, future) in enumerate(zip(chunk, futures), start + 1):
+                                store_result(file_info, future.result, num_done)
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+        finally:
+            connection.commit()
+
+        return len(changed_files) - num_failed, num_unchanged, len(removed_file_ids), num_failed
+
+
+    def search(self, expressions, keywords=None, limit=None):
+        """
+        Return the list of the HDUs whose header matches all the given
+        expressions, ordered by file path and HDU index.
+
+        Expressions are "KEYWORD OPERATOR VALUE" strings, where OPERATOR is
+        one of ==, !=, <, <=, > and >=, e.g. "OBJECT == M31" or "EXPTIME >
+        30" (string values can be quoted).  Numbers are compared as numbers
+        and strings as strings (thus ISO dates can be compared).  With == and
+        !=, string values can contain the * and ? wildcards.
+
+        Each HDU is a dictionary: the file path, the HDU index, its type,
+        its shape, its dtype and the {keyword: value} dictionary of the
+        `keywords` of its header (of the keywords of the expressions if
+        `keywords` is None).
+        """
+        conditions = []
+        parameters = []
+        expression_keywords = []
+
+        for expression in expressions:
+            try:
+                keyword, operator, value_str = parse_filter(expression)
+            except ValueError:
+                raise ValueError("Invalid expression: {} (expected: KEYWORD OPERATOR VALUE, "
+                                 "e.g. OBJECT == M31)".format(expression))
+            keyword = keyword.upper()
+            value = get_sql_value(parse_value(value_str))
+
+            sql_operator = QUERY_OPERATORS[operator]
+            if sql_operator in ("=", "!=") and isinstance(value, str) and ("*" in value or "?" in value):
+                sql_operator = "GLOB" if sql_operator == "=" else "NOT GLOB"
+
+            conditions.append("EXISTS (SELECT 1 FROM keywords AS k "
+                              "WHERE k.file_id = h.file_id AND k.hdu = h.hdu "
+                              "AND k.keyword = ? AND k.value {} ?)".format(sql_operator))
+            parameters.extend((keyword, value))
+            expression_keywords.append(keyword)
+
+        if keywords is None:
+            keywords = list(dict.fromkeys(expression_keywords))
+
+        sql = ("SELECT h.file_id, f.path, h.hdu, h.type, h.shape, h.dtype "
+               "FROM hdus AS h JOIN files AS f ON f.id = h.file_id")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY f.path, h.hdu"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        connection = self.connection
+        result_list = []
+
+        for file_id, file_path, hdu_index, hdu_type, shape, dtype in connection.execute(sql, parameters).fetchall():
+            values = {}
+            if keywords:
+                cursor = connection.execute("SELECT keyword, value FROM keywords "
+                                            "WHERE file_id = ? AND hdu = ? AND keyword IN ({})".format(", ".join("?" * len(keywords))),
+                                            [file_id, hdu_index] + list(keywords))
+                found_values = dict(cursor.fetchall())
+                values = {keyword: found_values[keyword] for keyword in keywords if keyword in found_values}
+
+            result_list.append({"file": file_path,
+                                "hdu": hdu_index,
+                                "type": hdu_type,
+                                "shape": shape,
+                                "dtype": dtype,
+                                "header": values})
+
+        return result_list
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Background loading of data.
+
+A `Loader` runs loading tasks (reading, decompressing, computing statistics,
+...) in a pool of worker threads.  Results are queued and delivered by
+`Loader.process_results`, which is meant to be called periodically from the
+GUI thread (GUI toolkits are not thread-safe).
+
+Requests are grouped in channels: submitting a new request on a channel
+supersedes (cancels) the pending request of this channel.  The requests of
+background channels (e.g. prefetching) run in their own worker threads, thus
+they never delay the requests the user is waiting for.
+"""
+
+__all__ = ['Loader',
+           'Cancelled']
+
+import concurrent.futures
+import queue
+import threading
+
+###############################################################################
+
+LOADER_MAX_WORKERS = 2
+
+# The number of worker threads of the background channels (see Loader)
+LOADER_MAX_BACKGROUND_WORKERS = 2
+
+###############################################################################
+
+class Cancelled(Exception):
+    """
+    Raised by loading tasks that notice their request has been cancelled.
+    """
+    pass
+
+###############################################################################
+
+class Request:
+    """
+    A loading request (see `Loader.submit`).
+    """
+
+    def __init__(self, channel, callback, error_callback):
+        self.channel = channel
+        self.callback = callback
+        self.error_callback = error_callback
+        self.cancel_event = threading.Event()
+        self.future = None
+
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+    def check_cancelled(self):
+        """
+        Raise `Cancelled` if this request has been cancelled (to be called by
+        tasks between two loading steps).
+        """
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+###############################################################################
+
+class Loader:
+    """
+    Run loading tasks in worker threads and deliver their results in the
+    thread calling `process_results`.
+
+    The tasks of `background_channels` run in a separate pool of
+    `max_background_workers` threads.
+    """
+
+    def __init__(self,
+                 max_workers=LOADER_MAX_WORKERS,
+                 background_channels=(),
+                 max_background_workers=LOADER_MAX_BACKGROUND_WORKERS):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="fitsviewer-loader")
+        self._background_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_background_workers,
+                                                                          thread_name_prefix="fitsviewer-background")
+        self._background_channels = frozenset(background_channels)
+        self._results = queue.Queue()
+        self._pending_requests = {}         # channel -> Request
+        self._running_requests = set()      # The requests whose task isn't done (cancelled or not)
+        self._running_lock = threading.Lock()
+
+
+    def submit(self, task, callback, error_callback=None, channel="default"):
+        """
+        Run `task(request)` in a worker thread.
+
+        Once the task is done, `callback(result)` (or `error_callback(exception)`
+        if the task raised an exception) is called by `process_results`.  The
+        pending request of `channel` (if any) is cancelled: its callbacks will
+        never be called.  The task can call `request.check_cancelled()` to stop
+        early when it is superseded.
+
+        Return the `Request` object.
+        """
+        self.cancel(channel)
+
+        request = Request(channel, callback, error_callback)
+        self._pending_requests[channel] = request
+
+        if channel in self._background_channels:
+            executor = self._background_executor
+        else:
+            executor = self._executor
+
+        with self._running_lock:
+            self._running_requests.add(request)
+            request.future = executor.submit(self._run, task, request)
+        request.future.add_done_callback(lambda future: self._discard_running_request(request))
+
+        return request
+
+
+    def _discard_running_request(self, request):
+        with self._running_lock:
+            self._running_requests.discard(request)
+
+
+    def _run(self, task, request):
+        if request.cancelled:
+            return
+
+        try:
+            result = task(request)
+        except Cancelled:
+            return
+        except Exception as exception:
+            self._results.put((request, False, exception))
+        else:
+            self._results.put((request, True, result))
+
+
+    def cancel(self, channel=None, ignored_channels=()):
+        """
+        Cancel the pending request of `channel` (or all pending requests but
+        those of `ignored_channels` if `channel` is None).
+        """
+        if channel is None:
+            channels = [_channel for _channel in self._pending_requests if _channel not in ignored_channels]
+        else:
+            channels = [channel]
+
+        for _channel in channels:
+            request = self._pending_requests.pop(_channel, None)
+            if request is not None:
+                request.cancel()
+
+
+    def is_busy(self, channel=None, ignored_channels=()):
+        """
+        Return True if a request is pending on `channel` (or on any channel
+        but `ignored_channels` if `channel` is None).
+        """
+        if channel is None:
+            return any(_channel not in ignored_channels for _channel in self._pending_requests)
+        return channel in self._pending_requests
+
+
+    def call_when_done(self, func, ignored_channels=()):
+        """
+        Call `func()` once the tasks of all the requests but those of
+        `ignored_channels` are done, including the tasks of cancelled
+        requests (they stop at their next `request.check_cancelled()` call).
+
+        This doesn't block: `func` is called by the worker thread that runs
+        the last of these tasks (or right away if there are none).  This is
+        meant to close a file that tasks may still be reading.
+        """
+        with self._running_lock:
+            futures = [request.future for request in self._running_requests
+                       if request.channel not in ignored_channels]
+
+        if len(futures) == 0:
+            func()
+            return
+
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(future):
+            with lock:
+                remaining[0] -= 1
+                is_last = (remaining[0] == 0)
+            if is_last:
+                func()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+
+    def process_results(self):
+        """
+        Call the callbacks of the completed requests.
+
+        This should be called periodically from the thread that owns the GUI.
+        Results of cancelled requests are dropped.
+        """
+        while True:
+            try:
+                request, succeeded, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if self._pending_requests.get(request.channel) is not request:
+                continue     # cancelled or superseded
+
+            del self._pending_requests[request.channel]
+
+            if succeeded:
+                request.callback(result)
+            elif request.error_callback is not None:
+                request.error_callback(result)
+            else:
+                raise result
+
+
+    def shutdown(self):
+        """
+        Cancel all pending requests and stop the worker threads.
+        """
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._background_executor.shutdown(wait=False, cancel_futures=True)
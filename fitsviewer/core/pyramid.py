@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Multi-resolution (pyramid) representation of large 2D images.
+
+Level 0 is the full resolution image (usually a memory-mapped array); level
+`n` is the image downsampled by a factor 2**n in each dimension using a
+block mean or a block max.  Levels are built on demand, from the finest level
+already built and by chunks of rows, so that building a level never needs
+more memory than the level itself plus one chunk.
+"""
+
+__all__ = ['ImagePyramid',
+           'block_reduce']
+
+import math
+import warnings
+
+import numpy as np
+
+from fitsviewer.core.arrays import get_range
+
+###############################################################################
+
+DOWNSAMPLING_METHODS = ('mean', 'max')
+
+# The coarsest level is the first one whose both dimensions are smaller than
+# this value (in pixels)
+PYRAMID_MIN_SIZE = 256
+
+# Number of full resolution rows read at once when a level is built
+CHUNK_ROWS = 1024
+
+# Number of (level) pixels kept around the visible viewport so that small pans
+# don't need a new view
+VIEWPORT_MARGIN = 32
+
+###############################################################################
+
+def block_reduce(image_array, factor, method='mean'):
+    """
+    Downsample the 2D array `image_array` by `factor` in each dimension.
+
+    Each output pixel is the mean (or the max, depending on `method`) of the
+    corresponding `factor` x `factor` block of input pixels; NaN values are
+    ignored and the borders are padded with NaN when the image dimensions are
+    not multiples of `factor`.  The result is a float32 array.
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError("Unknown downsampling method: {}".format(method))
+
+    num_rows, num_cols = image_array.shape
+    out_rows = int(math.ceil(num_rows / factor))
+    out_cols = int(math.ceil(num_cols / factor))
+
+    reduced_array = np.empty((out_rows, out_cols), dtype=np.float32)
+
+    # Process whole blocks of rows to keep the memory footprint bounded
+    chunk_rows = max(1, CHUNK_ROWS // factor) * factor
+
+    for row_start in range(0, num_rows, chunk_rows):
+        chunk = np.asarray(image_array[row_start:row_start + chunk_rows], dtype=np.float32)
+
+        pad_rows = -chunk.shape[0] % factor
+        pad_cols = -num_cols % factor
+        if pad_rows or pad_cols:
+            chunk = np.pad(chunk, ((0, pad_rows), (0, pad_cols)),
+                           mode='constant', constant_values=np.nan)
+
+        blocks = chunk.reshape(chunk.shape[0] // factor, factor,
+                               chunk.shape[1] // factor, factor)
+
+        with warnings.catch_warnings():
+            # All-NaN blocks are expected (padding, masked areas)
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            if method == 'mean':
+                reduced_chunk = np.nanmean(blocks, axis=(1, 3))
+            else:
+                reduced_chunk = np.nanmax(blocks, axis=(1, 3))
+
+        out_start = row_start // factor
+        reduced_array[out_start:out_start + reduced_chunk.shape[0]] = reduced_chunk
+
+    return reduced_array
+
+###############################################################################
+
+class ImagePyramid:
+    """
+    Multi-resolution pyramid of a 2D image.
+
+    The pyramid gives views of the image that are just large enough for the
+    area of the screen where they are displayed (see `get_view`).
+    """
+
+    def __init__(self, image_array, method='mean', min_size=PYRAMID_MIN_SIZE):
+        if image_array.ndim != 2:
+            raise ValueError("The image should be a 2D array.")
+
+        if method not in DOWNSAMPLING_METHODS:
+            raise ValueError("Unknown downsampling method: {}".format(method))
+
+        self.image_array = image_array
+        self.method = method
+        self.levels = {0: image_array}     # The levels built so far (level -> array)
+        self._range = None
+
+        # Number of levels (the coarsest level is smaller than min_size)
+        max_dim = max(image_array.shape)
+        self.num_levels = 1
+        while (max_dim > min_size) and (max_dim > 1):
+            max_dim = int(math.ceil(max_dim / 2))
+            self.num_levels += 1
+
+
+    @property
+    def shape(self):
+        """The shape of the full resolution image."""
+        return self.image_array.shape
+
+
+    def get_level(self, level):
+        """
+        Return the image at the given pyramid level (built on first call).
+        """
+        if not (0 <= level < self.num_levels):
+            raise ValueError("Invalid pyramid level: {}".format(level))
+
+        if level not in self.levels:
+            # Build the level from the finest level built so far
+            finer_level = max(_level for _level in self.levels if _level < level)
+            self.levels[level] = block_reduce(self.levels[finer_level],
+                                              2**(level - finer_level),
+                                              self.method)
+
+        return self.levels[level]
+
+
+    def get_level_shape(self, level):
+        """
+        Return the shape of the image at the given pyramid level (the level
+        isn't built).
+        """
+        factor = 2**level
+        return tuple(int(math.ceil(dim / factor)) for dim in self.shape)
+
+
+    def select_level_for_size(self, max_size):
+        """
+        Return the finest level whose both dimensions are smaller than
+        `max_size` (or the coarsest level).
+        """
+        for level in range(self.num_levels):
+            if max(self.get_level_shape(level)) <= max_size:
+                return level
+        return self.num_levels - 1
+
+
+    def set_range(self, value_range):
+        """
+        Set the (min, max) values of the full resolution image (e.g. when they
+        have been computed before, see `get_range`).
+        """
+        self._range = (float(value_range[0]), float(value_range[1]))
+
+
+    def get_range(self):
+        """
+        Return the (min, max) values of the full resolution image.
+
+        NaN values are ignored.  The image is scanned by chunks the first time
+        this method is called.
+        """
+        if self._range is None:
+            self._range = get_range(self.image_array)
+
+        return self._range
+
+
+    def select_level(self, viewport_width, viewport_height, screen_width, screen_height):
+        """
+        Return the coarsest level that still has (at least) one pixel per
+        screen pixel when a viewport of `viewport_width` x `viewport_height`
+        full resolution pixels is displayed on `screen_width` x
+        `screen_height` screen pixels.
+
+        The image is displayed with its aspect ratio preserved, thus the
+        displayed scale is given by the most constraining dimension.
+        """
+        if (screen_width <= 0) or (screen_height <= 0):
+            return self.num_levels - 1
+
+        factor = max(viewport_width / screen_width, viewport_height / screen_height)
+
+        if factor < 2:
+            return 0
+
+        return min(int(math.log2(factor)), self.num_levels - 1)
+
+
+    def get_view_window(self, xlim=None, ylim=None, screen_width=None, screen_height=None, tile_size=None):
+        """
+        Return the (level, window) pair to display the (xlim, ylim) viewport
+        on a `screen_width` x `screen_height` pixels area (see `get_view`).
+
+        `window` is the (row_start, row_stop, col_start, col_stop) part of
+        the level to display: the visible part plus a small margin, aligned
+        on the grid of `tile_size` x `tile_size` tiles of the level if
+        `tile_size` is given.
+        """
+        num_rows, num_cols = self.shape
+
+        if xlim is None:
+            xlim = (-0.5, num_cols - 0.5)
+        if ylim is None:
+            ylim = (-0.5, num_rows - 0.5)
+
+        x_min, x_max = sorted(xlim)
+        y_min, y_max = sorted(ylim)
+
+        if (screen_width is None) or (screen_height is None):
+            level = 0
+        else:
+            level = self.select_level(x_max - x_min, y_max - y_min,
+                                      screen_width, screen_height)
+
+        factor = 2**level
+        level_rows, level_cols = self.get_level_shape(level)
+
+        # Visible part of the level (+ margin)
+        col_start = int(math.floor((x_min + 0.5) / factor)) - VIEWPORT_MARGIN
+        col_stop = int(math.ceil((x_max + 0.5) / factor)) + VIEWPORT_MARGIN
+        row_start = int(math.floor((y_min + 0.5) / factor)) - VIEWPORT_MARGIN
+        row_stop = int(math.ceil((y_max + 0.5) / factor)) + VIEWPORT_MARGIN
+
+        if tile_size is not None:
+            col_start = (col_start // tile_size) * tile_size
+            col_stop = -(-col_stop // tile_size) * tile_size
+            row_start = (row_start // tile_size) * tile_size
+            row_stop = -(-row_stop // tile_size) * tile_size
+
+        col_start = min(max(col_start, 0), level_cols - 1)
+        col_stop = min(max(col_stop, col_start + 1), level_cols)
+        row_start = min(max(row_start, 0), level_rows - 1)
+        row_stop = min(max(row_stop, row_start + 1), level_rows)
+
+        if tile_size is not None:
+            # Keep the window on the tile grid when it is clamped
+            col_start -= col_start % tile_size
+            row_start -= row_start % tile_size
+
+        return level, (row_start, row_stop, col_start, col_stop)
+
+
+    @staticmethod
+    def get_window_extent(level, window):
+        """
+        Return the (left, right, bottom, top) position of the `window` of
+        `level` (see `get_view_window`) in full resolution pixel coordinates.
+        """
+        factor = 2**level
+        row_start, row_stop, col_start, col_stop = window
+
+        return (col_start * factor - 0.5,
+                col_stop * factor - 0.5,
+                row_start * factor - 0.5,
+                row_stop * factor - 0.5)
+
+
+    def get_view(self, xlim=None, ylim=None, screen_width=None, screen_height=None):
+        """
+        Return the (image, extent) pair to display the (xlim, ylim) viewport
+        on a `screen_width` x `screen_height` pixels area.
+
+        `xlim` and `ylim` are in full resolution pixel coordinates (pixel
+        centers are at integer positions, as with matplotlib's imshow); the
+        whole image is used if they are None.  The returned image is the
+        visible part (plus a small margin) of the most appropriate pyramid
+        level and `extent` is its (left, right, bottom, top) position in full
+        resolution pixel coordinates.
+        """
+        level, window = self.get_view_window(xlim, ylim, screen_width, screen_height)
+        row_start, row_stop, col_start, col_stop = window
+
+        view_array = self.get_level(level)[row_start:row_stop, col_start:col_stop]
+
+        return view_array, self.get_window_extent(level, window)
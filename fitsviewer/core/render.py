@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+The data needed to render an image plane.
+"""
+
+__all__ = ['RenderData',
+           'get_owned_nbytes']
+
+import json
+import threading
+
+import numpy as np
+
+from fitsviewer.core.cache import LRUCache
+from fitsviewer.core.colormap import get_index_dtype, quantize, DEFAULT_LUT_SIZE
+from fitsviewer.core.histogram import compute_histogram
+from fitsviewer.core.pyramid import ImagePyramid
+from fitsviewer.core.scaling import Scaling, get_interval, normalize
+from fitsviewer.core.stats import Statistics, compute_statistics
+
+###############################################################################
+
+# The size (in pyramid level pixels) of the square tiles the displayed views
+# are made of
+TILE_SIZE = 256
+
+# The maximum amount of memory used to keep the quantized tiles of a plane
+TILE_CACHE_MAX_BYTES = 32 * 2**20
+
+# The maximum size (in pixels) of the downsampled previews of planes (see
+# RenderData.get_preview)
+PREVIEW_MAX_SIZE = 1024
+
+###############################################################################
+
+def get_owned_nbytes(array):
+    """
+    Return the memory size (in bytes) of `array` if it owns its data, 0 if
+    it is a view on another array (e.g. on the data of an HDU), a
+    memory-mapped array or a lazily read plane (see
+    `fitsviewer.core.hdu.PlaneSection`).
+    """
+    if isinstance(array, np.ndarray) and array.flags.owndata and not isinstance(array, np.memmap):
+        return array.nbytes
+    return 0
+
+###############################################################################
+
+class RenderData:
+    """
+    Everything computed from one image plane to display it: the plane itself,
+    its statistics, its histograms, its pyramid, the quantized (normalised)
+    tiles of the last displayed views and the last displayed view itself.
+
+    Everything but the plane is computed lazily (on first use) and kept, thus
+    a `RenderData` object is meant to be stored in a cache (see
+    `fitsviewer.core.cache.LRUCache`) and reused each time the plane is
+    redrawn.
+
+    1D images are handled as 2D images with a single row.
+
+    The lazy computations are serialized with a lock, thus a `RenderData`
+    object can be prepared in a worker thread while it is used in the GUI
+    thread.
+    """
+
+    def __init__(self, image_array, downsampling_method='mean'):
+        if image_array.ndim == 1:
+            image_array = image_array.reshape(1, -1)
+
+        self.image_array = image_array
+        self.pyramid = ImagePyramid(image_array, method=downsampling_method)
+
+        self._histograms = {}          # num_bins -> (counts, bin_edges)
+        self._index_view = None        # (view_key, index_array, extent)
+        self._tiles = LRUCache(TILE_CACHE_MAX_BYTES)   # (level, row, col, lut_size, scaling) -> index tile
+        self._statistics = None
+        self._intervals = {}           # (interval, percent) -> (vmin, vmax)
+        self._lock = threading.RLock()
+
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by this object (in bytes).
+
+        Only the arrays this object owns are counted: the plane is usually a
+        view on the (memory-mapped) data of the HDU, which doesn't belong to
+        it.
+        """
+        nbytes = get_owned_nbytes(self.image_array)
+        nbytes += sum(level.nbytes for level in self.pyramid.levels.values() if level is not self.image_array)
+        nbytes += sum(counts.nbytes + bin_edges.nbytes for counts, bin_edges in self._histograms.values())
+        if self._index_view is not None:
+            nbytes += self._index_view[1].nbytes
+        nbytes += self._tiles.nbytes
+        return nbytes
+
+
+    def get_value_range(self):
+        """
+        Return the (min, max) values of the plane (NaN values are ignored).
+        """
+        with self._lock:
+            return self.pyramid.get_range()
+
+
+    def get_interval(self, scaling):
+        """
+        Return the (vmin, vmax) interval of displayed values for the given
+        `fitsviewer.core.scaling.Scaling`.
+        """
+        interval_key = (scaling.interval, scaling.percent)
+
+        with self._lock:
+            if interval_key not in self._intervals:
+                self._intervals[interval_key] = get_interval(self.image_array,
+                                                             interval=scaling.interval,
+                                                             percent=scaling.percent,
+                                                             value_range=self.get_value_range())
+            return self._intervals[interval_key]
+
+
+    def get_statistics(self, check_cancelled=None):
+        """
+        Return the `fitsviewer.core.stats.Statistics` of the plane.
+
+        The statistics are computed (by blocks) without holding the lock of
+        this object, thus the plane can still be drawn in the meantime;
+        `check_cancelled` is passed to `compute_statistics`.
+        """
+        if self._statistics is None:
+            self._statistics = compute_statistics(self.image_array,
+                                                  check_cancelled=check_cancelled)
+        return self._statistics
+
+
+    def has_histogram(self, num_bins):
+        """
+        Return True if the histogram with `num_bins` bins is already computed.
+        """
+        return num_bins in self._histograms
+
+
+    def get_histogram(self, num_bins):
+        """
+        Return the (counts, bin_edges) histogram of the plane.
+        """
+        with self._lock:
+            if num_bins not in self._histograms:
+                self._histograms[num_bins] = compute_histogram(self.image_array,
+                                                               num_bins=num_bins,
+                                                               value_range=self.get_value_range())
+            return self._histograms[num_bins]
+
+
+    def get_preview(self):
+        """
+        Return the data computed from the plane that is worth keeping on disk
+        (see `fitsviewer.core.cache.DiskCache`), as a dictionary of arrays:
+        its shape, its value range, a downsampled preview (the finest
+        pyramid level smaller than PREVIEW_MAX_SIZE), the histograms and the
+        statistics computed so far.
+        """
+        with self._lock:
+            level = self.pyramid.select_level_for_size(PREVIEW_MAX_SIZE)
+
+            preview = {
+                    "shape": np.array(self.pyramid.shape),
+                    "value_range": np.array(self.get_value_range()),
+                    "level": np.array(level),
+                    "image": np.asarray(self.pyramid.get_level(level))
+                }
+
+            for num_bins, (counts, bin_edges) in self._histograms.items():
+                preview["histogram_counts_{}".format(num_bins)] = counts
+                preview["histogram_edges_{}".format(num_bins)] = bin_edges
+
+            if self._statistics is not None:
+                preview["statistics"] = np.array(json.dumps(self._statistics.as_dict()))
+
+        return preview
+
+
+    def set_preview(self, preview):
+        """
+        Reuse the data of a preview of this plane (see `get_preview`): the
+        value range, the histograms and the statistics are not computed
+        again, and the views of the preview level (and of the coarser ones)
+        don't read the plane.
+        """
+        with self._lock:
+            if tuple(preview["shape"]) != tuple(self.pyramid.shape):
+                return
+
+            self.pyramid.set_range(preview["value_range"])
+
+            level = int(preview["level"])
+            if level not in self.pyramid.levels:
+                self.pyramid.levels[level] = preview["image"]
+
+            for name in preview:
+                if name.startswith("histogram_counts_"):
+                    num_bins = int(name[len("histogram_counts_"):])
+                    self._histograms.setdefault(num_bins, (preview[name],
+                                                           preview["histogram_edges_{}".format(num_bins)]))
+
+            if ("statistics" in preview) and (self._statistics is None):
+                self._statistics = Statistics.from_dict(json.loads(str(preview["statistics"])))
+
+
+    def has_preview_data(self, preview, num_bins=None):
+        """
+        Return False if this object has computed data that is missing in
+        `preview` (thus the preview should be updated).
+        """
+        if preview is None:
+            return False
+        if (self._statistics is not None) and ("statistics" not in preview):
+            return False
+        return all("histogram_counts_{}".format(num_bins) in preview for num_bins in self._histograms)
+
+
+    def get_view(self, xlim=None, ylim=None, screen_width=None, screen_height=None,
+                 lut_size=DEFAULT_LUT_SIZE, scaling=Scaling()):
+        """
+        Return the (index_array, extent) pair to display the (xlim, ylim)
+        viewport on a `screen_width` x `screen_height` pixels area.
+
+        `index_array` is the suitable part of the suitable pyramid level (see
+        `ImagePyramid.get_view_window`) with values normalized according to
+        `scaling` (see `fitsviewer.core.scaling`) then quantized on `lut_size`
+        levels (see `fitsviewer.core.colormap.quantize`): it is meant to be
+        colored with `fitsviewer.core.colormap.apply_lut`.
+
+        Views are made of TILE_SIZE x TILE_SIZE tiles of the pyramid level,
+        which are quantized once and cached: when the viewport is panned,
+        only the tiles that were not displayed recently are read and
+        quantized.  The same `index_array` object is returned as long as the
+        view doesn't change.
+        """
+        with self._lock:
+            level, window = self.pyramid.get_view_window(xlim, ylim, screen_width, screen_height,
+                                                         tile_size=TILE_SIZE)
+
+            view_key = (level, window, lut_size, scaling)
+
+            if (self._index_view is None) or (self._index_view[0] != view_key):
+                index_array = self._get_tiled_view(level, window, lut_size, scaling)
+                self._index_view = (view_key, index_array, self.pyramid.get_window_extent(level, window))
+
+            return self._index_view[1], self._index_view[2]
+
+
+    def _get_tiled_view(self, level, window, lut_size, scaling):
+        """
+        Return the quantized `window` of the pyramid `level`, assembled from
+        (cached) tiles.
+        """
+        level_array = self.pyramid.get_level(level)
+        row_start, row_stop, col_start, col_stop = window
+
+        index_array = np.empty((row_stop - row_start, col_stop - col_start),
+                               dtype=get_index_dtype(lut_size))
+
+        vmin, vmax = None, None
+
+        for tile_row in range(row_start, row_stop, TILE_SIZE):
+            for tile_col in range(col_start, col_stop, TILE_SIZE):
+                tile_key = (level, tile_row, tile_col, lut_size, scaling)
+                tile = self._tiles.get(tile_key)
+
+                if tile is None:
+                    if vmin is None:
+                        vmin, vmax = self.get_interval(scaling)
+
+                    # Only this tile is read (e.g. from a memory-mapped file)
+                    tile_array = level_array[tile_row:tile_row + TILE_SIZE, tile_col:tile_col + TILE_SIZE]
+                    tile = quantize(normalize(tile_array, vmin, vmax, scaling.scale), lut_size)
+                    self._tiles.put(tile_key, tile)
+
+                index_array[tile_row - row_start:tile_row - row_start + tile.shape[0],
+                            tile_col - col_start:tile_col - col_start + tile.shape[1]] = tile
+
+        return index_array
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Intensity scaling of images: interval estimation and stretch.
+
+Images are displayed (or converted) in two steps:
+
+1. an interval (vmin, vmax) of pixel values is chosen: the whole range
+   ("minmax"), the DS9-like "zscale" interval or a central "percentile"
+   interval;
+2. values are mapped from (vmin, vmax) to [0, 1] and stretched ("linear",
+   "sqrt", "log" or "asinh").
+
+The "zscale" and "percentile" intervals are estimated on a bounded sample of
+pixels (see `sample_pixels`), thus their cost doesn't depend on the size of
+the image.
+"""
+
+__all__ = ['Scaling',
+           'sample_pixels',
+           'get_interval',
+           'normalize',
+           'get_stretch_functions']
+
+import collections
+import math
+
+import numpy as np
+
+from fitsviewer.core.arrays import get_range
+
+###############################################################################
+
+INTERVALS = ('minmax', 'zscale', 'percentile')
+SCALES = ('linear', 'sqrt', 'log', 'asinh')
+
+DEFAULT_INTERVAL = 'minmax'
+DEFAULT_SCALE = 'linear'
+
+# The percentage of pixels kept in the "percentile" interval
+DEFAULT_PERCENT = 99.5
+
+# The maximum number of pixels used to estimate the "zscale" and
+# "percentile" intervals
+DEFAULT_MAX_SAMPLES = 100000
+
+# The zscale algorithm (iterative fit with rejection) is much more expensive
+# per pixel: it uses at most this number of pixels of the sample
+ZSCALE_MAX_SAMPLES = 10000
+
+# Parameters of the "log" and "asinh" stretches (as in DS9)
+LOG_EXPONENT = 1000.
+ASINH_SOFTENING = 0.1
+
+###############################################################################
+
+class Scaling(collections.namedtuple('Scaling', ('scale', 'interval', 'percent'))):
+    """
+    The scaling parameters of an image: the stretch `scale`, the `interval`
+    estimator and the `percent` of pixels kept by the "percentile" interval.
+    """
+    __slots__ = ()
+
+    def __new__(cls, scale=DEFAULT_SCALE, interval=DEFAULT_INTERVAL, percent=DEFAULT_PERCENT):
+        if scale not in SCALES:
+            raise ValueError("Unknown scale: {}".format(scale))
+        if interval not in INTERVALS:
+            raise ValueError("Unknown interval: {}".format(interval))
+        return super().__new__(cls, scale, interval, percent)
+
+###############################################################################
+
+def sample_pixels(image_array, max_samples=DEFAULT_MAX_SAMPLES):
+    """
+    Return a 1D sample of (about) `max_samples` finite values of `image_array`.
+
+    Pixels are taken on evenly spaced columns of evenly spaced rows, thus
+    only a few rows have to be read from (memory-mapped or compressed) files.
+    `image_array` can be a Numpy array or an Astropy `hdu.section`.
+    """
+    shape = image_array.shape
+    num_cols = shape[-1]
+    num_rows = int(np.prod(shape[:-1]))
+
+    if num_rows * num_cols <= max_samples:
+        sample = np.asarray(image_array[...])
+    else:
+        # About sqrt(max_samples) rows and columns, adapted to the image aspect
+        cols_per_row = min(num_cols, max(1, int(math.sqrt(max_samples * num_cols / num_rows))))
+        num_sampled_rows = min(num_rows, max(1, max_samples // cols_per_row))
+
+        row_indices = np.unique(np.linspace(0, num_rows - 1, num_sampled_rows).astype(np.int64))
+        col_indices = np.unique(np.linspace(0, num_cols - 1, cols_per_row).astype(np.int64))
+
+        if isinstance(image_array, np.ndarray) and image_array.flags.c_contiguous:
+            # Only the sampled pixels are read
+            sample = image_array.reshape(num_rows, num_cols)[row_indices[:, np.newaxis], col_indices]
+        else:
+            # Read the sampled rows one by one
+            sample = np.concatenate([np.asarray(image_array[np.unravel_index(row_index, shape[:-1]) + (slice(None),)])[col_indices]
+                                     for row_index in row_indices])
+
+    sample = sample.ravel()
+
+    if np.issubdtype(sample.dtype, np.floating):
+        sample = sample[np.isfinite(sample)]
+
+    return sample
+
+
+def get_interval(image_array,
+                 interval=DEFAULT_INTERVAL,
+                 percent=DEFAULT_PERCENT,
+                 max_samples=DEFAULT_MAX_SAMPLES,
+                 value_range=None):
+    """
+    Return the (vmin, vmax) interval of pixel values to display.
+
+    `interval` is one of:
+
+    - "minmax": the range of the finite values of the image (the whole image
+      is read unless `value_range` is given);
+    - "zscale": the DS9/IRAF zscale interval estimated on a sample of
+      `max_samples` pixels (at most ZSCALE_MAX_SAMPLES of them are used by
+      the fit);
+    - "percentile": the central interval containing `percent` % of the
+      pixels, estimated on a sample of `max_samples` pixels.
+    """
+    if interval not in INTERVALS:
+        raise ValueError("Unknown interval: {}".format(interval))
+
+    if interval == 'minmax':
+        if value_range is None:
+            value_range = get_range(image_array)
+        return value_range
+
+    sample = sample_pixels(image_array, max_samples)
+
+    if sample.size == 0:
+        return (0., 1.)
+
+    if interval == 'zscale':
+        from astropy.visualization import ZScaleInterval
+        zscale = ZScaleInterval(n_samples=min(sample.size, ZSCALE_MAX_SAMPLES))
+        vmin, vmax = zscale.get_limits(sample)
+    else:
+        vmin, vmax = np.percentile(sample, [(100. - percent) / 2., (100. + percent) / 2.])
+
+    return float(vmin), float(vmax)
+
+###############################################################################
+
+def _log_stretch(x):
+    return np.log10(LOG_EXPONENT * x + 1.) / math.log10(LOG_EXPONENT + 1.)
+
+def _log_stretch_inverse(y):
+    return (np.power(LOG_EXPONENT + 1., y) - 1.) / LOG_EXPONENT
+
+def _asinh_stretch(x):
+    return np.arcsinh(x / ASINH_SOFTENING) / math.asinh(1. / ASINH_SOFTENING)
+
+def _asinh_stretch_inverse(y):
+    return np.sinh(y * math.asinh(1. / ASINH_SOFTENING)) * ASINH_SOFTENING
+
+STRETCH_FUNCTIONS = {
+        'linear': (lambda x: x, lambda y: y),
+        'sqrt': (np.sqrt, np.square),
+        'log': (_log_stretch, _log_stretch_inverse),
+        'asinh': (_asinh_stretch, _asinh_stretch_inverse)
+    }
+
+
+def get_stretch_functions(scale):
+    """
+    Return the (forward, inverse) stretch functions of `scale` (both map
+    [0, 1] to [0, 1]).
+    """
+    if scale not in STRETCH_FUNCTIONS:
+        raise ValueError("Unknown scale: {}".format(scale))
+    return STRETCH_FUNCTIONS[scale]
+
+
+def normalize(image_array, vmin, vmax, scale=DEFAULT_SCALE):
+    """
+    Return a float32 copy of `image_array` with values mapped from
+    (vmin, vmax) to [0, 1] (values out of the interval are clipped) then
+    stretched according to `scale`.  NaN values are kept.
+    """
+    normalized_array = np.subtract(image_array, vmin, dtype=np.float32)
+
+    if vmax > vmin:
+        normalized_array *= np.float32(1. / (vmax - vmin))
+
+    np.clip(normalized_array, 0., 1., out=normalized_array)
+
+    if scale != 'linear':
+        normalized_array = get_stretch_functions(scale)[0](normalized_array).astype(np.float32, copy=False)
+
+    return normalized_array
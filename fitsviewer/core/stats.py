@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Streaming statistics of (possibly huge) images.
+
+Statistics are computed by blocks (see `fitsviewer.core.arrays.iter_chunks`)
+so that the memory used doesn't depend on the size of the image: cubes larger
+than the physical memory can be processed.  Percentiles are approximated with
+a fixed size histogram.
+"""
+
+__all__ = ['Statistics',
+           'compute_statistics']
+
+import numpy as np
+
+from fitsviewer.core.arrays import iter_chunks, CHUNK_SIZE
+from fitsviewer.core.histogram import compute_histogram
+
+###############################################################################
+
+DEFAULT_PERCENTILES = (1., 5., 25., 50., 75., 95., 99.)
+
+# The number of bins of the histogram used to approximate percentiles
+PERCENTILE_BINS = 2**14
+
+###############################################################################
+
+class Statistics:
+    """
+    The statistics of an image (NaN and infinite values are ignored, except
+    in `num_nan` and `num_inf`).
+    """
+
+    def __init__(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.num_values = 0          # The number of finite values
+        self.num_nan = 0
+        self.num_inf = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.mean = np.nan
+        self.var = np.nan
+        self.percentiles = {}        # percent -> (approximate) value
+
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+
+    def as_dict(self):
+        """
+        Return the statistics as an (ordered) dictionary of basic Python types.
+        """
+        stats_dict = {
+                "shape": list(self.shape),
+                "dtype": self.dtype.name,
+                "num_values": self.num_values,
+                "num_nan": self.num_nan,
+                "num_inf": self.num_inf,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.mean,
+                "std": self.std,
+                "var": self.var
+            }
+
+        for percent, value in sorted(self.percentiles.items()):
+            stats_dict["p{:g}".format(percent)] = value
+
+        return stats_dict
+
+
+    @classmethod
+    def from_dict(cls, stats_dict):
+        """
+        Return the Statistics described by `stats_dict` (see `as_dict`).
+        """
+        stats = cls(stats_dict["shape"], stats_dict["dtype"])
+
+        for key in ("num_values", "num_nan", "num_inf", "min", "max", "mean", "var"):
+            setattr(stats, key, stats_dict[key])
+
+        for key, value in stats_dict.items():
+            if key.startswith("p") and key != "percentiles":
+                stats.percentiles[float(key[1:])] = value
+
+        return stats
+
+
+    def format_items(self):
+        """
+        Return the statistics as a list of (name, formatted value) pairs.
+        """
+        items = []
+        for key, value in self.as_dict().items():
+            if key == "shape":
+                value = "x".join([str(dim) for dim in value])
+            elif isinstance(value, float):
+                value = "{:.6g}".format(value)
+            items.append((key, str(value)))
+        return items
+
+
+    def __str__(self):
+        return "\n".join(["{:12s}{}".format(key + ":", value) for key, value in self.format_items()])
+
+###############################################################################
+
+def compute_statistics(image_array,
+                       percentiles=DEFAULT_PERCENTILES,
+                       num_bins=PERCENTILE_BINS,
+                       chunk_size=CHUNK_SIZE,
+                       check_cancelled=None):
+    """
+    Compute the statistics of `image_array` by blocks of `chunk_size` values.
+
+    `image_array` can be a Numpy array (possibly memory-mapped) or an Astropy
+    `hdu.section`.  The data is read twice: once for the min, max, mean,
+    variance and number of NaN values (blocks are merged with Chan's parallel
+    algorithm), then once for the histogram of `num_bins` bins used to
+    approximate the requested `percentiles` (in [0, 100]).
+
+    If given, `check_cancelled` is called after each block (e.g. to stop the
+    computation by raising an exception).
+
+    Return a `Statistics` object.
+    """
+    stats = Statistics(image_array.shape, image_array.dtype)
+
+    num_values = 0
+    min_val, max_val = np.inf, -np.inf
+    mean, m2 = 0., 0.
+
+    for chunk in iter_chunks(image_array, chunk_size):
+        if np.issubdtype(chunk.dtype, np.floating):
+            nan_mask = np.isnan(chunk)
+            inf_mask = np.isinf(chunk)
+            stats.num_nan += int(np.count_nonzero(nan_mask))
+            stats.num_inf += int(np.count_nonzero(inf_mask))
+            if stats.num_nan or stats.num_inf:
+                chunk = chunk[~(nan_mask | inf_mask)]
+
+        if chunk.size > 0:
+            chunk = chunk.astype(np.float64).ravel()
+
+            chunk_num_values = chunk.size
+            chunk_mean = chunk.mean()
+            chunk_m2 = np.square(chunk - chunk_mean).sum()
+
+            # Merge the block statistics (Chan et al.)
+            total = num_values + chunk_num_values
+            delta = chunk_mean - mean
+            mean += delta * chunk_num_values / total
+            m2 += chunk_m2 + delta**2 * num_values * chunk_num_values / total
+            num_values = total
+
+            min_val = min(min_val, chunk.min())
+            max_val = max(max_val, chunk.max())
+
+        if check_cancelled is not None:
+            check_cancelled()
+
+    if num_values == 0:
+        return stats
+
+    stats.num_values = num_values
+    stats.min = float(min_val)
+    stats.max = float(max_val)
+    stats.mean = float(mean)
+    stats.var = float(m2 / num_values)
+
+    # Approximate percentiles ###################
+
+    if len(percentiles) > 0:
+        counts, bin_edges = compute_histogram(image_array,
+                                              num_bins=num_bins,
+                                              value_range=(stats.min, stats.max))
+
+        # Linear interpolation of the cumulative distribution within bins
+        cdf = np.concatenate(([0.], np.cumsum(counts, dtype=np.float64)))
+        cdf /= cdf[-1]
+
+        for percent in percentiles:
+            value = np.interp(percent / 100., cdf, bin_edges)
+            stats.percentiles[percent] = float(min(max(value, stats.min), stats.max))
+
+    return stats
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Paged access to the rows of table HDUs.
+
+The rows of binary tables are read from a memory-mapped view of the raw
+records (not through `hdu.data`, which scans the whole table when it is
+built): only the requested rows are read and converted (scaling, logical
+and string columns), thus displaying rows doesn't depend on the number of
+rows of the table.
+
+Rows can be sorted by a column and filtered by an expression on a column
+("ENERGY > 100"); the row orders are computed with vectorized Numpy
+functions (by chunks of rows when possible) and cached.
+"""
+
+__all__ = ['TableData',
+           'parse_filter']
+
+import re
+import threading
+
+import numpy as np
+
+from fitsviewer.core.cache import LRUCache
+from fitsviewer.core.compression import is_gzip_file
+
+###############################################################################
+
+# The maximum amount of memory used to keep the row orders (sorted and
+# filtered rows) of a table
+TABLE_CACHE_MAX_BYTES = 512 * 2**20
+
+# The number of rows read at once to scan columns
+ROW_CHUNK_SIZE = 2**20
+
+# The maximum number of values shown for each cell of vector columns
+MAX_CELL_VALUES = 8
+
+FILTER_OPERATORS = {
+        "==": np.equal,
+        "=": np.equal,
+        "!=": np.not_equal,
+        "<": np.less,
+        "<=": np.less_equal,
+        ">": np.greater,
+        ">=": np.greater_equal
+    }
+
+FILTER_REGEX = re.compile(r"^\s*(\S+?)\s*(==|!=|<=|>=|=|<|>)\s*(.+?)\s*$")
+
+###############################################################################
+
+def parse_filter(expression):
+    """
+    Return the (column name, operator, value) tuple of a filter expression
+    such as "ENERGY > 100" or "NAME == 'abc'".
+    """
+    match = FILTER_REGEX.match(expression)
+    if match is None:
+        raise ValueError("Invalid filter: {} (expected: COLUMN OPERATOR VALUE, "
+                         "e.g. ENERGY > 100)".format(expression))
+
+    column_name, operator, value = match.groups()
+
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+
+    return column_name, operator, value
+
+
+def format_value(value):
+    """
+    Return the string displayed for a cell.
+    """
+    if isinstance(value, bytes):
+        return value.decode("ascii", errors="replace").rstrip()
+
+    if isinstance(value, np.ndarray):
+        values = value.ravel()
+        text = " ".join(format_value(item) for item in values[:MAX_CELL_VALUES])
+        if values.size > MAX_CELL_VALUES:
+            text += " ..."
+        return text
+
+    if isinstance(value, (float, np.floating)):
+        return "{:.7g}".format(value)
+
+    return str(value)
+
+
+class TableData:
+    """
+    The rows of a table HDU, possibly sorted and filtered (see `set_order`).
+
+    Rows are read on demand (see `get_rows`) from the memory-mapped file
+    `file_path` (the file the HDU list has been opened from), or through
+    `hdu.data` for tables that can't be memory-mapped (ASCII tables,
+    compressed files, ...).
+    """
+
+    def __init__(self, hdu, file_path=None):
+        from astropy.io import fits
+
+        self.hdu = hdu
+        self.columns = hdu.columns                    # From the header only
+        self.column_names = list(self.columns.names)
+        self.num_rows = hdu.header.get('NAXIS2', 0)
+
+        # The displayed rows (None for all rows, in the file order) and how
+        # they have been sorted and filtered (see get_order)
+        self.order = None
+        self.sort_column = None
+        self.descending = False
+        self.filter_expression = None
+
+        self._orders = LRUCache(TABLE_CACHE_MAX_BYTES)   # ("sort", name, descending) or ("filter", expression) -> rows
+        self._lock = threading.Lock()
+
+        # The raw records (big-endian, as in the file)
+        self._records = None
+
+        if (file_path is not None) and isinstance(hdu, fits.BinTableHDU) and not is_gzip_file(file_path):
+            dtype = self.columns.dtype.newbyteorder('>')
+            if (dtype.itemsize == hdu.header.get('NAXIS1')) and (self.num_rows > 0):
+                self._records = np.memmap(file_path,
+                                          dtype=dtype,
+                                          mode='r',
+                                          offset=hdu.fileinfo()['datLoc'],
+                                          shape=(self.num_rows,))
+
+
+    @property
+    def nbytes(self):
+        """The memory used by this object (in bytes), the file data excepted."""
+        nbytes = self._orders.nbytes
+        if self.order is not None:
+            nbytes += self.order.nbytes
+        return nbytes
+
+
+    @property
+    def num_displayed_rows(self):
+        """The number of rows once filtered."""
+        return self.num_rows if self.order is None else len(self.order)
+
+
+    # READ ROWS ###############################################################
+
+    def _read_records(self, rows, column_name):
+        """
+        Return the values of the column `column_name` in the given `rows`
+        (a slice or an array of row indices).
+        """
+        if self._records is None:
+            # Astropy converts the values (and caches the whole table)
+            with self._lock:
+                return np.asarray(self.hdu.data[rows].field(column_name))
+
+        values = self._records[rows][column_name]
+        column = self.columns[column_name]
+        column_format = column.format.format
+
+        if column_format == 'L':
+            return values == ord('T')
+
+        if column_format == 'A':
+            # Strings may be padded with spaces
+            return np.char.rstrip(values)
+
+        if column_format in ('P', 'Q', 'X'):
+            # Variable length arrays and bit arrays are shown raw
+            return values
+
+        bscale = 1 if column.bscale is None else column.bscale
+        bzero = 0 if column.bzero is None else column.bzero
+
+        if (bscale == 1) and (bzero == 0):
+            return values.astype(values.dtype.newbyteorder('='))
+
+        if (bscale == 1) and (column_format == 'K') and (bzero == 2**63):
+            # Unsigned 64 bits integers
+            return values.astype(np.int64).view(np.uint64) ^ np.uint64(2**63)
+
+        if (bscale == 1) and float(bzero).is_integer() and (values.dtype.kind == 'i'):
+            # Unsigned integers (or shifted integers)
+            return values.astype(np.int64) + int(bzero)
+
+        return values * np.float64(bscale) + np.float64(bzero)
+
+
+    def get_rows(self, start, stop):
+        """
+        Return the displayed rows `start` to `stop` (once sorted and filtered)
+        as (row number, cell strings) pairs.  Only these rows are read.
+        """
+        start = max(start, 0)
+        stop = min(stop, self.num_displayed_rows)
+
+        if stop <= start:
+            return []
+
+        if self.order is None:
+            row_numbers = np.arange(start, stop)
+            rows = slice(start, stop)
+        else:
+            row_numbers = self.order[start:stop]
+            rows = row_numbers
+
+        columns = [self._read_records(rows, column_name) for column_name in self.column_names]
+
+        return [(int(row_number), [format_value(values[index]) for values in columns])
+                for index, row_number in enumerate(row_numbers)]
+
+
+    def read_column(self, column_name, check_cancelled=None):
+        """
+        Return the whole (scalar) column `column_name`, read by chunks of
+        ROW_CHUNK_SIZE rows.
+        """
+        if column_name not in self.column_names:
+            raise ValueError("Unknown column: {}".format(column_name))
+
+        chunks = []
+        for start in range(0, self.num_rows, ROW_CHUNK_SIZE):
+            if check_cancelled is not None:
+                check_cancelled()
+            chunks.append(self._read_records(slice(start, start + ROW_CHUNK_SIZE), column_name))
+
+        values = np.concatenate(chunks) if chunks else np.empty(0)
+
+        if values.ndim != 1:
+            raise ValueError("The column {} isn't a scalar column: it can't be sorted or filtered.".format(column_name))
+
+        return values
+
+
+    # SORT AND FILTER #########################################################
+
+    def get_sort_order(self, column_name, descending=False, check_cancelled=None):
+        """
+        Return the row indices sorted by the column `column_name` (cached).
+        """
+        key = ("sort", column_name, descending)
+        order = self._orders.get(key)
+
+        if order is None:
+            values = self.read_column(column_name, check_cancelled)
+            if check_cancelled is not None:
+                check_cancelled()
+            order = np.argsort(values, kind='stable')
+            if descending:
+                order = order[::-1].copy()
+            self._orders.put(key, order)
+
+        return order
+
+
+    def get_filter_mask(self, expression, check_cancelled=None):
+        """
+        Return the boolean mask of the rows that match the filter
+        `expression` (see `parse_filter`), computed by chunks of rows
+        (cached).
+        """
+        column_name, operator, value = parse_filter(expression)
+        key = ("filter", column_name, operator, value)
+        mask = self._orders.get(key)
+
+        if mask is None:
+            if column_name not in self.column_names:
+                raise ValueError("Unknown column: {}".format(column_name))
+
+            mask = np.empty(self.num_rows, dtype=bool)
+            function = FILTER_OPERATORS[operator]
+            reference = None
+
+            for start in range(0, self.num_rows, ROW_CHUNK_SIZE):
+                if check_cancelled is not None:
+                    check_cancelled()
+
+                values = self._read_records(slice(start, start + ROW_CHUNK_SIZE), column_name)
+
+                if values.ndim != 1:
+                    raise ValueError("The column {} isn't a scalar column: it can't be filtered.".format(column_name))
+
+                if reference is None:
+                    reference = self._parse_value(value, values.dtype)
+
+                function(values, reference, out=mask[start:start + len(values)])
+
+            self._orders.put(key, mask)
+
+        return mask
+
+
+    @staticmethod
+    def _parse_value(value, dtype):
+        """
+        Convert the filter value `value` (a string) to the type of a column.
+        """
+        if dtype.kind == 'b':
+            return value.strip().lower() in ("t", "true", "1", "yes")
+        if dtype.kind == 'S':
+            return np.bytes_(value.encode("ascii"))
+        if dtype.kind == 'U':
+            return np.str_(value)
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError("Invalid value for a numeric column: {}".format(value))
+
+
+    def get_order(self, sort_column=None, descending=False, filter_expression=None, check_cancelled=None):
+        """
+        Return the displayed rows (see `order`) sorted by `sort_column` and
+        filtered by `filter_expression` (None for all rows in the file
+        order).
+
+        This can take a while on large tables (it is meant to be called in
+        a worker thread): the result should then be set to `order`.
+        """
+        if filter_expression:
+            mask = self.get_filter_mask(filter_expression, check_cancelled)
+        else:
+            mask = None
+
+        if sort_column is not None:
+            order = self.get_sort_order(sort_column, descending, check_cancelled)
+            if mask is not None:
+                order = order[mask[order]]
+        elif mask is not None:
+            order = np.flatnonzero(mask)
+        else:
+            order = None
+
+        return order
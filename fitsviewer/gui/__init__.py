@@ -22,4 +22,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-__all__ = ['tk_matplotlib']
+__all__ = ['figure',
+           'nox',
+           'tk_matplotlib',
+           'tk_search',
+           'tk_table']
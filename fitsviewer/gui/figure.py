@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+"""
+The rendering engine of the viewer: draws the HDUs of FITS files on
+matplotlib figures.
+
+This module doesn't depend on any GUI toolkit (it doesn't select the
+matplotlib backend): it is shared by the Tk frontend
+(`fitsviewer.gui.tk_matplotlib`) and by the headless one
+(`fitsviewer.gui.nox`, which draws on Agg figures).
+"""
+
+__all__ = ['draw_message',
+           'draw_histogram',
+           'draw_image',
+           'draw_preview',
+           'draw_hdu',
+           'get_color_bar_norm']
+
+import numpy as np
+
+from fitsviewer.core.colormap import quantize, get_lut, apply_lut, DEFAULT_LUT_SIZE
+from fitsviewer.core.histogram import DEFAULT_NUM_BINS
+from fitsviewer.core.pyramid import ImagePyramid
+from fitsviewer.core.scaling import Scaling, get_interval, normalize, get_stretch_functions
+
+###############################################################################
+
+DEFAULT_COLOR_MAP = "gnuplot2" # "gray"
+
+# Draw the histogram as a filled step area (True) or as a step line (False)
+HISTOGRAM_FILL = True
+
+#IMAGE_INTERPOLATION = 'bilinear'   # "smooth" map
+IMAGE_INTERPOLATION = 'nearest'    # "raw" (non smooth) map
+
+# The method used to build the downsampled previews of large images
+DEFAULT_DOWNSAMPLING_METHOD = "mean" # "max"
+
+###############################################################################
+
+def draw_message(axis, message):
+
+    #ax1.text(0.5, 0.5, 'Table...', fontsize=15)
+    axis.text(0.5, 0.5,
+              message,
+              ha='center', va='center',
+              fontsize=15,
+              transform=axis.transAxes, wrap=True)
+
+    #ax1.set_xlim([0, 1])
+    #ax1.set_ylim([0, 1])
+    axis.set_axis_off()
+
+
+def draw_histogram(axis, counts, bin_edges):
+
+    # The histogram is computed once per plane with a bounded number of
+    # bins (its cost doesn't depend on the range of values)
+
+    # A single step artist (instead of one patch per bin)
+    axis.stairs(counts,
+                bin_edges,
+                fill=HISTOGRAM_FILL,
+                color='k')
+
+    axis.set_xlim([bin_edges[0], bin_edges[-1]])
+
+
+def draw_image(axis, render_data, color_map=DEFAULT_COLOR_MAP, lut_size=DEFAULT_LUT_SIZE, scaling=Scaling()):
+    """
+    Draw the image plane of `render_data` (a `fitsviewer.core.render.RenderData`)
+    on `axis` and return the (image, index_array) pair of the matplotlib
+    image and of the displayed (quantized) view.
+    """
+
+    # Only display the pyramid level that matches the size of the axis on
+    # screen (the full resolution image is only used for small or zoomed
+    # images)
+    bbox = axis.get_window_extent()
+    index_array, extent = render_data.get_view(screen_width=bbox.width,
+                                               screen_height=bbox.height,
+                                               lut_size=lut_size,
+                                               scaling=scaling)
+
+    # The colormap is applied here with a lookup table (the image is
+    # quantized once, see fitsviewer.core.colormap)
+    rgba_array = apply_lut(index_array, get_lut(color_map, lut_size))
+
+    image = axis.imshow(rgba_array,
+                        origin='lower',
+                        interpolation=IMAGE_INTERPOLATION,
+                        extent=extent)
+
+    # Show the whole image (the view extent may be a bit larger)
+    num_rows, num_cols = render_data.image_array.shape
+    axis.set_xlim(-0.5, num_cols - 0.5)
+    axis.set_ylim(-0.5, num_rows - 0.5)
+    axis.set_autoscale_on(False)
+
+    if num_rows == 1:
+        # 1D image
+        axis.set_aspect('auto')
+        axis.get_yaxis().set_visible(False)
+
+    #axis.set_axis_off()
+
+    return image, index_array
+
+
+def draw_preview(fig, preview, color_map=DEFAULT_COLOR_MAP, lut_size=DEFAULT_LUT_SIZE, scaling=Scaling(),
+                 show_histogram=False, show_image=True, histogram_bins=DEFAULT_NUM_BINS):
+    """
+    Draw the preview of a plane (see `fitsviewer.core.render.RenderData.get_preview`)
+    on the (cleared) figure `fig`.
+    """
+    histogram_name = "histogram_counts_{}".format(histogram_bins)
+    show_histogram = show_histogram and (histogram_name in preview)
+    axes = [fig.add_subplot(1, show_histogram + show_image, index + 1)
+            for index in range(show_histogram + show_image)]
+
+    if show_histogram:
+        draw_histogram(axes[0],
+                       preview[histogram_name],
+                       preview["histogram_edges_{}".format(histogram_bins)])
+
+    if show_image:
+        axis = axes[-1]
+        num_rows, num_cols = preview["shape"]
+
+        if scaling.interval == 'minmax':
+            vmin, vmax = preview["value_range"]
+        else:
+            vmin, vmax = get_interval(preview["image"], interval=scaling.interval, percent=scaling.percent)
+
+        index_array = quantize(normalize(preview["image"], vmin, vmax, scaling.scale), lut_size)
+        preview_rows, preview_cols = index_array.shape
+
+        axis.imshow(apply_lut(index_array, get_lut(color_map, lut_size)),
+                    origin='lower',
+                    interpolation=IMAGE_INTERPOLATION,
+                    extent=ImagePyramid.get_window_extent(int(preview["level"]), (0, preview_rows, 0, preview_cols)))
+
+        axis.set_xlim(-0.5, num_cols - 0.5)
+        axis.set_ylim(-0.5, num_rows - 0.5)
+
+
+def draw_hdu(fig, hdu, render_data=None, color_map=DEFAULT_COLOR_MAP, lut_size=DEFAULT_LUT_SIZE, scaling=Scaling(),
+             show_histogram=False, show_image=True, show_color_bar=False, histogram_bins=DEFAULT_NUM_BINS):
+    """
+    Draw the HDU `hdu` on the (cleared) figure `fig`.
+
+    `render_data` is the `fitsviewer.core.render.RenderData` of the plane
+    to display for image HDUs.
+
+    Return the (image, index_array) pair of the displayed image (see
+    `draw_image`) or (None, None) if no image is displayed.
+    """
+    image, index_array = None, None
+
+    if hdu.is_image and hdu.header.get('NAXIS', 0) == 0:
+        # The HDU has no data (e.g. an empty primary HDU)
+
+        ax1 = fig.add_subplot(111)
+        draw_message(ax1, "This HDU doesn't contain any data.")
+
+    elif hdu.is_image:
+        # The HDU is an image
+        if show_histogram and show_image:
+
+            ax1 = fig.add_subplot(121)
+            ax2 = fig.add_subplot(122)
+
+            draw_histogram(ax1, *render_data.get_histogram(histogram_bins))
+            image, index_array = draw_image(ax2, render_data, color_map, lut_size, scaling)
+
+        elif show_histogram or show_image:
+
+            ax1 = fig.add_subplot(111)
+
+            if show_histogram:
+                draw_histogram(ax1, *render_data.get_histogram(histogram_bins))
+            else:
+                image, index_array = draw_image(ax1, render_data, color_map, lut_size, scaling)
+
+        if show_color_bar and (image is not None):
+            from matplotlib.cm import ScalarMappable
+            fig.colorbar(ScalarMappable(norm=get_color_bar_norm(render_data, scaling), cmap=color_map),
+                         ax=image.axes)
+    else:
+        # The HDU is a table: its rows are displayed in the table view of the
+        # viewer (see fitsviewer.gui.tk_table), only its size is drawn here
+        ax1 = fig.add_subplot(111)
+        draw_message(ax1, "Table: {} rows, {} columns".format(hdu.header.get('NAXIS2', 0),
+                                                             hdu.header.get('TFIELDS', 0)))
+
+    return image, index_array
+
+
+def get_color_bar_norm(render_data, scaling=Scaling()):
+    """
+    Return the matplotlib norm that maps pixel values to colors as done
+    for the (RGBA) images drawn by `draw_image`.
+    """
+    # Matplotlib is slow to import: it is only imported when a figure is drawn
+    from matplotlib.colors import Normalize, FuncNorm
+
+    vmin, vmax = render_data.get_interval(scaling)
+
+    if (scaling.scale == 'linear') or (vmax <= vmin):
+        return Normalize(vmin=vmin, vmax=vmax)
+
+    forward, inverse = get_stretch_functions(scaling.scale)
+
+    return FuncNorm((lambda x: forward(np.clip((x - vmin) / (vmax - vmin), 0., 1.)),
+                     lambda y: vmin + inverse(y) * (vmax - vmin)),
+                    vmin=vmin,
+                    vmax=vmax)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+"""
+The headless frontend of the viewer: renders FITS images to arrays or to
+image files without any display (e.g. in batch jobs or in parallel workers).
+
+Images are rendered either in pure NumPy (`render_image`: the colored
+pixels of the image) or on Agg matplotlib figures (`render_figure`: the
+same figure as the Tk frontend, with axes, histogram and color bar).
+Neither tkinter nor a matplotlib GUI backend is imported.
+"""
+
+__all__ = ['get_image_hdu',
+           'get_render_data',
+           'render_image',
+           'render_figure',
+           'render_file']
+
+import argparse
+import functools
+import os
+import sys
+import time
+
+from fitsviewer.core.batch import get_output_file_path_prefix, list_input_files, run_batch
+from fitsviewer.core.colormap import quantize, get_lut, apply_lut, DEFAULT_LUT_SIZE, HIGH_PRECISION_LUT_SIZE
+from fitsviewer.core.cube import get_default_plane_index
+from fitsviewer.core.histogram import DEFAULT_NUM_BINS
+from fitsviewer.core.hdu import open_fits, get_image_plane
+from fitsviewer.core.render import RenderData
+from fitsviewer.core.scaling import Scaling, normalize, SCALES, INTERVALS, DEFAULT_SCALE, DEFAULT_INTERVAL, DEFAULT_PERCENT
+from fitsviewer.gui.figure import draw_hdu, DEFAULT_COLOR_MAP, DEFAULT_DOWNSAMPLING_METHOD
+
+###############################################################################
+
+DEFAULT_OUTPUT_FORMAT = "png"
+
+# The default size (in pixels) and resolution of rendered figures
+DEFAULT_FIGURE_WIDTH = 1024
+DEFAULT_FIGURE_HEIGHT = 768
+DEFAULT_DPI = 100
+
+###############################################################################
+
+def get_image_hdu(hdu_list, hdu_index=None):
+    """
+    Return the (hdu_index, hdu) pair of the HDU `hdu_index` or, if it is
+    None, of the first non empty image HDU of `hdu_list`.
+    """
+    if hdu_index is not None:
+        if not (0 <= hdu_index < len(hdu_list)):
+            raise ValueError("Invalid HDU index: {}".format(hdu_index))
+        return hdu_index, hdu_list[hdu_index]
+
+    for _hdu_index, hdu in enumerate(hdu_list):
+        if hdu.is_image and hdu.header.get('NAXIS', 0) > 0:
+            return _hdu_index, hdu
+
+    raise Exception("The input file doesn't contain any image.")
+
+
+def get_render_data(hdu, plane_index=None, downsampling_method=DEFAULT_DOWNSAMPLING_METHOD):
+    """
+    Return the `fitsviewer.core.render.RenderData` of the plane
+    `plane_index` of the image HDU `hdu` (the first plane of 3D/4D images by
+    default).
+    """
+    if plane_index is None:
+        plane_index = get_default_plane_index(hdu.header)
+
+    return RenderData(get_image_plane(hdu, plane_index),
+                      downsampling_method=downsampling_method)
+
+
+def render_image(render_data, color_map=DEFAULT_COLOR_MAP, lut_size=DEFAULT_LUT_SIZE, scaling=Scaling(), max_size=None):
+    """
+    Return the RGBA (uint8) image of the plane of `render_data`, in the FITS
+    order (the first row at the bottom).
+
+    If `max_size` is given, the image is the finest pyramid level (see
+    `fitsviewer.core.pyramid`) whose dimensions are smaller than `max_size`:
+    the interval of displayed values is still the one of the full
+    resolution plane.
+    """
+    level = 0
+    if max_size is not None:
+        level = render_data.pyramid.select_level_for_size(max_size)
+
+    vmin, vmax = render_data.get_interval(scaling)
+    index_array = quantize(normalize(render_data.pyramid.get_level(level), vmin, vmax, scaling.scale), lut_size)
+
+    return apply_lut(index_array, get_lut(color_map, lut_size))
+
+
+def render_figure(hdu,
+                  render_data=None,
+                  color_map=DEFAULT_COLOR_MAP,
+                  lut_size=DEFAULT_LUT_SIZE,
+                  scaling=Scaling(),
+                  show_histogram=False,
+                  show_image=True,
+                  show_color_bar=True,
+                  histogram_bins=DEFAULT_NUM_BINS,
+                  width=DEFAULT_FIGURE_WIDTH,
+                  height=DEFAULT_FIGURE_HEIGHT,
+                  dpi=DEFAULT_DPI):
+    """
+    Return a `width` x `height` pixels (Agg) matplotlib figure of the HDU
+    `hdu` as displayed by the viewer (see `fitsviewer.gui.figure.draw_hdu`).
+
+    The figure can be saved with `savefig` or converted to an RGBA array
+    with `numpy.asarray(fig.canvas.buffer_rgba())` once drawn.
+    """
+    # Matplotlib is slow to import: it is only imported when a figure is
+    # rendered
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+
+    draw_hdu(fig,
+             hdu,
+             render_data,
+             color_map=color_map,
+             lut_size=lut_size,
+             scaling=scaling,
+             show_histogram=show_histogram,
+             show_image=show_image,
+             show_color_bar=show_color_bar,
+             histogram_bins=histogram_bins)
+
+    return fig
+
+
+def render_file(input_file_path,
+                output_file_path,
+                hdu_index=None,
+                plane_index=None,
+                color_map=DEFAULT_COLOR_MAP,
+                lut_size=DEFAULT_LUT_SIZE,
+                scaling=Scaling(),
+                max_size=None,
+                figure=False,
+                show_histogram=False,
+                show_image=True,
+                show_color_bar=True,
+                histogram_bins=DEFAULT_NUM_BINS,
+                width=DEFAULT_FIGURE_WIDTH,
+                height=DEFAULT_FIGURE_HEIGHT,
+                dpi=DEFAULT_DPI,
+                downsampling_method=DEFAULT_DOWNSAMPLING_METHOD,
+                memmap=True):
+    """
+    Render an HDU of the FITS file `input_file_path` to the image file
+    `output_file_path` (its format is given by its extension): the image
+    itself (see `render_image`) or, if `figure` is True, the figure of the
+    viewer (see `render_figure`).
+
+    Return the index of the rendered HDU.
+    """
+    hdu_list = open_fits(input_file_path, memmap=memmap)
+
+    try:
+        hdu_index, hdu = get_image_hdu(hdu_list, hdu_index)
+
+        render_data = None
+        if hdu.is_image and hdu.header.get('NAXIS', 0) > 0:
+            render_data = get_render_data(hdu, plane_index, downsampling_method)
+        elif not figure:
+            raise Exception("The HDU {} isn't a non empty image.".format(hdu_index))
+
+        if figure:
+            fig = render_figure(hdu,
+                                render_data,
+                                color_map=color_map,
+                                lut_size=lut_size,
+                                scaling=scaling,
+                                show_histogram=show_histogram,
+                                show_image=show_image,
+                                show_color_bar=show_color_bar,
+                                histogram_bins=histogram_bins,
+                                width=width,
+                                height=height,
+                                dpi=dpi)
+            fig.savefig(output_file_path)
+        else:
+            rgba_array = render_image(render_data,
+                                      color_map=color_map,
+                                      lut_size=lut_size,
+                                      scaling=scaling,
+                                      max_size=max_size)
+
+            import PIL.Image as pil_img # PIL.Image is a module not a class...
+
+            # WARNING: with fits, the (0,0) point is at the BOTTOM left corner
+            #          whereas with pillow, the (0,0) point is at the TOP left corner
+            pil_image = pil_img.fromarray(rgba_array[::-1])
+            if not output_file_path.lower().endswith(".png"):
+                pil_image = pil_image.convert("RGB")    # e.g. JPEG files have no alpha channel
+            pil_image.save(output_file_path)
+    finally:
+        hdu_list.close()
+
+    return hdu_index
+
+
+def main():
+
+    # PARSE OPTIONS ###########################################################
+
+    parser = argparse.ArgumentParser(description="Render FITS images to image files without any display "
+                                                 "(the headless version of fitsviewer)")
+
+    parser.add_argument("--output", "-o", default=None, metavar="FILE",
+            help="the output file (only with a single input file; default: the input file "
+                 "with the extension of the output format)")
+
+    parser.add_argument("--output-dir", default=None, metavar="DIRECTORY",
+            help="the directory of the output files (default: the directory of each input file)")
+
+    parser.add_argument("--format", "-F", default=DEFAULT_OUTPUT_FORMAT, metavar="STRING",
+            help="the extension (i.e. the format) of the output files")
+
+    parser.add_argument("--hdu", type=int, default=None, metavar="INTEGER",
+            help="the index of the HDU to render (the first non empty image by default)")
+
+    parser.add_argument("--plane", default=None, metavar="STRING",
+            help="the comma separated index of the plane to render in 3D/4D images "
+                 "(the first plane by default)")
+
+    parser.add_argument("--cmap", "-C", default=DEFAULT_COLOR_MAP, metavar="STRING",
+            help="the colormap to use")
+
+    parser.add_argument("--scale", "-s", default=DEFAULT_SCALE, choices=SCALES,
+            help="the stretch applied to pixel values")
+
+    parser.add_argument("--interval", "-I", default=DEFAULT_INTERVAL, choices=INTERVALS,
+            help="the interval of displayed pixel values: the whole range (minmax), "
+                 "the DS9 zscale interval or a central percentile interval")
+
+    parser.add_argument("--percent", type=float, default=DEFAULT_PERCENT, metavar="FLOAT",
+            help="the percentage of pixels kept by the percentile interval")
+
+    parser.add_argument("--lut16", action="store_true",
+            help="render images with {} colors instead of {}".format(HIGH_PRECISION_LUT_SIZE, DEFAULT_LUT_SIZE))
+
+    parser.add_argument("--size", type=int, default=None, metavar="INTEGER",
+            help="the maximum size (in pixels) of rendered images: larger images are "
+                 "downsampled by a power of 2 (they are rendered at full resolution by default)")
+
+    parser.add_argument("--downsampling", "-d", default=DEFAULT_DOWNSAMPLING_METHOD,
+            choices=("mean", "max"),
+            help="the method used to downsample large images (block mean or block max)")
+
+    parser.add_argument("--figure", action="store_true",
+            help="render the figure of the viewer (with axes, color bar and histogram) "
+                 "instead of the image itself")
+
+    parser.add_argument("--hidecbar", "-c", action="store_true",
+            help="hide the color bar (with --figure)")
+
+    parser.add_argument("--hideimage", "-i", action="store_true",
+            help="hide the image (with --figure)")
+
+    parser.add_argument("--showhist", "-H", action="store_true",
+            help="show the histogram of the image (with --figure)")
+
+    parser.add_argument("--bins", "-b", type=int, default=DEFAULT_NUM_BINS, metavar="INTEGER",
+            help="the maximum number of bins of the histogram (with --figure)")
+
+    parser.add_argument("--width", type=int, default=DEFAULT_FIGURE_WIDTH, metavar="INTEGER",
+            help="the width of the figure in pixels (with --figure)")
+
+    parser.add_argument("--height", type=int, default=DEFAULT_FIGURE_HEIGHT, metavar="INTEGER",
+            help="the height of the figure in pixels (with --figure)")
+
+    parser.add_argument("--dpi", type=float, default=DEFAULT_DPI, metavar="FLOAT",
+            help="the resolution of the figure (with --figure)")
+
+    parser.add_argument("--nomemmap", action="store_true",
+            help="read the whole data of the rendered HDU into memory "
+                 "instead of memory-mapping it")
+
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), metavar="INTEGER",
+            help="the number of files rendered in parallel (default: the number of CPUs)")
+
+    parser.add_argument("filearg", nargs="+", metavar="FILE",
+            help="the FITS files to render (files, directories or glob patterns)")
+
+    args = parser.parse_args()
+
+    # Files matched by several arguments are rendered only once
+    input_file_path_list = list_input_files(args.filearg)
+
+    if (args.output is not None) and (len(input_file_path_list) > 1):
+        parser.error("--output can't be used with several input files")
+
+    plane_index = None
+    if args.plane is not None:
+        plane_index = tuple(int(index) for index in args.plane.split(","))
+
+    def get_output_file_path(input_file_path):
+        if args.output is not None:
+            return args.output
+        output_file_path = get_output_file_path_prefix(input_file_path) + "." + args.format.lstrip(".")
+        if args.output_dir is not None:
+            output_file_path = os.path.join(args.output_dir, os.path.basename(output_file_path))
+        return output_file_path
+
+    render = functools.partial(render_file,
+                               hdu_index=args.hdu,
+                               plane_index=plane_index,
+                               color_map=args.cmap,
+                               lut_size=HIGH_PRECISION_LUT_SIZE if args.lut16 else DEFAULT_LUT_SIZE,
+                               scaling=Scaling(args.scale, args.interval, args.percent),
+                               max_size=args.size,
+                               figure=args.figure,
+                               show_histogram=args.showhist,
+                               show_image=not args.hideimage,
+                               show_color_bar=not args.hidecbar,
+                               histogram_bins=args.bins,
+                               width=args.width,
+                               height=args.height,
+                               dpi=args.dpi,
+                               downsampling_method=args.downsampling,
+                               memmap=not args.nomemmap)
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # RENDER FILES ############################################################
+
+    num_rendered_files = 0
+
+    start_time = time.time()
+
+    def count_result(input_file_path, hdu_index):
+        nonlocal num_rendered_files
+        num_rendered_files += 1
+
+    num_failed_files = run_batch(render,
+                                 input_file_path_list,
+                                 args.jobs,
+                                 on_result=count_result,
+                                 get_args=lambda input_file_path: (get_output_file_path(input_file_path),))
+
+    elapsed_time = time.time() - start_time
+
+    # PRINT A SUMMARY #########################################################
+
+    if len(input_file_path_list) > 1:
+        print("{} files rendered in {:.1f} s: {:.1f} files/s; {} failed".format(num_rendered_files,
+                                                                               elapsed_time,
+                                                                               num_rendered_files / max(elapsed_time, 1e-9),
+                                                                               num_failed_files))
+
+    if num_failed_files > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
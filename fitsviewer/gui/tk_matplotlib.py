@@ -33,20 +33,40 @@ import matplotlib
 matplotlib.use('TkAgg')
 
 import numpy as np
-import matplotlib.pyplot as plt
 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
+# pyplot is not imported (it is slow to import and useless here): the figure
+# is made directly on the Tk canvas
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 # implement the default mpl key bindings
 from matplotlib.backend_bases import key_press_handler
 from matplotlib import cm
 
 import tkinter as tk
+import tkinter.filedialog
+import tkinter.messagebox
+from tkinter import ttk
 
 import argparse
+import collections
 import json
 import os
-
-from astropy.io import fits
+import time
+
+from fitsviewer.core.cache import LRUCache, DiskCache, get_cache_directory
+from fitsviewer.core.colormap import get_lut, apply_lut, DEFAULT_LUT_SIZE, HIGH_PRECISION_LUT_SIZE
+from fitsviewer.core.cube import get_planes_shape, get_default_plane_index, get_neighbour_planes, get_next_planes
+from fitsviewer.core.hdu import open_fits, get_hdu_label, get_image_plane
+from fitsviewer.core.histogram import DEFAULT_NUM_BINS
+from fitsviewer.core.index import HeaderIndex, parse_query, get_default_index_path
+from fitsviewer.core.loader import Loader
+from fitsviewer.core.render import RenderData
+from fitsviewer.core.table import TableData
+from fitsviewer.core.scaling import Scaling, SCALES, INTERVALS, DEFAULT_SCALE, DEFAULT_INTERVAL, DEFAULT_PERCENT
+from fitsviewer.gui.figure import draw_preview, draw_hdu, get_color_bar_norm
+from fitsviewer.gui.figure import DEFAULT_COLOR_MAP, DEFAULT_DOWNSAMPLING_METHOD
+from fitsviewer.gui.tk_search import SearchDialog
+from fitsviewer.gui.tk_table import TableView
 
 ###############################################################################
 
@@ -54,46 +74,179 @@ CONFIG_FILE_NAME = ".fitsviewer.json"
 
 LAST_OPENED_FILES_LIST_MAX_SIZE = 15
 
-DEFAULT_COLOR_MAP = "gnuplot2" # "gray"
+# The maximum amount of memory used to keep the data computed for the last
+# displayed planes (slices, statistics, histograms, pyramids, ...)
+RENDER_CACHE_MAX_BYTES = 512 * 2**20
+
+# The on-disk cache of the previews, histograms and statistics of the
+# displayed planes (see RenderData.get_preview), used when files are opened
+# again
+PREVIEW_CACHE_NAME = "previews"
+PREVIEW_CACHE_MAX_BYTES = 256 * 2**20
+
+# The period (in milliseconds) of the check for background loading results
+LOADER_POLL_INTERVAL = 50
+
+# The maximum number of planes of 3D/4D images prepared in background around
+# the displayed plane, and the maximum amount of memory they can use in the
+# render cache
+PREFETCH_MAX_PLANES = 8
+PREFETCH_MAX_BYTES = RENDER_CACHE_MAX_BYTES // 4
+
+# The loader channel of the prefetching requests (they are not shown in the
+# status bar)
+PREFETCH_CHANNEL = "prefetch"
+
+# The loader channel of the sorting and filtering of table rows
+TABLE_CHANNEL = "table"
 
-# histogram types : [‘bar’ | ‘barstacked’ | ‘step’ | ‘stepfilled’]
-HISTOGRAM_TYPE = 'bar'
+# The loader channels of the searches in the header index and of its updates
+# (opening a file doesn't cancel the update of the index)
+SEARCH_CHANNEL = "search"
+INDEX_CHANNEL = "index"
 
-#IMAGE_INTERPOLATION = 'bilinear'   # "smooth" map
-IMAGE_INTERPOLATION = 'nearest'    # "raw" (non smooth) map
+# The loader channels whose tasks don't read the open file (they aren't
+# cancelled when it is closed)
+FILE_INDEPENDENT_CHANNELS = (SEARCH_CHANNEL, INDEX_CHANNEL)
+
+# The loader channels that run in their own worker threads: they are never
+# waited for by the user
+BACKGROUND_CHANNELS = (PREFETCH_CHANNEL, INDEX_CHANNEL)
+
+# The maximum number of HDUs listed by the search dialog
+SEARCH_MAX_RESULTS = 10000
+
+# The default frame rate (in frames per second) of the playback of the planes
+# of 3D/4D images
+DEFAULT_FPS = 10.
+
+# The period (in seconds) of the update of the achieved frame rate in the
+# status bar during playbacks
+FPS_REPORT_INTERVAL = 1.
 
 ###############################################################################
 
 def get_colour_map_list():
     """Return the list of the available colormaps."""
-    return sorted(plt.cm.datad)
+    return sorted(cm.datad)
+
+
+def get_preview_key(preview_cache, file_path, hdu_index, plane_index, downsampling_method):
+    """
+    Return the key of the preview of the given plane in `preview_cache` (None
+    if there is no preview cache or if the file can't be accessed).
+    """
+    if preview_cache is None:
+        return None
+
+    # The first plane of an HDU is known before the headers are read
+    if (plane_index is not None) and not any(plane_index):
+        plane_index = None
+
+    try:
+        return DiskCache.make_key(file_path, hdu_index, plane_index, downsampling_method)
+    except OSError:
+        return None
+
+
+def load_render_data(hdu, plane_index, downsampling_method, preview_cache=None, preview_key=None):
+    """
+    Return the (RenderData, preview) pair of the given plane, where the
+    RenderData reuses the data of its preview if it is in `preview_cache`
+    (otherwise, preview is None).
+    """
+    render_data = RenderData(get_image_plane(hdu, plane_index),
+                             downsampling_method=downsampling_method)
+
+    preview = None
+    if preview_key is not None:
+        preview = preview_cache.get(preview_key)
+        if preview is not None:
+            render_data.set_preview(preview)
+
+    return render_data, preview
 
 ###############################################################################
 
 class TkGUI:
     """
-    TODO...
+    The Tk frontend of the viewer: the window, its menus and dialogs, the
+    plane navigator and the interactive matplotlib figure (TkAgg canvas and
+    toolbar).
+
+    Figures are drawn by the rendering engine shared with the headless
+    frontend (`fitsviewer.gui.figure`, see also `fitsviewer.gui.nox`); this
+    class only handles the user interactions, the caches of the displayed
+    planes and the background loadings (see `fitsviewer.core.loader`).
     """
 
     def __init__(self, root):
         """
-        TODO...
+        Build the window in the Tk `root` widget (menus, canvas, toolbar and
+        status bar) and start polling the background loadings; no file is
+        opened (see `open_fits_file`).
         """
 
         self.hdu_list = None         # The current HDU list
+        self._file_path = None       # The path of the current file (not of its decompressed copy)
         self.hdu_index = None        # The current HDU index
+        self.plane_index = None      # The current plane of 3D/4D images (see fitsviewer.core.cube)
+        self.hdu_labels = []         # The description of each HDU of the current HDU list
         self.last_opened_files = []
+        self.memmap = True           # Memory-map the image HDUs
+        self.gzip_cache = True       # Decompress gzip-compressed files once in a cache directory (to memory-map them)
+        self.downsampling_method = DEFAULT_DOWNSAMPLING_METHOD
+        self.histogram_bins = DEFAULT_NUM_BINS
+        self.lut_size = DEFAULT_LUT_SIZE   # The number of colors used to display images
+        self.percent = DEFAULT_PERCENT     # The percentage of pixels kept by the "percentile" interval
+
+        # The previews of the displayed planes kept on disk (None to disable it)
+        self.preview_cache = DiskCache(get_cache_directory(PREVIEW_CACHE_NAME), PREVIEW_CACHE_MAX_BYTES)
+        self._preview_shown = False  # A preview of the file being opened is displayed
+
+        # The header index searched by the search dialog (see fitsviewer.core.index)
+        self.index_path = get_default_index_path()
+        self._search_dialog = None
+
+        # The data computed for the last displayed planes
+        # ((file path, HDU index, plane index, downsampling method) -> RenderData)
+        self._render_cache = LRUCache(RENDER_CACHE_MAX_BYTES)
+
+        self._image = None           # The AxesImage of the displayed image
+        self._image_index = None     # The quantized displayed image (see fitsviewer.core.colormap)
+        self._render_data = None     # The RenderData of the displayed image
+        self._color_bar = None       # The Colorbar of the displayed image
+        self._color_bar_mappable = None
+        self._view_update_pending = False
+        self._plane_direction = 1    # The direction of the last move in the planes (for prefetching)
+        self._plane_variables = []   # The IntVar of each slider of the plane navigator
+
+        # Playback of the planes of 3D/4D images (see `play`)
+        self._playing = False
+        self._play_clock = None      # (time, frame number) of the playback start
+        self._play_frame = None      # The last displayed frame number
+        self._play_frame_times = collections.deque()
+        self._play_dropped_frames = 0
+        self._play_report_time = None
+        self._blit_background = None
+
+        # Files are read and data are prepared in background threads (the
+        # prefetching and the index updates don't delay the other requests)
+        self.loader = Loader(background_channels=BACKGROUND_CHANNELS)
 
         # Matplotlib ##################
 
-        self.fig = plt.figure(figsize=(8.0, 8.0))
+        self.fig = Figure(figsize=(8.0, 8.0))
 
         # Gui parameters ##############
 
         self._color_map = tk.StringVar()
+        self._scale = tk.StringVar()
+        self._interval = tk.StringVar()
         self._show_color_bar = tk.BooleanVar()
         self._show_image = tk.BooleanVar()
         self._show_histogram = tk.BooleanVar()
+        self._fps = tk.DoubleVar(value=DEFAULT_FPS)
 
         # Make widgets ################
 
@@ -102,10 +255,52 @@ class TkGUI:
         # Add a callback on WM_DELETE_WINDOW events
         self.root.protocol("WM_DELETE_WINDOW", self.quit)
 
+        # Cancel the background loadings with the Escape key
+        self.root.bind("<Escape>", lambda event: self.cancel_loading())
+
+        # Status bar (shows the progress of the background loadings)
+        status_bar = tk.Frame(master=self.root)
+        status_bar.pack(side="bottom", fill="x")
+
+        self.status_label = tk.Label(master=status_bar, anchor="w")
+        self.status_label.pack(side="left", fill="x", expand=True)
+
+        self.progress_bar = ttk.Progressbar(master=status_bar, mode="indeterminate", length=150)
+        self._progress_bar_shown = False
+
+        # Plane navigator (one slider per extra axis of 3D/4D images, only
+        # shown for these images)
+        self.plane_navigator = tk.Frame(master=self.root)
+        self.play_button = None
+
+        # Move along NAXIS3 with the Page Up/Page Down keys, play the planes
+        # with the space key
+        self.root.bind("<Prior>", lambda event: self.step_plane(-1))
+        self.root.bind("<Next>", lambda event: self.step_plane(1))
+        self.root.bind("<space>", lambda event: self.toggle_play())
+
         # Canvas
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.root)
+
+        # Navigation toolbar (zoom and pan): only the visible tiles of the
+        # image are rendered (see fitsviewer.core.render)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.root)
+        self.toolbar.update()
+
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
 
+        # Table view (shown instead of the canvas for table HDUs)
+        self.table_view = TableView(master=self.root, on_sort=self.sort_table, on_filter=self.filter_table)
+
+        # Default matplotlib key bindings ("o" zoom, "p" pan, "h" home, ...)
+        self.canvas.mpl_connect('key_press_event', lambda event: key_press_handler(event, self.canvas, self.toolbar))
+
+        # Update the displayed pyramid level when the canvas is resized
+        self.canvas.mpl_connect('resize_event', lambda event: self._schedule_view_update())
+
+        # Keep the background of the image up to date for playbacks
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
         ## Buttons
         #quit_button = tk.Button(master=self.root, text='Quit', command=self.quit)
         #quit_button.pack(fill="x", expand=True)
@@ -125,6 +320,9 @@ class TkGUI:
         self.open_recent_menu = tk.Menu(file_menu, tearoff=0)
         file_menu.add_cascade(label="Open Recent", menu=self.open_recent_menu)
 
+        # /File/Search Index
+        file_menu.add_command(label="Search Index...", command=self.show_search_dialog)
+
         # /File/Close
         file_menu.add_command(label="Close", command=self.close_fits_file)
 
@@ -148,7 +346,7 @@ class TkGUI:
 
         view_menu.add_checkbutton(label="Show color bar",
                                   variable=self._show_color_bar,
-                                  command=self.draw_figure)
+                                  command=self.update_color_bar)
 
         view_menu.add_checkbutton(label="Show image",
                                   variable=self._show_image,
@@ -158,18 +356,37 @@ class TkGUI:
                                   variable=self._show_histogram,
                                   command=self.draw_figure)
 
+        view_menu.add_command(label="Statistics...", command=self.show_statistics)
+
         self.menubar.add_cascade(label="View", menu=view_menu)
 
-        # Create a pulldown menu: /View/Color Map
-        colormap_menu = tk.Menu(view_menu, tearoff=0)
+        # Create a pulldown menu: /View/Color Map (filled the first time it
+        # is opened, see update_color_map_menu)
+        self.color_map_menu = tk.Menu(view_menu, tearoff=0, postcommand=self.update_color_map_menu)
 
-        for cmap_str in get_colour_map_list():
-            colormap_menu.add_radiobutton(label=cmap_str,
-                                          variable=self._color_map,
-                                          value=cmap_str,
-                                          command=self.draw_figure)
+        view_menu.add_cascade(label="Color Map", menu=self.color_map_menu)
+
+        # Create a pulldown menu: /View/Scale
+        scale_menu = tk.Menu(view_menu, tearoff=0)
 
-        view_menu.add_cascade(label="Color Map", menu=colormap_menu)
+        for scale_str in SCALES:
+            scale_menu.add_radiobutton(label=scale_str,
+                                       variable=self._scale,
+                                       value=scale_str,
+                                       command=self.update_scaling)
+
+        view_menu.add_cascade(label="Scale", menu=scale_menu)
+
+        # Create a pulldown menu: /View/Interval
+        interval_menu = tk.Menu(view_menu, tearoff=0)
+
+        for interval_str in INTERVALS:
+            interval_menu.add_radiobutton(label=interval_str,
+                                          variable=self._interval,
+                                          value=interval_str,
+                                          command=self.update_scaling)
+
+        view_menu.add_cascade(label="Interval", menu=interval_menu)
 
         # Display the menu
         # The config method is used to attach the menu to the root window. The
@@ -178,6 +395,9 @@ class TkGUI:
         # displayed by Tkinter.
         self.root.config(menu=self.menubar)
 
+        # Deliver the results of the background loadings in the Tk thread
+        self.root.after(LOADER_POLL_INTERVAL, self._poll_loader)
+
 
     def load_config(self):
         """
@@ -239,14 +459,14 @@ class TkGUI:
 
     def run(self):
         """
-        Launch the main loop (Tk event loop).
+        Launch the main loop (Tk event loop) until the window is closed (see
+        `quit`).
         """
-
-        # TODO ???
         self.root.mainloop()
 
 
     def quit(self):
+        self.loader.shutdown()
         self.save_config()
         self.root.quit()     # stops mainloop
         self.root.destroy()  # this is necessary on Windows to prevent
@@ -280,20 +500,70 @@ class TkGUI:
                                              #initialfile='demo.fits',  # optional
                                              title='Select your file')
 
-        self.open_fits_file(path)
+        # An empty string is returned when the dialog is cancelled
+        if path:
+            self.open_fits_file(path)
+
+
+    def open_fits_file(self, file_path, hdu_index=0):
+        """
+        Open and display the given FITS file (its HDU `hdu_index`).
 
+        The file is opened in a background thread: this method returns
+        immediately and the file is displayed once it is opened.
+        """
 
-    def open_fits_file(self, file_path):
+        # READ THE INPUT FILE (IN A WORKER THREAD) ############################
+
+        memmap = self.memmap
+        gzip_cache = self.gzip_cache
+
+        def open_task(request):
+            # Only the headers are read here: data blocks are memory-mapped
+            # and decoded when the corresponding HDU is drawn (gzip-compressed
+            # files are decompressed here the first time they are opened)
+            hdu_list = open_fits(file_path, memmap=memmap, gzip_cache=gzip_cache)
+            try:
+                hdu_labels = [get_hdu_label(hdu_index, hdu) for hdu_index, hdu in enumerate(hdu_list)]
+                request.check_cancelled()
+            except Exception:
+                hdu_list.close()
+                raise
+            return hdu_list, hdu_labels
+
+        # A new file supersedes the loading of the current one
+        self.loader.cancel(ignored_channels=FILE_INDEPENDENT_CHANNELS)
+
+        # Display the preview of the HDU kept when the file was opened before
+        # (if any) while the file is being opened
+        preview_key = get_preview_key(self.preview_cache, file_path, hdu_index, None, self.downsampling_method)
+        if preview_key is not None:
+            preview = self.preview_cache.get(preview_key)
+            if preview is not None:
+                self._draw_preview(preview)
+        self._submit(open_task,
+                     lambda result: self._on_fits_file_opened(file_path, *result, hdu_index=hdu_index),
+                     channel="open",
+                     message="Opening {}...".format(os.path.basename(file_path)))
+
+
+    def _on_fits_file_opened(self, file_path, hdu_list, hdu_labels, hdu_index=0):
         """
-        Open and display the given FITS file.
+        Display the FITS file opened by `open_fits_file`.
         """
 
-        # READ THE INPUT FILE #################################################
+        if self.hdu_list is not None:
+            # Keep the preview of the new file displayed (if any)
+            self.close_fits_file(clear=not self._preview_shown)
 
-        self.hdu_list = fits.open(file_path)     # open the FITS file
-        self.hdu_index = 0
+        self.hdu_list = hdu_list
+        self._file_path = file_path
+        self.hdu_labels = hdu_labels
+        self.hdu_index = hdu_index if 0 <= hdu_index < len(hdu_list) else 0
+        self.plane_index = get_default_plane_index(self.hdu_list[self.hdu_index].header)
 
         self.root.title(self.file_path)
+        self.update_plane_navigator()
         self.draw_figure()
 
         # UPDATE THE "LAST OPEN FILE LIST" ####################################
@@ -317,12 +587,111 @@ class TkGUI:
         Open and display the given HDU item.
         """
         if (self.hdu_list is not None) and (0 <= hdu_index < len(self.hdu_list)):
+            self.stop()
             self.hdu_index = hdu_index
+            self.plane_index = get_default_plane_index(self.hdu_list[hdu_index].header)
+            self.update_plane_navigator()
             self.draw_figure()
         else:
             raise Exception("Internal error.")
 
 
+    def select_plane(self, plane_index):
+        """
+        Display the given plane of the current 3D/4D image.
+        """
+        plane_index = tuple(plane_index)
+
+        if (self.plane_index is None) or (plane_index == self.plane_index):
+            return
+
+        self._plane_direction = 1 if plane_index[-1] >= self.plane_index[-1] else -1
+        self.plane_index = plane_index
+
+        self._update_plane_variables()
+
+        if self._playing:
+            # The playback goes on from the selected plane
+            self._play_clock = None
+        else:
+            self.update_plane()
+
+
+    def step_plane(self, step, axis=-1):
+        """
+        Move `step` planes along `axis` (NAXIS3 by default) in the current
+        3D/4D image.
+        """
+        if self.plane_index is None:
+            return
+
+        planes_shape = get_planes_shape(self.hdu_list[self.hdu_index].header)
+        axis = axis % len(planes_shape)
+        index = min(max(self.plane_index[axis] + step, 0), planes_shape[axis] - 1)
+
+        self.select_plane(self.plane_index[:axis] + (index,) + self.plane_index[axis + 1:])
+
+
+    def _update_plane_variables(self):
+        for variable, index in zip(self._plane_variables, self.plane_index):
+            if variable.get() != index:
+                variable.set(index)
+
+
+    def update_plane_navigator(self):
+        """
+        Update the plane navigator (one slider per extra axis of the current
+        image) and show it only for 3D/4D images.
+        """
+        for widget in self.plane_navigator.winfo_children():
+            widget.destroy()
+        self._plane_variables = []
+        self.play_button = None
+
+        if self.plane_index is None:
+            self.plane_navigator.pack_forget()
+            return
+
+        planes_shape = get_planes_shape(self.hdu_list[self.hdu_index].header)
+
+        for axis, size in enumerate(planes_shape):
+            # Planes axes are in Numpy order: the first one is the last FITS axis
+            label = "NAXIS{}".format(len(planes_shape) + 2 - axis)
+            variable = tk.IntVar(value=self.plane_index[axis])
+
+            tk.Label(master=self.plane_navigator, text=label).grid(row=axis, column=0, sticky="w", padx=5)
+            tk.Scale(master=self.plane_navigator,
+                     orient="horizontal",
+                     from_=0,
+                     to=size - 1,
+                     variable=variable,
+                     showvalue=True,
+                     command=lambda value, axis=axis: self._on_plane_slider_moved(axis, int(value))).grid(row=axis, column=1, sticky="we")
+
+            self._plane_variables.append(variable)
+
+        # Playback controls
+        self.play_button = tk.Button(master=self.plane_navigator, text="Play", width=6, command=self.toggle_play)
+        self.play_button.grid(row=0, column=2, padx=5)
+
+        tk.Label(master=self.plane_navigator, text="FPS").grid(row=0, column=3)
+        tk.Spinbox(master=self.plane_navigator,
+                   from_=1,
+                   to=100,
+                   increment=1,
+                   width=5,
+                   textvariable=self._fps).grid(row=0, column=4, padx=5)
+
+        self.plane_navigator.columnconfigure(1, weight=1)
+        # (the canvas may be hidden by the table view)
+        self.plane_navigator.pack(side="bottom", fill="x", after=self.toolbar)
+
+
+    def _on_plane_slider_moved(self, axis, index):
+        if (self.plane_index is not None) and (self.plane_index[axis] != index):
+            self.select_plane(self.plane_index[:axis] + (index,) + self.plane_index[axis + 1:])
+
+
     def update_hdu_menu(self):
         """
         Update the "HDU" menu.
@@ -335,15 +704,8 @@ class TkGUI:
             self.menubar.entryconfig("HDU", state="normal")
 
             # Populate the "/HDU" menu (add one button per HDU of the opened file)
-            for hdu_index, hdu in enumerate(self.hdu_list):
-                # TODO
-                if hdu.is_image:
-                    _label = "HDU{} ({}D image {} {})".format(hdu_index,
-                                                              hdu.data.ndim,
-                                                              "x".join([str(dim) for dim in hdu.data.shape]),
-                                                              hdu.data.dtype.name)
-                else:
-                    _label = "HDU{} (table)".format(hdu_index)
+            # (labels are made from header keywords only, no data is read)
+            for hdu_index, _label in enumerate(self.hdu_labels):
                 # See:
                 # - http://effbot.org/zone/tkinter-callbacks.htm
                 # - http://stackoverflow.com/questions/728356/dynamically-creating-a-menu-in-tkinter-lambda-expressions
@@ -356,6 +718,21 @@ class TkGUI:
             self.menubar.entryconfig("HDU", state="disabled")
 
 
+    def update_color_map_menu(self):
+        """
+        Fill the colormap menu (it is only done once, when it is opened for
+        the first time, to save the startup time).
+        """
+        if self.color_map_menu.index("end") is not None:
+            return
+
+        for cmap_str in get_colour_map_list():
+            self.color_map_menu.add_radiobutton(label=cmap_str,
+                                                variable=self._color_map,
+                                                value=cmap_str,
+                                                command=self.update_color_map)
+
+
     def update_open_recent_menu(self):
         """
         Update the "File/Open Recent" menu.
@@ -387,112 +764,856 @@ class TkGUI:
         self.update_open_recent_menu()
 
 
-    def close_fits_file(self):
-        self.hdu_list.close()
+    def close_fits_file(self, clear=True):
+        self.stop()
+
+        # Forget the data computed for this file (it may change on disk)
+        file_path = self.file_path
+        render_cache = self._render_cache
+        render_cache.discard_if(lambda key: key[0] == file_path)
+
+        # The background tasks that read the file (including the prefetching
+        # of planes and the cancelled tasks still running) are stopped, then
+        # the file is closed once they are done, without blocking the GUI
+        hdu_list = self.hdu_list
+
+        def release_file():
+            # The data put in the cache by the last tasks is dropped too
+            render_cache.discard_if(lambda key: key[0] == file_path)
+            hdu_list.close()
+
+        self.loader.cancel(ignored_channels=FILE_INDEPENDENT_CHANNELS)
+        self.loader.call_when_done(release_file, ignored_channels=FILE_INDEPENDENT_CHANNELS)
+
         self.hdu_list = None
+        self._file_path = None
+        self.hdu_labels = []
         self.hdu_index = None
-        self.clear_figure()
+        self.plane_index = None
+        self.update_plane_navigator()
+        if clear:
+            self.clear_figure()
         self.update_hdu_menu()
 
 
     def clear_figure(self):
         self.fig.clf()
+        self._reset_image()
+        self._show_canvas()
         self.fig.canvas.draw()
 
 
+    def clear_render_cache(self):
+        """
+        Forget the data computed for the last displayed planes (slices,
+        statistics, histograms, pyramids, ...): they are computed again the
+        next time they are drawn.
+        """
+        self.loader.cancel(PREFETCH_CHANNEL)
+        self._render_cache.clear()
+
+
     def draw_figure(self):
         if self.hdu_list is not None:
             if 0 <= self.hdu_index < len(self.hdu_list):
 
-                # Clear the figure ##############
-                self.fig.clf() # TODO
-
                 # Get the image #################
                 hdu = self.hdu_list[self.hdu_index]
+                render_data = None
 
-                if hdu.is_image:
-                    # The current HDU is an image
-
-                    # Get the image #############
-                    if hdu.data.ndim <= 2:
-                        image_array = hdu.data
-                    elif hdu.data.ndim == 3:
-                        image_array = hdu.data[0]                  # TODO
-                    elif hdu.data.ndim == 4:
-                        image_array = hdu.data[0][0]               # TODO
-                    else:
-                        raise Exception("Internal error.")
-                    
-                    # Show the figure ###########
-                    if self.show_histogram and self.show_image:
-
-                        ax1 = self.fig.add_subplot(121)
-                        ax2 = self.fig.add_subplot(122)
-
-                        self._draw_histogram(ax1, image_array)
-                        self._draw_image(ax2, image_array)
-
-                    elif self.show_histogram or self.show_image:
-
-                        ax1 = self.fig.add_subplot(111)
-
-                        if self.show_histogram:
-                            self._draw_histogram(ax1, image_array)
-                        else:
-                            self._draw_image(ax1, image_array)
-                else:
+                if not hdu.is_image:
                     # The current HDU is a table
+                    self.fig.clf()
+                    self._reset_image()
+                    self._draw_table(hdu)
+                    return
+
+                self._show_canvas()
 
-                    # TODO
-                    ax1 = self.fig.add_subplot(111)
+                if hdu.is_image and hdu.header.get('NAXIS', 0) > 0:
+                    render_data = self._get_render_data(hdu)
 
-                    #ax1.text(0.5, 0.5, 'Table...', fontsize=15)
-                    ax1.text(0.5, 0.5,
-                             "The FITS table visualization hasn't been implemented yet.",
-                             ha='center', va='center',
-                             fontsize=15,
-                             transform=ax1.transAxes, wrap=True)
+                    if render_data is None:
+                        # The data is being prepared in background: the
+                        # figure will be drawn once it is ready
+                        return
 
-                    #ax1.set_xlim([0, 1])
-                    #ax1.set_ylim([0, 1])
-                    ax1.set_axis_off()
+                # Clear the figure ##############
+                self.fig.clf()
+                self._reset_image()
+
+                image, index_array = draw_hdu(self.fig,
+                                              hdu,
+                                              render_data,
+                                              color_map=self.color_map,
+                                              lut_size=self.lut_size,
+                                              scaling=self.scaling,
+                                              show_histogram=self.show_histogram,
+                                              show_image=self.show_image,
+                                              histogram_bins=self.histogram_bins)
+
+                self._render_data = render_data
+
+                if image is not None:
+                    self._set_image(image, index_array)
 
                 self.fig.canvas.draw()
+
+                # The zoom history of the toolbar refers to the previous axes
+                self.toolbar.update()
+
+                # Drop the oldest cached data if needed
+                self._render_cache.trim()
+
+                self._prefetch_planes()
             else:
                 raise Exception("Internal error.")
 
 
-    def _draw_histogram(self, axis, image_array):
+    def _draw_table(self, hdu):
+        """
+        Display the rows of the given table HDU in the table view (only the
+        visible rows are read, see `fitsviewer.core.table`).
+        """
+        key = (self.file_path, self.hdu_index, None, "table")
+        table_data = self._render_cache.get(key)
+
+        if table_data is None:
+            table_data = TableData(hdu, self.hdu_list.filename() if self.memmap else None)
+            self._render_cache.put(key, table_data)
+
+        self._show_table()
+        self.table_view.set_table(table_data)
+
+
+    def _show_table(self):
+        """
+        Show the table view instead of the canvas.
+        """
+        if not self.table_view.winfo_manager():
+            self.canvas.get_tk_widget().pack_forget()
+            self.table_view.pack(fill="both", expand=True)
+
+
+    def _show_canvas(self):
+        """
+        Show the canvas instead of the table view.
+        """
+        if self.table_view.winfo_manager():
+            self.table_view.pack_forget()
+            self.table_view.table_data = None
+            self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+
+    def sort_table(self, column_name):
+        """
+        Sort the rows of the displayed table by the given column (in
+        descending order if they are already sorted by this column in
+        ascending order).
+        """
+        table_data = self.table_view.table_data
+        if table_data is not None:
+            descending = (column_name == table_data.sort_column) and not table_data.descending
+            self._update_table_order(table_data, column_name, descending, table_data.filter_expression)
+
+
+    def filter_table(self, expression):
+        """
+        Only display the rows of the displayed table that match `expression`
+        (see `fitsviewer.core.table.parse_filter`), or all rows if it is
+        empty.
+        """
+        table_data = self.table_view.table_data
+        if table_data is not None:
+            self._update_table_order(table_data, table_data.sort_column, table_data.descending, expression or None)
+
+
+    def _update_table_order(self, table_data, sort_column, descending, filter_expression):
+        """
+        Sort and filter the rows of `table_data` in a background thread (the
+        whole columns are read) then display them.
+        """
+        def order_task(request):
+            return table_data.get_order(sort_column,
+                                        descending,
+                                        filter_expression,
+                                        check_cancelled=request.check_cancelled)
+
+        def on_order_ready(order):
+            table_data.order = order
+            table_data.sort_column = sort_column
+            table_data.descending = descending
+            table_data.filter_expression = filter_expression
+
+            if self.table_view.table_data is table_data:
+                self.table_view.update_order()
+
+            # Drop the oldest cached data if needed
+            self._render_cache.trim()
+
+        self._submit(order_task, on_order_ready, TABLE_CHANNEL, "Sorting and filtering the rows...")
+
+
+    def update_plane(self):
+        """
+        Display the current plane of the current 3D/4D image.
+
+        When the image of another plane is displayed, it is updated in place
+        (the figure is not redrawn from scratch and the current zoom is kept).
+        """
+        if (self._image is None) or self.show_histogram:
+            self.draw_figure()
+            return
+
+        render_data = self._get_render_data(self.hdu_list[self.hdu_index],
+                                            on_ready=self.update_plane)
+
+        if render_data is None:
+            # The plane is being prepared in background
+            return
+
+        self._render_data = render_data
+        self._image_index = None
+        self._update_image_view()
+        self._color_bar_mappable.set_norm(self._get_color_bar_norm())
+        self.canvas.draw_idle()
+
+        self._render_cache.trim()
+
+        self._prefetch_planes()
+
+
+    def _draw_preview(self, preview):
+        """
+        Draw the preview of a plane kept in the preview cache (see
+        `RenderData.get_preview`) until the plane itself is loaded.
+        """
+        self.fig.clf()
+        self._reset_image()
+
+        draw_preview(self.fig,
+                     preview,
+                     color_map=self.color_map,
+                     lut_size=self.lut_size,
+                     scaling=self.scaling,
+                     show_histogram=self.show_histogram,
+                     show_image=self.show_image,
+                     histogram_bins=self.histogram_bins)
+
+        self.fig.canvas.draw()
+        self._preview_shown = True
+
+
+    def _set_image(self, image, index_array):
+        """
+        Keep track of the image drawn by `draw_image` (it is then updated in
+        place when the view, the colormap or the scaling change).
+        """
+        self._image = image
+        self._image_index = index_array
+
+        # The image is an RGBA array: the color bar uses its own mappable to
+        # show the actual pixel values
+        self._color_bar_mappable = cm.ScalarMappable(norm=self._get_color_bar_norm(),
+                                                     cmap=self.color_map)
+        self._update_color_bar()
+
+        axis = image.axes
+        axis.callbacks.connect('xlim_changed', lambda axis: self._schedule_view_update())
+        axis.callbacks.connect('ylim_changed', lambda axis: self._schedule_view_update())
+
+
+    def _get_render_key(self, plane_index):
+        """
+        Return the key of the RenderData of the given plane of the current
+        HDU in the render cache.
+        """
+        return (self.file_path, self.hdu_index, plane_index, self.downsampling_method)
+
+
+    def _get_render_data(self, hdu, on_ready=None):
+        """
+        Return the RenderData of the current plane if it is ready to be drawn.
+
+        Otherwise, None is returned and the RenderData is prepared in a
+        background thread (the plane is read and its statistics are computed
+        there); `on_ready` is called (the figure is redrawn by default) once it
+        is ready.
+        """
+        plane_index = self.plane_index
+        key = self._get_render_key(plane_index)
+        render_cache = self._render_cache
+
+        render_data = render_cache.get(key)
+
+        if (render_data is not None) and (render_data.has_histogram(self.histogram_bins) or not self.show_histogram):
+            return render_data
+
+        # Prepare the data in a worker thread #######
+
+        downsampling_method = self.downsampling_method
+        num_bins = self.histogram_bins
+        lut_size = self.lut_size
+        scaling = self.scaling
+        show_histogram = self.show_histogram
+        show_image = self.show_image
+        screen_width, screen_height = self.canvas.get_width_height()
+        preview_cache = self.preview_cache
+        preview_key = get_preview_key(preview_cache, self.file_path, self.hdu_index, plane_index, downsampling_method)
+
+        def render_task(request):
+            # The plane may have been prefetched in the meantime
+            _render_data = render_data or render_cache.get(key)
+            preview = None
+            if _render_data is None:
+                _render_data, preview = load_render_data(hdu, plane_index, downsampling_method,
+                                                         preview_cache, preview_key)
+            request.check_cancelled()
+
+            _render_data.get_value_range()
+            request.check_cancelled()
+
+            if show_histogram:
+                _render_data.get_histogram(num_bins)
+                request.check_cancelled()
+
+            if show_image:
+                # Build the pyramid level that fits the canvas
+                _render_data.get_view(screen_width=screen_width,
+                                      screen_height=screen_height,
+                                      lut_size=lut_size,
+                                      scaling=scaling)
+
+            # Keep the preview of the plane for the next time the file is opened
+            if (preview_key is not None) and not _render_data.has_preview_data(preview):
+                preview_cache.put(preview_key, _render_data.get_preview())
+
+            return _render_data
+
+        def on_render_data_ready(_render_data):
+            self._render_cache.put(key, _render_data)
+            (on_ready or self.draw_figure)()
+
+        self._submit(render_task,
+                     on_render_data_ready,
+                     channel="render",
+                     message="Loading HDU{}{}...".format(self.hdu_index,
+                                                          "" if plane_index is None else " plane {}".format(plane_index)))
+
+        return None
+
+
+    def _prefetch_planes(self, plane_index=None, forward=False):
+        """
+        Prepare in background the planes next to `plane_index` (the displayed
+        plane by default) in the current 3D/4D image, so that moving in the
+        cube doesn't wait for the file: the closest ones in the current
+        direction first or, if `forward` is True, the next ones along NAXIS3
+        (for playbacks).
+
+        The prefetched planes are put in the render cache; they use at most
+        PREFETCH_MAX_BYTES of it.
+        """
+        if (self.plane_index is None) or (self._render_data is None):
+            return
+
+        if plane_index is None:
+            plane_index = self.plane_index
+
+        hdu = self.hdu_list[self.hdu_index]
+        planes_shape = get_planes_shape(hdu.header)
+
+        # Prefetched planes are prepared like the displayed one: they should
+        # use about as much memory in the render cache
+        plane_nbytes = max(1, self._render_data.nbytes)
+        max_planes = min(PREFETCH_MAX_PLANES, PREFETCH_MAX_BYTES // plane_nbytes)
+
+        if forward:
+            plane_indices = get_next_planes(plane_index, planes_shape, max_planes)
+            plane_indices.insert(0, plane_index)
+        else:
+            plane_indices = get_neighbour_planes(plane_index,
+                                                 planes_shape,
+                                                 max_planes,
+                                                 direction=self._plane_direction)
+
+        plane_keys = [(_plane_index, self._get_render_key(_plane_index)) for _plane_index in plane_indices]
+        plane_keys = [(_plane_index, key) for _plane_index, key in plane_keys if key not in self._render_cache]
+
+        if len(plane_keys) == 0:
+            return
+
+        render_cache = self._render_cache
+        downsampling_method = self.downsampling_method
+        lut_size = self.lut_size
+        scaling = self.scaling
+        preview_cache = self.preview_cache
+        file_path = self.file_path
+        hdu_index = self.hdu_index
+
+        # Prepare the view of the displayed image (same zoom)
+        if self._image is not None:
+            axis = self._image.axes
+            bbox = axis.get_window_extent()
+            view_args = (axis.get_xlim(), axis.get_ylim(), bbox.width, bbox.height)
+        else:
+            view_args = None
+
+        def prefetch_task(request):
+            for plane_index, key in plane_keys:
+                request.check_cancelled()
+
+                preview_key = get_preview_key(preview_cache, file_path, hdu_index, plane_index, downsampling_method)
+                render_data, preview = load_render_data(hdu, plane_index, downsampling_method,
+                                                        preview_cache, preview_key)
+                render_data.get_value_range()
+
+                if view_args is not None:
+                    render_data.get_view(*view_args, lut_size=lut_size, scaling=scaling)
+
+                render_cache.put(key, render_data)
+
+        # Errors are ignored here: they are reported if the plane is displayed
+        self.loader.submit(prefetch_task,
+                           lambda result: None,
+                           error_callback=lambda exception: None,
+                           channel=PREFETCH_CHANNEL)
+
+
+    def show_statistics(self):
+        """
+        Display the statistics of the current plane in a dialog.
+
+        The statistics are computed in a background thread.
+        """
+        if self._render_data is None:
+            return
+
+        render_data = self._render_data
+        title = "Statistics - {} - HDU{}".format(os.path.basename(self.file_path), self.hdu_index)
+        preview_cache = self.preview_cache
+        preview_key = get_preview_key(preview_cache, self.file_path, self.hdu_index, self.plane_index, self.downsampling_method)
+
+        def statistics_task(request):
+            stats = render_data.get_statistics(check_cancelled=request.check_cancelled)
+
+            # Keep the statistics for the next time the file is opened
+            if preview_key is not None:
+                preview_cache.put(preview_key, render_data.get_preview())
+
+            return stats
+
+        self._submit(statistics_task,
+                     lambda stats: self._show_statistics_dialog(title, stats),
+                     channel="statistics",
+                     message="Computing statistics...")
+
+
+    def _show_statistics_dialog(self, title, stats):
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+
+        for row, (name, value) in enumerate(stats.format_items()):
+            tk.Label(dialog, text=name, anchor="w").grid(row=row, column=0, sticky="w", padx=5)
+            tk.Label(dialog, text=value, anchor="e").grid(row=row, column=1, sticky="e", padx=5)
+
+
+    def show_search_dialog(self):
+        """
+        Display the dialog to search the header index (see
+        `fitsviewer.core.index`) and open the matching HDUs.
+        """
+        if (self._search_dialog is not None) and self._search_dialog.winfo_exists():
+            self._search_dialog.lift()
+        else:
+            self._search_dialog = SearchDialog(self.root,
+                                               on_search=self.search_index,
+                                               on_update=self.select_index_directory,
+                                               on_open=self.open_fits_file)
+
+
+    def search_index(self, query):
+        """
+        List the HDUs of the header index that match `query` (see
+        `fitsviewer.core.index.parse_query`) in the search dialog.
+
+        The search is done in a background thread.
+        """
+        index_path = self.index_path
+        dialog = self._search_dialog
+
+        def search_task(request):
+            with HeaderIndex(index_path) as index:
+                return index.search(parse_query(query), limit=SEARCH_MAX_RESULTS)
+
+        def show_results(result_list):
+            if dialog.winfo_exists():
+                dialog.set_results(result_list, max_results=SEARCH_MAX_RESULTS)
+
+        self._submit(search_task,
+                     show_results,
+                     channel=SEARCH_CHANNEL,
+                     message="Searching...")
+
+
+    def select_index_directory(self):
+        """
+        Display a directory dialog to select a directory to add to the header
+        index (or to update).
+        """
+        directory = tk.filedialog.askdirectory(parent=self._search_dialog or self.root,
+                                               mustexist=True,
+                                               title='Select the directory to index')
+
+        # An empty string is returned when the dialog is cancelled
+        if directory:
+            self.update_index(directory)
+
+
+    def update_index(self, directory):
+        """
+        Index the FITS files of `directory` (only new and modified files are
+        read, see `fitsviewer.core.index.HeaderIndex.update`).
+
+        The files are indexed in a background thread, without worker
+        processes (forking a process pool from a thread of the Tk process is
+        fragile).
+        """
+        index_path = self.index_path
+        dialog = self._search_dialog
+
+        def update_task(request):
+            with HeaderIndex(index_path) as index:
+                return index.update([directory], jobs=1, check_cancelled=request.check_cancelled)
+
+        def show_counts(counts):
+            if (dialog is not None) and dialog.winfo_exists():
+                dialog.set_status("{}: {} files indexed, {} unchanged, "
+                                  "{} removed, {} unreadable".format(directory, *counts))
 
-        #axis.set_title(self.file_path)
-        bins = math.ceil(image_array.max() - image_array.min())
+        self._submit(update_task,
+                     show_counts,
+                     channel=INDEX_CHANNEL,
+                     message="Indexing {}...".format(directory))
 
-        # nparray.ravel(): Return a flattened array.
-        values, bins, patches = axis.hist(image_array.ravel(),
-                                          histtype=HISTOGRAM_TYPE,
-                                          bins=bins,
-                                          #range=(0., 255.),
-                                          fc='k',
-                                          ec='k')
 
-        axis.set_xlim([image_array.min(), image_array.max()])
+    def _submit(self, task, callback, channel, message):
+        """
+        Run `task` in a background thread (see `fitsviewer.core.loader`) and
+        show the progress bar until `callback` is called.
+        """
+        self.loader.submit(task, callback, error_callback=self._show_error, channel=channel)
+        self.status_label.config(text=message)
+        self._update_progress_bar()
+
+
+    def cancel_loading(self):
+        """
+        Cancel all the background loadings.
+        """
+        self.loader.cancel()
+        self._update_progress_bar()
+
+
+    def _poll_loader(self):
+        """
+        Deliver the results of the background loadings (this is called
+        periodically in the Tk thread).
+        """
+        try:
+            self.loader.process_results()
+            self._update_progress_bar()
+        finally:
+            self.root.after(LOADER_POLL_INTERVAL, self._poll_loader)
+
+
+    def _update_progress_bar(self):
+        is_busy = self.loader.is_busy(ignored_channels=(PREFETCH_CHANNEL,))
+
+        if is_busy and not self._progress_bar_shown:
+            self.progress_bar.pack(side="right")
+            self.progress_bar.start()
+            self._progress_bar_shown = True
+        elif (not is_busy) and self._progress_bar_shown:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+            self.status_label.config(text="")
+            self._progress_bar_shown = False
+
+
+    def _show_error(self, exception):
+        tk.messagebox.showerror(title="Error", message=str(exception), parent=self.root)
+
+
+    def _reset_image(self):
+        """
+        Forget the displayed image (once the figure is cleared).
+        """
+        self._image = None
+        self._image_index = None
+        self._render_data = None
+        self._color_bar = None
+        self._color_bar_mappable = None
+        self._preview_shown = False
+
+
+    def update_color_map(self):
+        """
+        Apply the selected colormap to the displayed image (the figure is not
+        redrawn from scratch).
 
+        The colormap lookup table is applied to the quantized image: the
+        image isn't renormalized.
+        """
+        if self._image is not None:
+            self._image.set_data(apply_lut(self._image_index, get_lut(self.color_map, self.lut_size)))
+            self._color_bar_mappable.set_cmap(self.color_map)
+            self.canvas.draw_idle()
+
+
+    def update_scaling(self):
+        """
+        Apply the selected scale and interval to the displayed image (the
+        figure is not redrawn from scratch).
+        """
+        if self._image is not None:
+            self._update_image_view()
+            self._color_bar_mappable.set_norm(self._get_color_bar_norm())
+            self.canvas.draw_idle()
+
+
+    def _get_color_bar_norm(self):
+        """
+        Return the matplotlib norm that maps pixel values to colors as done
+        for the displayed (RGBA) image.
+        """
+        return get_color_bar_norm(self._render_data, self.scaling)
+
+
+    def update_color_bar(self):
+        """
+        Show or hide the color bar of the displayed image (the figure is not
+        redrawn from scratch).
+        """
+        if self._image is not None:
+            self._update_color_bar()
+            self.canvas.draw_idle()
 
-    def _draw_image(self, axis, image_array):
 
-        if image_array.ndim == 1:
-            image_array = np.tile(image_array, (256, 1))  # TODO ?
-            axis.get_yaxis().set_visible(False)
+    def _update_color_bar(self):
+        if self.show_color_bar and (self._color_bar is None):
+            self._color_bar = self.fig.colorbar(self._color_bar_mappable,
+                                                ax=self._image.axes)
+        elif (not self.show_color_bar) and (self._color_bar is not None):
+            self._color_bar.remove()
+            self._color_bar = None
 
-        im = axis.imshow(image_array,
-                         origin='lower',
-                         interpolation=IMAGE_INTERPOLATION,
-                         cmap=self.color_map)
 
-        #axis.set_axis_off()
+    def _schedule_view_update(self):
+        """
+        Update the displayed image view once pending events are processed.
 
-        if self.show_color_bar:
-            plt.colorbar(im, ax=axis) # draw the colorbar
+        Zooming changes both the X and Y limits of the axis: the update is
+        deferred so that it is done only once.
+        """
+        if (self._image is not None) and not self._view_update_pending:
+            self._view_update_pending = True
+            self.root.after_idle(self._update_image_view)
+
+
+    def _update_image_view(self):
+        """
+        Display the pyramid level and the viewport that match the current
+        axis limits and size.
+        """
+        self._view_update_pending = False
+
+        if self._image is None:
+            return
+
+        if self._set_image_view():
+            self.canvas.draw_idle()
+
+
+    def _set_image_view(self):
+        """
+        Set the data of the displayed image to the view of the current
+        RenderData that matches the current axis limits and size.
+
+        Return True if the image has changed (it has to be redrawn).
+        """
+        axis = self._image.axes
+        bbox = axis.get_window_extent()
+
+        index_array, extent = self._render_data.get_view(axis.get_xlim(),
+                                                         axis.get_ylim(),
+                                                         bbox.width,
+                                                         bbox.height,
+                                                         lut_size=self.lut_size,
+                                                         scaling=self.scaling)
+
+        if index_array is self._image_index:
+            return False
+
+        self._image_index = index_array
+        self._image.set_data(apply_lut(index_array, get_lut(self.color_map, self.lut_size)))
+        self._image.set_extent(extent)
+        return True
+
+
+    # PLAYBACK ################################################################
+
+    def toggle_play(self):
+        if self._playing:
+            self.stop()
+        else:
+            self.play()
+
+
+    def play(self):
+        """
+        Play the planes of the current 3D/4D image along NAXIS3 (in a loop)
+        at `fps` frames per second.
+
+        Frames are displayed with blitting: only the data of the image
+        artist is updated and redrawn.  Planes are prepared in background
+        ahead of the displayed one; when a plane isn't ready in time, the
+        playback doesn't wait for it: frames are dropped to keep the pace.
+        The achieved frame rate is shown in the status bar.
+
+        The color bar and the histogram are updated when the playback stops.
+        """
+        if self._playing or (self.plane_index is None) or (self._image is None):
+            return
+
+        self._playing = True
+        self._play_clock = None
+        self._play_frame = self.plane_index[-1]
+        self._play_frame_times.clear()
+        self._play_dropped_frames = 0
+        self._play_report_time = time.perf_counter()
+
+        if self.play_button is not None:
+            self.play_button.config(text="Pause")
+
+        # The image is drawn apart from the rest of the figure (which is
+        # kept as the blitting background)
+        self._image.set_animated(True)
+        self.canvas.draw()
+
+        self._play_step()
+
+
+    def stop(self):
+        """
+        Stop the playback (the figure is redrawn for the current plane).
+        """
+        if not self._playing:
+            return
+
+        self._playing = False
+        self._blit_background = None
+
+        if self.play_button is not None:
+            self.play_button.config(text="Play")
+        self.status_label.config(text="")
+
+        if self._image is not None:
+            self._image.set_animated(False)
+            self.update_plane()
+
+
+    def _play_step(self):
+        """
+        Display the frame that matches the current time (called periodically
+        in the Tk thread during playbacks).
+        """
+        if (not self._playing) or (self._image is None):
+            self._playing = False
+            return
+
+        fps = max(self.fps, 0.1)
+        now = time.perf_counter()
+
+        if self._play_clock is None:
+            self._play_clock = (now, self.plane_index[-1])
+            self._play_frame = self.plane_index[-1] - 1
+
+        # The frame that should be displayed now
+        start_time, start_frame = self._play_clock
+        frame = start_frame + int((now - start_time) * fps)
+
+        planes_shape = get_planes_shape(self.hdu_list[self.hdu_index].header)
+        num_planes = planes_shape[-1]
+        target_plane_index = self.plane_index[:-1] + (frame % num_planes,)
+
+        if frame != self._play_frame:
+            render_data = self._render_cache.get(self._get_render_key(target_plane_index))
+
+            if render_data is not None:
+                # Frames that were not ready in time are dropped
+                self._play_dropped_frames += max(0, frame - self._play_frame - 1)
+                self._play_frame = frame
+                self.plane_index = target_plane_index
+                self._update_plane_variables()
+                self._show_frame(render_data)
+
+        # Prepare the next planes (from the frame that should be displayed,
+        # even if it wasn't ready)
+        if not self.loader.is_busy(PREFETCH_CHANNEL):
+            self._prefetch_planes(target_plane_index, forward=True)
+
+        self._report_fps(now)
+
+        # Wait for the next frame
+        next_frame_time = start_time + (frame + 1 - start_frame) / fps
+        delay = max(1, int((next_frame_time - time.perf_counter()) * 1000))
+        self.root.after(delay, self._play_step)
+
+
+    def _show_frame(self, render_data):
+        """
+        Display the given RenderData by blitting the image artist.
+        """
+        self._render_data = render_data
+        self._set_image_view()
+
+        if self._blit_background is None:
+            self.canvas.draw()
+        else:
+            axis = self._image.axes
+            self.canvas.restore_region(self._blit_background)
+            axis.draw_artist(self._image)
+            self.canvas.blit(axis.bbox)
+
+        self._play_frame_times.append(time.perf_counter())
+
+
+    def _on_draw(self, event):
+        """
+        Save the background of the image after each full redraw of the figure
+        during playbacks (the image artist is animated thus it's not drawn).
+        """
+        if self._playing and (self._image is not None):
+            axis = self._image.axes
+            self._blit_background = self.canvas.copy_from_bbox(axis.bbox)
+            axis.draw_artist(self._image)
+            self.canvas.blit(axis.bbox)
+
+
+    def _report_fps(self, now):
+        """
+        Show the achieved frame rate of the playback in the status bar.
+        """
+        while self._play_frame_times and (self._play_frame_times[0] < now - FPS_REPORT_INTERVAL):
+            self._play_frame_times.popleft()
+
+        if now - self._play_report_time >= FPS_REPORT_INTERVAL:
+            self._play_report_time = now
+            self.status_label.config(text="Playing plane {}: {:.1f} fps (target {:.1f} fps), {} frames dropped".format(self.plane_index,
+                                                                                                                  len(self._play_frame_times) / FPS_REPORT_INTERVAL,
+                                                                                                                  self.fps,
+                                                                                                                  self._play_dropped_frames))
 
 
     # PROPERTIES ##############################################################
@@ -501,7 +1622,7 @@ class TkGUI:
     def file_path(self):
         _file_path = None
         if self.hdu_list is not None:
-            _file_path = self.hdu_list.filename()
+            _file_path = self._file_path
         return _file_path
 
     ###
@@ -551,6 +1672,46 @@ class TkGUI:
     def color_map(self, value):
         self._color_map.set(value)
 
+    ###
+
+    @property
+    def scale(self):
+        return self._scale.get()
+
+    @scale.setter
+    def scale(self, value):
+        self._scale.set(value)
+
+    ###
+
+    @property
+    def interval(self):
+        return self._interval.get()
+
+    @interval.setter
+    def interval(self, value):
+        self._interval.set(value)
+
+    ###
+
+    @property
+    def scaling(self):
+        return Scaling(self.scale, self.interval, self.percent)
+
+    ###
+
+    @property
+    def fps(self):
+        try:
+            return self._fps.get()
+        except tk.TclError:
+            # The spinbox is being edited
+            return DEFAULT_FPS
+
+    @fps.setter
+    def fps(self, value):
+        self._fps.set(value)
+
 
 def main():
 
@@ -576,6 +1737,48 @@ def main():
     parser.add_argument("--showhist", "-H", action="store_true",
             help="show the histogram of the image")
 
+    parser.add_argument("--nomemmap", action="store_true",
+            help="read the whole data of the selected HDU into memory "
+                 "instead of memory-mapping it")
+
+    parser.add_argument("--nogzcache", action="store_true",
+            help="don't keep a decompressed copy of gzip-compressed files "
+                 "(they are decompressed each time they are opened and can't be memory-mapped)")
+
+    parser.add_argument("--nopreviewcache", action="store_true",
+            help="don't keep the previews, histograms and statistics of the displayed images "
+                 "on disk (they are used to display files faster when they are opened again)")
+
+    parser.add_argument("--downsampling", "-d", default=DEFAULT_DOWNSAMPLING_METHOD,
+            choices=("mean", "max"),
+            help="the method used to downsample large images on screen "
+                 "(block mean or block max)")
+
+    parser.add_argument("--bins", "-b", type=int, default=DEFAULT_NUM_BINS, metavar="INTEGER",
+            help="the maximum number of bins of the histogram")
+
+    parser.add_argument("--lut16", action="store_true",
+            help="display images with {} colors (16 bits index images) "
+                 "instead of {}".format(HIGH_PRECISION_LUT_SIZE, DEFAULT_LUT_SIZE))
+
+    parser.add_argument("--scale", "-s", default=DEFAULT_SCALE, choices=SCALES,
+            help="the stretch applied to pixel values")
+
+    parser.add_argument("--interval", "-I", default=DEFAULT_INTERVAL, choices=INTERVALS,
+            help="the interval of displayed pixel values: the whole range (minmax), "
+                 "the DS9 zscale interval or a central percentile interval")
+
+    parser.add_argument("--percent", type=float, default=DEFAULT_PERCENT, metavar="FLOAT",
+            help="the percentage of pixels kept by the percentile interval")
+
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, metavar="FLOAT",
+            help="the frame rate of the playback of the planes of 3D/4D images "
+                 "(press the space key to play them)")
+
+    parser.add_argument("--index", default=None, metavar="FILE",
+            help="the header index database searched with File > Search Index "
+                 "(default: {})".format(get_default_index_path()))
+
     parser.add_argument("filearg", nargs="?", metavar="FILE", const=None,
             help="the FITS file to process")
 
@@ -586,9 +1789,22 @@ def main():
     # SET OPTIONS #############################################################
 
     gui.color_map = args.cmap
+    gui.scale = args.scale
+    gui.interval = args.interval
+    gui.percent = args.percent
+    gui.fps = args.fps
     gui.show_color_bar = not args.hidecbar
     gui.show_image = not args.hideimage
     gui.show_histogram = args.showhist
+    gui.memmap = not args.nomemmap
+    gui.gzip_cache = not args.nogzcache
+    if args.nopreviewcache:
+        gui.preview_cache = None
+    gui.downsampling_method = args.downsampling
+    gui.histogram_bins = args.bins
+    gui.lut_size = HIGH_PRECISION_LUT_SIZE if args.lut16 else DEFAULT_LUT_SIZE
+    if args.index is not None:
+        gui.index_path = args.index
 
     if input_file_path is not None:
         gui.open_fits_file(input_file_path)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Documentation: https://docs.python.org/3/library/tkinter.ttk.html
+"""
+A Tk dialog to search the header index of FITS files (see
+`fitsviewer.core.index`) and open the matching HDUs.
+"""
+
+__all__ = ['SearchDialog']
+
+import tkinter as tk
+from tkinter import ttk
+
+###############################################################################
+
+COLUMN_WIDTH = 100
+FILE_COLUMN_WIDTH = 400
+HDU_COLUMN_WIDTH = 50
+
+QUERY_HELP = "e.g. OBJECT == M31 and FILTER == 'R*' and DATE-OBS >= 2020-01-01"
+
+###############################################################################
+
+class SearchDialog(tk.Toplevel):
+    """
+    A dialog with a query entry and the list of the matching HDUs.
+
+    `on_search(query)` is called when a query is entered, `on_update()` when
+    the "Index Directory..." button is clicked and `on_open(file_path,
+    hdu_index)` when a result is double-clicked (the search and the indexing
+    are done by the caller, which then calls `set_results`).
+    """
+
+    def __init__(self, master, on_search=None, on_update=None, on_open=None):
+        tk.Toplevel.__init__(self, master=master)
+        self.title("Search Index")
+
+        self.result_list = []
+        self._on_search = on_search
+        self._on_update = on_update
+        self._on_open = on_open
+
+        # Query bar
+        query_bar = tk.Frame(master=self)
+        query_bar.pack(side="top", fill="x")
+
+        tk.Label(master=query_bar, text="Query:").pack(side="left", padx=5)
+
+        self.query_entry = tk.Entry(master=query_bar, width=60)
+        self.query_entry.pack(side="left", fill="x", expand=True)
+        self.query_entry.bind("<Return>", lambda event: self._search())
+
+        tk.Button(master=query_bar, text="Search", command=self._search).pack(side="left", padx=2)
+        tk.Button(master=query_bar, text="Index Directory...", command=self._update).pack(side="left", padx=2)
+
+        self.status_label = tk.Label(master=self, anchor="w")
+        self.status_label.pack(side="bottom", fill="x", padx=5)
+
+        # Results
+        self.tree = ttk.Treeview(master=self, show="headings", selectmode="browse")
+        y_scrollbar = ttk.Scrollbar(master=self, orient="vertical", command=self.tree.yview)
+        x_scrollbar = ttk.Scrollbar(master=self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
+        y_scrollbar.pack(side="right", fill="y")
+        x_scrollbar.pack(side="bottom", fill="x")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Double-1>", lambda event: self._open())
+        self.tree.bind("<Return>", lambda event: self._open())
+
+        self.set_results([])
+        self.set_status(QUERY_HELP)
+        self.query_entry.focus_set()
+
+
+    def set_status(self, text):
+        self.status_label.config(text=text)
+
+
+    def set_results(self, result_list, max_results=None):
+        """
+        Display the HDUs of `result_list` (see
+        `fitsviewer.core.index.HeaderIndex.search`).
+        """
+        self.result_list = result_list
+
+        keywords = list(dict.fromkeys(keyword for result in result_list for keyword in result["header"]))
+
+        column_ids = ["file", "hdu", "type", "shape", "dtype"] + ["k{}".format(index) for index in range(len(keywords))]
+        self.tree.delete(*self.tree.get_children())
+        self.tree.configure(columns=column_ids)
+
+        for column_id, heading in zip(column_ids, ["File", "HDU", "Type", "Shape", "Dtype"] + keywords):
+            self.tree.heading(column_id, text=heading)
+            self.tree.column(column_id, width=COLUMN_WIDTH, stretch=False)
+        self.tree.column("file", width=FILE_COLUMN_WIDTH, stretch=True)
+        self.tree.column("hdu", width=HDU_COLUMN_WIDTH, anchor="e")
+
+        for index, result in enumerate(result_list):
+            values = [result["file"], result["hdu"], result["type"], result["shape"], result["dtype"] or ""]
+            values += [result["header"].get(keyword, "") for keyword in keywords]
+            self.tree.insert("", "end", iid=str(index), values=values)
+
+        if (max_results is not None) and len(result_list) >= max_results:
+            self.set_status("The first {} matching HDUs".format(len(result_list)))
+        else:
+            self.set_status("{} matching HDUs".format(len(result_list)))
+
+
+    def _search(self):
+        if self._on_search is not None:
+            self._on_search(self.query_entry.get())
+
+
+    def _update(self):
+        if self._on_update is not None:
+            self._on_update()
+
+
+    def _open(self):
+        selection = self.tree.selection()
+        if selection and (self._on_open is not None):
+            result = self.result_list[int(selection[0])]
+            self._on_open(result["file"], result["hdu"])
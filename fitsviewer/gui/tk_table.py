@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# FITS Viewer
+
+# The MIT License
+#
+# Copyright (c) 2016 Jeremie DECOCK (http://www.jdhp.org)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+"""
+A Tk view of the rows of table HDUs (see `fitsviewer.core.table`).
+
+The view is virtual: the Treeview only contains the rows that are visible
+on screen and the scrollbar is driven by the index of the first visible
+row, thus scrolling costs the same whatever the number of rows.
+"""
+
+__all__ = ['TableView']
+
+import tkinter as tk
+from tkinter import ttk
+
+###############################################################################
+
+# The number of rows scrolled by a mouse wheel step
+WHEEL_SCROLL_ROWS = 3
+
+# The row height (in pixels) used until the Treeview can be measured
+DEFAULT_ROW_HEIGHT = 20
+
+COLUMN_WIDTH = 100
+ROW_NUMBER_COLUMN_WIDTH = 80
+
+###############################################################################
+
+class TableView(tk.Frame):
+    """
+    A table of the rows of a `fitsviewer.core.table.TableData`.
+
+    `on_sort(column_name)` is called when a column heading is clicked and
+    `on_filter(expression)` when a filter is entered (the sorting and the
+    filtering are done by the caller, which then calls `refresh`).
+    """
+
+    def __init__(self, master, on_sort=None, on_filter=None):
+        tk.Frame.__init__(self, master=master)
+
+        self.table_data = None
+        self.first_row = 0           # The index of the first visible row (once sorted and filtered)
+        self._on_sort = on_sort
+        self._on_filter = on_filter
+
+        # Filter bar
+        filter_bar = tk.Frame(master=self)
+        filter_bar.pack(side="top", fill="x")
+
+        tk.Label(master=filter_bar, text="Filter:").pack(side="left", padx=5)
+
+        self.filter_entry = tk.Entry(master=filter_bar)
+        self.filter_entry.pack(side="left", fill="x", expand=True)
+        self.filter_entry.bind("<Return>", lambda event: self._apply_filter())
+
+        tk.Button(master=filter_bar, text="Apply", command=self._apply_filter).pack(side="left", padx=2)
+        tk.Button(master=filter_bar, text="Clear", command=self._clear_filter).pack(side="left", padx=2)
+
+        self.rows_label = tk.Label(master=filter_bar, anchor="e")
+        self.rows_label.pack(side="left", padx=5)
+
+        # Rows
+        self.scrollbar = ttk.Scrollbar(master=self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree = ttk.Treeview(master=self, show="headings", selectmode="browse")
+        self.x_scrollbar = ttk.Scrollbar(master=self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.x_scrollbar.set)
+        self.x_scrollbar.pack(side="bottom", fill="x")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", lambda event: self.refresh())
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-WHEEL_SCROLL_ROWS if event.delta > 0 else WHEEL_SCROLL_ROWS))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-WHEEL_SCROLL_ROWS))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(WHEEL_SCROLL_ROWS))
+
+        # The keys move the first visible row (the Treeview only has the
+        # visible rows)
+        for key, rows in (("<Up>", -1), ("<Down>", 1)):
+            self.tree.bind(key, lambda event, rows=rows: self.scroll(rows) or "break")
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.num_visible_rows) or "break")
+        self.tree.bind("<Next>", lambda event: self.scroll(self.num_visible_rows) or "break")
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0) or "break")
+        self.tree.bind("<End>", lambda event: self.scroll_to(self._get_num_rows()) or "break")
+
+
+    def set_table(self, table_data):
+        """
+        Display the rows of `table_data` from the first one.
+        """
+        self.table_data = table_data
+        self.first_row = 0
+
+        self.filter_entry.delete(0, "end")
+        if table_data.filter_expression:
+            self.filter_entry.insert(0, table_data.filter_expression)
+
+        column_ids = ["#row"] + ["c{}".format(index) for index in range(len(table_data.column_names))]
+        self.tree.configure(columns=column_ids)
+
+        self.tree.heading("#row", text="Row")
+        self.tree.column("#row", width=ROW_NUMBER_COLUMN_WIDTH, anchor="e", stretch=False)
+
+        for column_id, column_name in zip(column_ids[1:], table_data.column_names):
+            self.tree.heading(column_id,
+                              text=self._get_heading(column_name),
+                              command=lambda column_name=column_name: self._sort(column_name))
+            self.tree.column(column_id, width=COLUMN_WIDTH, anchor="e", stretch=False)
+
+        self.refresh()
+
+
+    def update_order(self):
+        """
+        Update the headings once the rows are sorted or filtered, and show
+        the first row.
+        """
+        self.first_row = 0
+
+        for index, column_name in enumerate(self.table_data.column_names):
+            self.tree.heading("c{}".format(index), text=self._get_heading(column_name))
+
+        self.refresh()
+
+
+    def _get_heading(self, column_name):
+        if column_name == self.table_data.sort_column:
+            return column_name + (" ▼" if self.table_data.descending else " ▲")
+        return column_name
+
+
+    def _get_num_rows(self):
+        return 0 if self.table_data is None else self.table_data.num_displayed_rows
+
+
+    @property
+    def num_visible_rows(self):
+        """The number of rows that fit in the Treeview."""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+
+        if bbox:
+            header_height, row_height = bbox[1], bbox[3]
+        else:
+            header_height, row_height = DEFAULT_ROW_HEIGHT, DEFAULT_ROW_HEIGHT
+
+        return max(1, (self.tree.winfo_height() - header_height) // max(row_height, 1))
+
+
+    def refresh(self):
+        """
+        Fill the Treeview with the visible rows (only these rows are read).
+        """
+        num_rows = self._get_num_rows()
+        num_visible_rows = self.num_visible_rows
+
+        self.first_row = max(0, min(self.first_row, num_rows - num_visible_rows))
+
+        self.tree.delete(*self.tree.get_children())
+
+        if self.table_data is not None:
+            for row_number, values in self.table_data.get_rows(self.first_row, self.first_row + num_visible_rows):
+                self.tree.insert("", "end", values=[row_number] + values)
+
+        if num_rows > 0:
+            self.scrollbar.set(self.first_row / num_rows,
+                               min(self.first_row + num_visible_rows, num_rows) / num_rows)
+        else:
+            self.scrollbar.set(0., 1.)
+
+        if (self.table_data is not None) and (num_rows != self.table_data.num_rows):
+            self.rows_label.config(text="{} / {} rows".format(num_rows, self.table_data.num_rows))
+        else:
+            self.rows_label.config(text="{} rows".format(num_rows))
+
+
+    def scroll(self, num_rows):
+        self.scroll_to(self.first_row + num_rows)
+
+
+    def scroll_to(self, first_row):
+        self.first_row = first_row
+        self.refresh()
+
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self._get_num_rows()))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.num_visible_rows
+            self.scroll(step)
+
+
+    def _sort(self, column_name):
+        if self._on_sort is not None:
+            self._on_sort(column_name)
+
+
+    def _apply_filter(self):
+        if self._on_filter is not None:
+            self._on_filter(self.filter_entry.get().strip())
+
+
+    def _clear_filter(self):
+        self.filter_entry.delete(0, "end")
+        self._apply_filter()
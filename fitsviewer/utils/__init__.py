@@ -22,5 +22,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-__all__ = ['fits2png',
+__all__ = ['fits2gif',
+           'fits2png',
+           'fitsindex',
+           'fitsinfo',
+           'fitsstats',
            'png2fits']
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from fitsviewer.core.colormap import quantize, get_lut, apply_lut, DEFAULT_LUT_SIZE
+from fitsviewer.core.cube import get_planes_shape
+from fitsviewer.core.hdu import open_fits, get_image_data, get_image_plane
+from fitsviewer.core.scaling import get_interval, normalize, SCALES, INTERVALS, DEFAULT_SCALE, DEFAULT_INTERVAL, DEFAULT_PERCENT
+
+DEFAULT_COLOR_MAP = "gray"
+DEFAULT_FPS = 10.
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi', '.webm')
+DEFAULT_VIDEO_CODEC = "libx264"
+
+
+def get_cube_hdu(hdu_list, hdu_index=None):
+    """
+    Return the (hdu_index, hdu) pair of the HDU `hdu_index` or, if it is
+    None, of the first image HDU of `hdu_list` with 3 axes or more.
+    """
+    for _hdu_index, hdu in enumerate(hdu_list):
+        if (hdu_index is not None) and (_hdu_index != hdu_index):
+            continue
+        if hdu.is_image and len(get_planes_shape(hdu.header)) > 0:
+            return _hdu_index, hdu
+
+    if hdu_index is None:
+        raise Exception("The input file doesn't contain any 3D image.")
+    raise Exception("The HDU {} isn't a 3D image.".format(hdu_index))
+
+
+def iter_frames(hdu,
+                scale=DEFAULT_SCALE,
+                interval=DEFAULT_INTERVAL,
+                percent=DEFAULT_PERCENT,
+                per_frame=False):
+    """
+    Iterate over the planes of the given 3D (or 4D) image HDU as index images
+    (see fitsviewer.core.colormap) in the PIL order (the first row at the top).
+
+    Planes are read one at a time, thus the memory usage doesn't depend on
+    the number of planes.  The interval of displayed values is estimated
+    once on the whole cube (by blocks) so that frames can be compared, or on
+    each plane if `per_frame` is True.
+    """
+    if not per_frame:
+        vmin, vmax = get_interval(get_image_data(hdu), interval=interval, percent=percent)
+
+    for plane_index in np.ndindex(*get_planes_shape(hdu.header)):
+        image_array = get_image_plane(hdu, plane_index)
+
+        if per_frame:
+            vmin, vmax = get_interval(image_array, interval=interval, percent=percent)
+
+        # WARNING: with fits, the (0,0) point is at the BOTTOM left corner
+        #          whereas with pillow, the (0,0) point is at the TOP left corner
+        yield quantize(normalize(image_array[::-1], vmin, vmax, scale), DEFAULT_LUT_SIZE)
+
+
+def save_to_gif(frames, output_file_path, color_map=DEFAULT_COLOR_MAP, fps=DEFAULT_FPS, loop=0):
+    """
+    Write the index images `frames` to an animated GIF file, one frame at a
+    time (frames are not kept in memory).
+
+    The colormap lookup table is the GIF palette: index images are written
+    as is, without color quantization.  The file is written to a temporary
+    file which replaces `output_file_path` once all frames are written: an
+    error while reading frames doesn't leave a truncated GIF file.
+    """
+    import PIL.Image as pil_img # PIL.Image is a module not a class...
+    from PIL import GifImagePlugin
+
+    palette = get_lut(color_map, DEFAULT_LUT_SIZE)[:, :3].tobytes()
+    duration = int(round(1000. / fps))
+
+    num_frames = 0
+
+    # The temporary file is in the output directory so that it can be renamed
+    output_directory, output_file_name = os.path.split(os.path.abspath(output_file_path))
+    temp_file_path = os.path.join(output_directory, ".{}.{}.tmp".format(output_file_name, os.getpid()))
+
+    try:
+        with open(temp_file_path, "wb") as fd:
+            for index_array in frames:
+                pil_image = pil_img.fromarray(index_array)
+                pil_image.putpalette(palette)     # "L" -> "P" image
+
+                if num_frames == 0:
+                    header, _ = GifImagePlugin.getheader(pil_image, palette, {"loop": loop, "optimize": False})
+                    fd.write(b"".join(header))
+
+                for data in GifImagePlugin.getdata(pil_image, duration=duration):
+                    fd.write(data)
+
+                num_frames += 1
+
+            if num_frames == 0:
+                raise Exception("No frame to write to {}.".format(output_file_path))
+
+            fd.write(b";")     # GIF trailer
+
+        os.replace(temp_file_path, output_file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+
+    return num_frames
+
+
+def save_to_video(frames, output_file_path, color_map=DEFAULT_COLOR_MAP, fps=DEFAULT_FPS, codec=DEFAULT_VIDEO_CODEC):
+    """
+    Write the index images `frames` to a video file, one frame at a time,
+    through a pipe to the ffmpeg command (which should be installed).
+    """
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path is None:
+        raise Exception("The ffmpeg command is required to write video files.")
+
+    lut = np.ascontiguousarray(get_lut(color_map, DEFAULT_LUT_SIZE)[:, :3])
+
+    process = None
+    rgb_array = None
+    num_frames = 0
+
+    # ffmpeg messages go to a temporary file rather than to a pipe: a full
+    # pipe would block ffmpeg while frames are still being written
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            for index_array in frames:
+                if process is None:
+                    height, width = index_array.shape
+                    rgb_array = np.empty((height, width, 3), dtype=np.uint8)
+                    process = subprocess.Popen([ffmpeg_path, "-y", "-loglevel", "error",
+                                                "-f", "rawvideo",
+                                                "-pix_fmt", "rgb24",
+                                                "-s", "{}x{}".format(width, height),
+                                                "-r", str(fps),
+                                                "-i", "-",
+                                                # Most codecs require even dimensions
+                                                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                                                "-c:v", codec,
+                                                "-pix_fmt", "yuv420p",
+                                                output_file_path],
+                                               stdin=subprocess.PIPE,
+                                               stderr=stderr_file)
+
+                apply_lut(index_array, lut, out=rgb_array)
+                try:
+                    process.stdin.write(rgb_array.data)
+                except BrokenPipeError:
+                    break    # ffmpeg exited: its error is reported below
+                num_frames += 1
+        except BaseException:
+            # Don't hide the exception raised while reading frames behind
+            # the ffmpeg failure it causes
+            if process is not None:
+                process.kill()
+                process.wait()
+
+                # Don't leave a truncated video file
+                if os.path.exists(output_file_path):
+                    os.remove(output_file_path)
+            raise
+        finally:
+            if process is not None:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        if process is None:
+            raise Exception("No frame to write to {}.".format(output_file_path))
+
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode(errors="replace").strip()
+            raise Exception("ffmpeg failed to write {}: {}".format(output_file_path, message))
+
+    return num_frames
+
+
+def main(default_extension=".gif"):
+
+    # PARSE OPTIONS ###########################################################
+
+    parser = argparse.ArgumentParser(description="Convert the planes of a 3D FITS image to an animated GIF "
+                                                 "or (with ffmpeg) to a video")
+
+    parser.add_argument("--output", "-o", default=None, metavar="FILE",
+            help="the output file; its format is given by its extension: .gif or a video format "
+                 "({}) (default: the input file with the {} extension)".format(", ".join(VIDEO_EXTENSIONS), default_extension))
+
+    parser.add_argument("--hdu", type=int, default=None, metavar="INTEGER",
+            help="the index of the HDU to convert (the first 3D image by default)")
+
+    parser.add_argument("--cmap", "-C", default=DEFAULT_COLOR_MAP, metavar="STRING",
+            help="the colormap to use")
+
+    parser.add_argument("--scale", "-s", default=DEFAULT_SCALE, choices=SCALES,
+            help="the stretch applied to pixel values")
+
+    parser.add_argument("--interval", "-I", default=DEFAULT_INTERVAL, choices=INTERVALS,
+            help="the interval of displayed pixel values: the whole range (minmax), "
+                 "the DS9 zscale interval or a central percentile interval")
+
+    parser.add_argument("--percent", type=float, default=DEFAULT_PERCENT, metavar="FLOAT",
+            help="the percentage of pixels kept by the percentile interval")
+
+    parser.add_argument("--per-frame", action="store_true",
+            help="compute the interval of displayed values on each plane "
+                 "instead of once on the whole cube")
+
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, metavar="FLOAT",
+            help="the number of frames per second")
+
+    parser.add_argument("--loop", type=int, default=0, metavar="INTEGER",
+            help="the number of times GIF animations are repeated (0 = forever)")
+
+    parser.add_argument("--codec", default=DEFAULT_VIDEO_CODEC, metavar="STRING",
+            help="the ffmpeg video codec")
+
+    parser.add_argument("filearg", nargs=1, metavar="FILE",
+            help="the FITS file to convert")
+
+    args = parser.parse_args()
+
+    input_file_path = args.filearg[0]
+
+    if args.output is None:
+        output_file_path = os.path.splitext(input_file_path)[0] + default_extension
+    else:
+        output_file_path = args.output
+
+    # READ AND SAVE DATA ######################################################
+
+    hdu_list = open_fits(input_file_path)
+
+    try:
+        hdu_index, hdu = get_cube_hdu(hdu_list, args.hdu)
+
+        frames = iter_frames(hdu,
+                             scale=args.scale,
+                             interval=args.interval,
+                             percent=args.percent,
+                             per_frame=args.per_frame)
+
+        if output_file_path.lower().endswith(VIDEO_EXTENSIONS):
+            save_to_video(frames, output_file_path, color_map=args.cmap, fps=args.fps, codec=args.codec)
+        else:
+            save_to_gif(frames, output_file_path, color_map=args.cmap, fps=args.fps, loop=args.loop)
+    finally:
+        hdu_list.close()
+
+
+def main_video():
+    main(default_extension=".mp4")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,84 +4,221 @@
 # Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
 
 import argparse
-from astropy.io import fits
+import functools
+import itertools
 import os
+import sys
+import time
 
-import PIL.Image as pil_img # PIL.Image is a module not a class...
 import numpy as np
 
+from fitsviewer.core.arrays import iter_chunk_indices, get_range
+from fitsviewer.core.batch import get_output_file_path_prefix, list_input_files, run_batch
+from fitsviewer.core.cube import get_planes_shape
+from fitsviewer.core.hdu import open_fits, get_image_shape, get_image_data
+from fitsviewer.core.scaling import get_interval, normalize, SCALES, INTERVALS, DEFAULT_SCALE, DEFAULT_INTERVAL, DEFAULT_PERCENT
 
-def load_fits_file(input_file_path):
-    # Open the FITS file
-    hdu_list = fits.open(input_file_path)
+BIT_DEPTHS = (8, 16)
 
-    image_array_list = []
+# Number of pixels normalized at once by save_to_png (1 MiB of float32)
+ENCODE_CHUNK_SIZE = 2**18
 
-    for hdu in hdu_list:
-        if hdu.is_image:
-            image_array = hdu.data   # "hdu.data" is a Numpy Array
+# Key of the PNG text chunk where the rendering options are written
+OPTIONS_KEY = "fits2png"
 
-            if image_array.ndim == 2:
 
-                # If there are only one image (image_array is an 2D array)
-                image_array_list.append(image_array)
+def load_fits_file(input_file_path):
+    """
+    Iterate over the 2D images of the given FITS file as
+    (hdu_index, plane_index, image_array) tuples.
+
+    `plane_index` is None for 2D HDUs and the index of the plane in 3D (and
+    above) HDUs (see fitsviewer.core.cube).  Images are read lazily: data is
+    memory-mapped and each image is a view on one plane, thus the memory
+    usage doesn't depend on the size of the file.  The file is closed when
+    the iteration ends.
+    """
+    # Open the FITS file (only the headers are read)
+    hdu_list = open_fits(input_file_path)
 
-            elif image_array.ndim == 3: # TODO
+    try:
+        for hdu_index, hdu in enumerate(hdu_list):
+            if not hdu.is_image:
+                continue
 
-                # If there is more than one image (image_array is an 3D array)
-                for image_sub_array in image_array:
-                    image_array_list.append(image_sub_array)
+            ndim = len(get_image_shape(hdu.header))
 
-            elif image_array.ndim == 4: # TODO
+            if ndim == 2:
+                # "hdu.data" is a (memory-mapped) Numpy Array
+                yield hdu_index, None, hdu.data
 
-                # If there is more than one image (image_array is an 3D array)
-                for image_sub_array in image_array:
-                    for image_sub_sub_array in image_sub_array:
-                        image_array_list.append(image_sub_sub_array)
+            elif ndim > 2:
+                # Each plane is a view on the memory-mapped data (or is read
+                # and scaled on its own through "hdu.section")
+                image_data = get_image_data(hdu)
+                for plane_index in np.ndindex(*get_planes_shape(hdu.header)):
+                    yield hdu_index, plane_index, image_data[plane_index]
+    finally:
+        # Close the FITS file
+        hdu_list.close()
 
-    # Close the FITS file
-    hdu_list.close()
 
-    return image_array_list
+def get_options_stamp(scale=DEFAULT_SCALE, interval=DEFAULT_INTERVAL, percent=DEFAULT_PERCENT, bit_depth=8):
+    """
+    Return the string describing the rendering options written in the PNG
+    files (see is_up_to_date).
+    """
+    return "scale={} interval={} percent={:g} bit_depth={}".format(scale, interval, percent, bit_depth)
 
 
-def save_to_png(image_array, output_file_path, min_val=None, max_val=None):
+def save_to_png(image_array, output_file_path, min_val=None, max_val=None, scale=DEFAULT_SCALE, bit_depth=8,
+                lossless=False, options_stamp=None):
     """
-    image_array is the image and it should be a 2D numpy array with values in the range [0,255].
+    image_array is the image and it should be a 2D numpy array.
     min_val and max_val are normalization parameters (the minimum and maximum value of a pixel).
+    scale is the stretch applied to normalized values (see fitsviewer.core.scaling).
+    bit_depth is the number of bits per pixel of the PNG image (8 or 16).
+    lossless, if True, writes integer pixels as is (shifted by min_val) in 16 bits images when
+    the scale is linear and the range [min_val, max_val] fits in 16 bits; it should only be
+    set when [min_val, max_val] is the range of the image (the minmax interval).
+    options_stamp, if not None, is written in the OPTIONS_KEY text chunk of the PNG file.
+
+    The image is encoded by blocks of rows (see fitsviewer.core.arrays) in a
+    preallocated uint8 (or uint16) buffer: the peak memory usage is about
+    the size of the PNG pixels plus a few float32 blocks of
+    ENCODE_CHUNK_SIZE pixels.
     """
 
     if image_array.ndim != 2:
         raise Exception("The input image should be a 2D numpy array.")
 
-    mode = "L"                           # "L" = grayscale mode
-    pil_image = pil_img.new(mode, (image_array.shape[1], image_array.shape[0]))
+    if bit_depth not in BIT_DEPTHS:
+        raise ValueError("Unknown bit depth: {}".format(bit_depth))
+
+    if (min_val is None) or (max_val is None):
+        range_min_val, range_max_val = get_range(image_array)
+        min_val = range_min_val if min_val is None else min_val
+        max_val = range_max_val if max_val is None else max_val
+
+    if bit_depth == 16:
+        dtype = np.uint16
+    else:
+        dtype = np.uint8
+
+    max_level = np.iinfo(dtype).max
+
+    # Integer pixels are written as is (shifted by min_val) when they all fit
+    # in the 16 bits levels: the PNG image is then lossless
+    is_lossless = lossless and (bit_depth == 16) and (scale == 'linear') \
+                  and np.issubdtype(image_array.dtype, np.integer) \
+                  and (float(min_val).is_integer()) and (0 < max_val - min_val <= max_level)
+
+    output_array = np.empty(image_array.shape, dtype=dtype)
 
     # FLIP THE IMAGE IN THE UP/DOWN DIRECTION #############
     # WARNING: with fits, the (0,0) point is at the BOTTOM left corner
     #          whereas with pillow, the (0,0) point is at the TOP left corner
     #          thus the image should be converted
+    # Blocks are written in a flipped view of the output buffer: the buffer
+    # itself is in the pillow order and is given to pillow without copy.
 
-    image_array = np.flipud(image_array)
+    flipped_output_array = output_array[::-1]
 
     # Normalize values ################
-    # (FITS pixels value are unbounded but PNG pixels value are in range [0,255])
-    if min_val is None:
-        min_val = image_array.min()
-    if max_val is None:
-        max_val = image_array.max()
-
-    image_array = image_array.astype(np.float64)
-    image_array -= min_val
-    image_array /= (max_val - min_val)
-    image_array *= 255.
-    image_array = image_array.astype(np.uint8)
+    # (FITS pixels value are unbounded but PNG pixels value are in range [0,255] or [0,65535])
+
+    for index in iter_chunk_indices(image_array.shape, ENCODE_CHUNK_SIZE):
+        chunk = np.asarray(image_array[index])
+
+        if is_lossless:
+            chunk = np.subtract(chunk, int(min_val), dtype=np.int64)
+            np.clip(chunk, 0, int(max_val - min_val), out=chunk)
+            flipped_output_array[index] = chunk
+        else:
+            chunk = normalize(chunk, min_val, max_val, scale)
+            chunk *= np.float32(max_level)
+            np.nan_to_num(chunk, copy=False)
+            np.copyto(flipped_output_array[index], chunk, casting='unsafe')
 
     # Save ############################
-    # WARNING: nested list and 2D numpy arrays are silently rejected!!!
-    #          data *must* be a list or a 1D numpy array!
-    pil_image.putdata(image_array.flatten())
-    pil_image.save(output_file_path)
+
+    # Pillow is only imported when an image is saved (not for --help)
+    import PIL.Image as pil_img # PIL.Image is a module not a class...
+    from PIL.PngImagePlugin import PngInfo
+
+    png_info = PngInfo()
+    if options_stamp is not None:
+        png_info.add_text(OPTIONS_KEY, options_stamp)
+
+    pil_image = pil_img.fromarray(output_array)
+    pil_image.save(output_file_path, pnginfo=png_info)
+
+
+def is_up_to_date(input_file_path, options_stamp=None):
+    """
+    Return True if the PNG files of `input_file_path` exist, are more
+    recent than it and (if `options_stamp` is not None) were rendered with
+    the same options (see get_options_stamp).
+    """
+    output_file_path_prefix = get_output_file_path_prefix(input_file_path)
+    input_mtime = os.path.getmtime(input_file_path)
+
+    for output_file_path in ("{}.png".format(output_file_path_prefix),
+                             "{}_0.png".format(output_file_path_prefix)):
+        if os.path.isfile(output_file_path) and (os.path.getmtime(output_file_path) >= input_mtime):
+            if options_stamp is None:
+                return True
+
+            # Only the chunks preceding the pixels are read
+            import PIL.Image as pil_img # PIL.Image is a module not a class...
+
+            with pil_img.open(output_file_path) as pil_image:
+                return pil_image.text.get(OPTIONS_KEY) == options_stamp
+
+    return False
+
+
+def convert_fits_file(input_file_path,
+                      scale=DEFAULT_SCALE,
+                      interval=DEFAULT_INTERVAL,
+                      percent=DEFAULT_PERCENT,
+                      bit_depth=8,
+                      force=False):
+    """
+    Convert the images of `input_file_path` to PNG files.
+
+    Return the number of PNG files written (None if the PNG files are
+    already up to date and `force` is False).
+    """
+    options_stamp = get_options_stamp(scale, interval, percent, bit_depth)
+
+    if (not force) and is_up_to_date(input_file_path, options_stamp):
+        return None
+
+    output_file_path_prefix = get_output_file_path_prefix(input_file_path)
+
+    images = load_fits_file(input_file_path)
+
+    # Images are numbered only if there are more than one (they are read
+    # lazily: looking ahead doesn't read any data)
+    first_images = list(itertools.islice(images, 2))
+    numbered = len(first_images) > 1
+
+    num_images = 0
+
+    for image_index, (hdu_index, plane_index, image_array) in enumerate(itertools.chain(first_images, images)):
+        if numbered:
+            output_file_path = "{}_{}.png".format(output_file_path_prefix, image_index)
+        else:
+            output_file_path = "{}.png".format(output_file_path_prefix)
+
+        min_val, max_val = get_interval(image_array, interval=interval, percent=percent)
+        save_to_png(image_array, output_file_path, min_val, max_val, scale=scale, bit_depth=bit_depth,
+                    lossless=(interval == 'minmax'), options_stamp=options_stamp)
+
+        num_images += 1
+
+    return num_images
 
 
 def main():
@@ -89,21 +226,72 @@ def main():
     # PARSE OPTIONS ###########################################################
 
     parser = argparse.ArgumentParser(description="Convert FITS files to PNG images")
-    parser.add_argument("filearg", nargs=1, metavar="FILE", help="the FITS file to convert")
+    parser.add_argument("--scale", "-s", default=DEFAULT_SCALE, choices=SCALES,
+                        help="the stretch applied to pixel values")
+    parser.add_argument("--interval", "-I", default=DEFAULT_INTERVAL, choices=INTERVALS,
+                        help="the interval of pixel values mapped to [0,255]: the whole range (minmax), "
+                             "the DS9 zscale interval or a central percentile interval")
+    parser.add_argument("--percent", type=float, default=DEFAULT_PERCENT, metavar="FLOAT",
+                        help="the percentage of pixels kept by the percentile interval")
+    parser.add_argument("--bit-depth", type=int, default=8, choices=BIT_DEPTHS,
+                        help="the number of bits per pixel of PNG images (16 bits images of integer data "
+                             "are lossless with the linear minmax scaling if the data range fits in 16 bits)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), metavar="INTEGER",
+                        help="the number of files converted in parallel (default: the number of CPUs)")
+    parser.add_argument("--force", "-f", action="store_true",
+                        help="convert files even if their PNG files are up to date "
+                             "(PNG files rendered with other options are always converted again)")
+    parser.add_argument("filearg", nargs="+", metavar="FILE",
+                        help="the FITS files to convert (files, directories or glob patterns)")
     args = parser.parse_args()
-    input_file_path = args.filearg[0]
 
-    output_file_path_prefix = os.path.splitext(input_file_path)[0]
+    # Files matched by several arguments are converted only once
+    input_file_path_list = list_input_files(args.filearg)
 
-    # READ AND SAVE DATA ######################################################
+    convert = functools.partial(convert_fits_file,
+                                scale=args.scale,
+                                interval=args.interval,
+                                percent=args.percent,
+                                bit_depth=args.bit_depth,
+                                force=args.force)
 
-    image_array_list = load_fits_file(input_file_path)
+    # READ AND SAVE DATA ######################################################
 
-    if len(image_array_list) > 1:
-        for image_index, image_array in enumerate(image_array_list):
-            save_to_png(image_array, "{}_{}.png".format(output_file_path_prefix, image_index))
-    else:
-        save_to_png(image_array_list[0], "{}.png".format(output_file_path_prefix))
+    num_converted_files = 0
+    num_skipped_files = 0
+    num_images = 0
+    num_bytes = 0
+
+    start_time = time.time()
+
+    def count_result(input_file_path, result):
+        nonlocal num_converted_files, num_skipped_files, num_images, num_bytes
+        if result is None:
+            num_skipped_files += 1
+        else:
+            num_converted_files += 1
+            num_images += result
+            num_bytes += os.path.getsize(input_file_path)
+
+    num_failed_files = run_batch(convert, input_file_path_list, args.jobs, on_result=count_result)
+
+    elapsed_time = time.time() - start_time
+
+    # PRINT A SUMMARY #########################################################
+
+    if len(input_file_path_list) > 1:
+        print("{} files converted ({} images, {:.1f} MB) in {:.1f} s: {:.1f} files/s, {:.1f} MB/s; "
+              "{} skipped (up to date), {} failed".format(num_converted_files,
+                                                          num_images,
+                                                          num_bytes / 1e6,
+                                                          elapsed_time,
+                                                          num_converted_files / max(elapsed_time, 1e-9),
+                                                          num_bytes / 1e6 / max(elapsed_time, 1e-9),
+                                                          num_skipped_files,
+                                                          num_failed_files))
+
+    if num_failed_files > 0:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Documentation: https://docs.python.org/3/library/sqlite3.html
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+
+from fitsviewer.core.index import HeaderIndex, get_default_index_path
+
+
+def print_text(result_list, keywords):
+    for result in result_list:
+        print("{}[{}] {}{}{}{}".format(result["file"],
+                                       result["hdu"],
+                                       result["type"],
+                                       " " + result["shape"] if result["shape"] else "",
+                                       " " + result["dtype"] if result["dtype"] else "",
+                                       "".join(" {}={}".format(keyword, result["header"][keyword])
+                                               for keyword in keywords if keyword in result["header"])))
+
+
+def main():
+
+    # PARSE OPTIONS ###########################################################
+
+    parser = argparse.ArgumentParser(description="Index the headers of the FITS files of directories "
+                                                 "in a SQLite database and search them")
+
+    parser.add_argument("--database", "-D", default=None, metavar="FILE",
+            help="the index database (default: {})".format(get_default_index_path()))
+
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    update_parser = subparsers.add_parser("update",
+            help="index the FITS files of directories (only new and modified files are read)")
+
+    update_parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), metavar="INTEGER",
+            help="the number of files read in parallel (default: the number of CPUs)")
+
+    update_parser.add_argument("dirarg", nargs="+", metavar="DIRECTORY",
+            help="the directories to index (with their subdirectories)")
+
+    search_parser = subparsers.add_parser("search",
+            help="print the HDUs whose header matches all the given expressions")
+
+    search_parser.add_argument("--keywords", "-k", default=None, metavar="STRING",
+            help="the comma separated list of keywords to print "
+                 "(the keywords of the expressions by default)")
+
+    search_parser.add_argument("--limit", "-n", type=int, default=None, metavar="INTEGER",
+            help="the maximum number of HDUs to print")
+
+    output_group = search_parser.add_mutually_exclusive_group()
+
+    output_group.add_argument("--json", action="store_true",
+            help="print the HDUs in JSON")
+
+    output_group.add_argument("--csv", action="store_true",
+            help="print the HDUs in CSV (one row per HDU, one column per keyword)")
+
+    search_parser.add_argument("exprarg", nargs="*", metavar="EXPRESSION",
+            help="KEYWORD OPERATOR VALUE expressions, e.g. \"OBJECT == M31\", \"EXPTIME > 30\" "
+                 "or \"DATE-OBS >= 2020-01-01\" (operators: == != < <= > >=; "
+                 "string values can contain the * and ? wildcards); all the HDUs are printed without expression")
+
+    args = parser.parse_args()
+
+    # UPDATE OR SEARCH THE INDEX ##############################################
+
+    try:
+        with HeaderIndex(args.database) as index:
+            if args.command == "update":
+                num_indexed, num_unchanged, num_removed, num_failed = index.update(args.dirarg, jobs=args.jobs)
+                print("{} files indexed, {} unchanged, {} removed, {} unreadable".format(num_indexed,
+                                                                                        num_unchanged,
+                                                                                        num_removed,
+                                                                                        num_failed))
+                return
+
+            keywords = None
+            if args.keywords is not None:
+                keywords = [keyword.strip().upper() for keyword in args.keywords.split(",") if keyword.strip()]
+
+            result_list = index.search(args.exprarg, keywords=keywords, limit=args.limit)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        sys.exit(1)
+
+    # PRINT THE MATCHING HDUS #################################################
+
+    if keywords is None:
+        keywords = list(dict.fromkeys(keyword for result in result_list for keyword in result["header"]))
+
+    if args.json:
+        print(json.dumps(result_list, indent=4, default=str))
+
+    elif args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["file", "hdu", "type", "shape", "dtype"] + keywords)
+        for result in result_list:
+            writer.writerow([result["file"], result["hdu"], result["type"], result["shape"], result["dtype"] or ""]
+                            + [result["header"].get(keyword, "") for keyword in keywords])
+
+    else:
+        print_text(result_list, keywords)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Documentation: https://fits.gsfc.nasa.gov/fits_standard.html
+
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+
+from fitsviewer.core.batch import list_input_files, run_batch
+from fitsviewer.core.header import get_header_values, get_hdu_type, get_hdu_shape, read_headers
+
+
+def get_file_info(input_file_path, hdu_index=None, keywords=None):
+    """
+    Return the list of the descriptions of the HDUs of the given FITS file
+    (of the HDU `hdu_index` only if it is not None), read from the headers
+    only (see fitsviewer.core.header).
+
+    Each description is a dictionary: the file path, the HDU index, its type,
+    its shape (NAXIS1, NAXIS2, ...), its BITPIX, its header cards and the
+    {keyword: value} dictionary of its header (restricted to `keywords` if
+    it is not None).
+    """
+    info_list = []
+
+    for _hdu_index, cards in read_headers(input_file_path, hdu_index):
+        all_values = get_header_values(cards)
+
+        values = all_values
+        if keywords is not None:
+            values = {keyword: all_values[keyword] for keyword in keywords if keyword in all_values}
+
+        hdu_type = get_hdu_type(all_values)
+
+        info_list.append({"file": input_file_path,
+                          "hdu": _hdu_index,
+                          "type": hdu_type,
+                          "shape": get_hdu_shape(all_values),
+                          "bitpix": all_values.get("ZBITPIX" if hdu_type == "compressed image" else "BITPIX"),
+                          "cards": cards,
+                          "header": values})
+
+    return info_list
+
+
+def format_shape(shape):
+    return "x".join(str(dim) for dim in shape)
+
+
+def print_text(info_list, keywords=None):
+    for info in info_list:
+        if keywords is None:
+            print("# HDU {} in {} ({}{}, BITPIX {}):".format(info["hdu"],
+                                                            info["file"],
+                                                            info["type"],
+                                                            " " + format_shape(info["shape"]) if info["shape"] else "",
+                                                            info["bitpix"]))
+            for card in info["cards"]:
+                print(card.rstrip())
+            print()
+        else:
+            print("{}[{}] {}".format(info["file"],
+                                     info["hdu"],
+                                     " ".join("{}={}".format(keyword, value) for keyword, value in info["header"].items())))
+
+
+def main():
+
+    # PARSE OPTIONS ###########################################################
+
+    parser = argparse.ArgumentParser(description="Print the headers of FITS files "
+                                                 "(only the header blocks are read)")
+
+    parser.add_argument("--keywords", "-k", default=None, metavar="STRING",
+            help="the comma separated list of keywords to print (all keywords by default)")
+
+    parser.add_argument("--hdu", type=int, default=None, metavar="INTEGER",
+            help="the index of the HDU to print (all HDUs by default)")
+
+    output_group = parser.add_mutually_exclusive_group()
+
+    output_group.add_argument("--json", action="store_true",
+            help="print the headers in JSON")
+
+    output_group.add_argument("--csv", action="store_true",
+            help="print the headers in CSV (one row per HDU, one column per keyword)")
+
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), metavar="INTEGER",
+            help="the number of files read in parallel (default: the number of CPUs)")
+
+    parser.add_argument("filearg", nargs="+", metavar="FILE",
+            help="the FITS files to read (files, directories or glob patterns)")
+
+    args = parser.parse_args()
+
+    keywords = None
+    if args.keywords is not None:
+        keywords = [keyword.strip().upper() for keyword in args.keywords.split(",") if keyword.strip()]
+
+    # Files matched by several arguments are read only once
+    input_file_path_list = list_input_files(args.filearg)
+
+    get_info = functools.partial(get_file_info, hdu_index=args.hdu, keywords=keywords)
+
+    # READ HEADERS ############################################################
+
+    info_list = []
+
+    def handle_result(input_file_path, file_info_list):
+        if args.json or args.csv:
+            info_list.extend(file_info_list)
+        else:
+            # Printed as soon as possible (in the order of the files)
+            print_text(file_info_list, keywords)
+
+    num_failed_files = run_batch(get_info, input_file_path_list, args.jobs, on_result=handle_result, ordered=True)
+
+    # PRINT HEADERS ###########################################################
+
+    if args.json:
+        json_list = [{key: value for key, value in info.items() if key != "cards"} for info in info_list]
+        print(json.dumps(json_list, indent=4, default=str))
+
+    elif args.csv:
+        if keywords is None:
+            # All the keywords of all the HDUs
+            keywords = list(dict.fromkeys(keyword for info in info_list for keyword in info["header"]))
+
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["file", "hdu", "type", "shape", "bitpix"] + keywords)
+        for info in info_list:
+            writer.writerow([info["file"], info["hdu"], info["type"], format_shape(info["shape"]), info["bitpix"]]
+                            + [info["header"].get(keyword, "") for keyword in keywords])
+
+    if num_failed_files > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
+
+import argparse
+import json
+import math
+import sys
+
+from fitsviewer.core.arrays import CHUNK_SIZE
+from fitsviewer.core.batch import run_batch
+from fitsviewer.core.hdu import open_fits, get_image_data
+from fitsviewer.core.stats import compute_statistics, DEFAULT_PERCENTILES
+
+
+def iter_image_hdus(hdu_list, hdu_index=None):
+    """
+    Iterate over the (hdu_index, hdu) pairs of the non empty image HDUs of
+    `hdu_list` (or only over the HDU `hdu_index` if it is not None).
+    """
+    for _hdu_index, hdu in enumerate(hdu_list):
+        if (hdu_index is not None) and (_hdu_index != hdu_index):
+            continue
+        if hdu.is_image and hdu.header.get('NAXIS', 0) > 0:
+            yield _hdu_index, hdu
+
+
+def compute_file_statistics(input_file_path, hdu_index=None, percentiles=DEFAULT_PERCENTILES, chunk_size=CHUNK_SIZE):
+    """
+    Return the list of the (hdu_index, Statistics) pairs of the image HDUs
+    of the given file (or only of the HDU `hdu_index` if it is not None).
+    """
+    hdu_list = open_fits(input_file_path)
+
+    try:
+        image_hdu_list = list(iter_image_hdus(hdu_list, hdu_index))
+
+        if (hdu_index is not None) and (len(image_hdu_list) == 0):
+            raise Exception("The HDU {} isn't a non empty image.".format(hdu_index))
+
+        return [(_hdu_index, compute_statistics(get_image_data(hdu), percentiles=percentiles, chunk_size=chunk_size))
+                for _hdu_index, hdu in image_hdu_list]
+    finally:
+        hdu_list.close()
+
+
+def get_json_value(value):
+    """
+    Return `value` or None if it is a non finite float: NaN and infinity
+    aren't valid JSON values (e.g. the mean of an image without any finite
+    pixel).
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def main():
+
+    # PARSE OPTIONS ###########################################################
+
+    parser = argparse.ArgumentParser(description="Compute the statistics of the images of FITS files "
+                                                 "(by blocks, with a bounded memory usage)")
+
+    parser.add_argument("--hdu", type=int, default=None, metavar="INTEGER",
+            help="the index of the HDU to process (all image HDUs by default)")
+
+    parser.add_argument("--percentiles", "-p", default=",".join(["{:g}".format(p) for p in DEFAULT_PERCENTILES]),
+            metavar="STRING",
+            help="the comma separated list of percentiles to compute (approximated)")
+
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, metavar="INTEGER",
+            help="the number of pixels read at once")
+
+    parser.add_argument("--json", action="store_true",
+            help="print the statistics in JSON")
+
+    parser.add_argument("filearg", nargs="+", metavar="FILE",
+            help="the FITS files to process")
+
+    args = parser.parse_args()
+
+    percentiles = [float(percent) for percent in args.percentiles.split(",") if percent.strip()]
+
+    # COMPUTE STATISTICS ######################################################
+
+    json_list = []
+
+    def print_statistics(input_file_path, stats_list):
+        for hdu_index, stats in stats_list:
+            if args.json:
+                json_dict = {"file": input_file_path, "hdu": hdu_index}
+                json_dict.update({key: get_json_value(value) for key, value in stats.as_dict().items()})
+                json_list.append(json_dict)
+            else:
+                print("{} [HDU{}]".format(input_file_path, hdu_index))
+                print(stats)
+                print()
+
+    # Files are processed one at a time (statistics are computed by blocks,
+    # with a bounded memory usage); errors are reported per file
+    num_errors = run_batch(compute_file_statistics,
+                           args.filearg,
+                           on_result=print_statistics,
+                           get_args=lambda input_file_path: (args.hdu, percentiles, args.chunksize))
+
+    if args.json:
+        print(json.dumps(json_list, indent=4, allow_nan=False))
+
+    if num_errors > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
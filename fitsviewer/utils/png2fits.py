@@ -4,45 +4,262 @@
 # Documentation: http://docs.astropy.org/en/stable/io/fits/index.html
 
 import argparse
-from astropy.io import fits
+import collections
+import concurrent.futures
+import itertools
 import os
+import sys
+import time
 
-import PIL.Image as pil_img # PIL.Image is a module not a class...
 import numpy as np
 
+from fitsviewer.core.arrays import get_range
+from fitsviewer.core.batch import list_input_files, run_batch
+from fitsviewer.core.hdu import BITPIX_TO_DTYPE
+from fitsviewer.core.header import BLOCK_SIZE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# The PIL modes whose pixels are read as is (other modes are converted to
+# 8-bit grayscale or RGB)
+NATIVE_MODES = ("L", "I", "F", "RGB", "RGBA")
+
+# The (BITPIX, BZERO) pairs of the integer FITS types, from the smallest one
+INTEGER_TYPES = ((8, 0), (16, 0), (16, 1 << 15), (32, 0), (32, 1 << 31), (64, 0))
+
+# The number of pixels converted at once by write_image_data (1 MiB of int32)
+WRITE_CHUNK_SIZE = 2**18
+
+# The number of images decoded in advance by each worker process when images
+# are stacked (they are kept in memory until they are written)
+STACK_PREFETCH = 2
+
 
 def load_image(input_file_path):
     """
-    Load the 'input_file_path' and return a 2D numpy array of the image it contains.
+    Load the 'input_file_path' and return a numpy array of the image it
+    contains (in the PIL order: the first row at the top), without loss:
+    a 2D array of the decoded dtype for grayscale images (uint8, uint16 for
+    16-bit PNG, int32 or float32) or a 3D (band, row, column) array for
+    color images (the alpha band is ignored).
     """
-    image_array = np.array(pil_img.open(input_file_path).convert('L'))
+    import PIL.Image as pil_img # PIL.Image is a module not a class...
+
+    with pil_img.open(input_file_path) as pil_image:
+        if pil_image.mode in ("1", "LA"):
+            pil_image = pil_image.convert('L')
+        elif (pil_image.mode not in NATIVE_MODES) and not pil_image.mode.startswith("I;16"):
+            # Palette, CMYK, YCbCr, ... images
+            pil_image = pil_image.convert('RGB')
+
+        image_array = np.asarray(pil_image)
+
+    if image_array.ndim == 3:
+        # One plane per band (this is a view: the pixels aren't copied)
+        image_array = np.moveaxis(image_array, 2, 0)[:3]
+
     return image_array
 
 
+def get_bitpix(image_array, minimal=True):
+    """
+    Return the (BITPIX, BZERO) pair of the FITS type used to write
+    `image_array`.
+
+    For integer images, this is the smallest type that can hold the values
+    of the image if `minimal` is True (e.g. BITPIX 8 for a 16-bit image whose
+    values are below 256), otherwise the smallest type that can hold all the
+    values of its dtype.  Unsigned types are written with the BZERO
+    convention.
+    """
+    dtype = image_array.dtype
+
+    if dtype.kind == 'f':
+        return (-32 if dtype.itemsize <= 4 else -64), 0
+
+    if minimal and image_array.size > 0:
+        min_val, max_val = get_range(image_array)
+    else:
+        min_val, max_val = np.iinfo(dtype).min, np.iinfo(dtype).max
+
+    for bitpix, bzero in INTEGER_TYPES:
+        if bitpix == 8:
+            low, high = 0, 255
+        else:
+            low = np.iinfo(BITPIX_TO_DTYPE[bitpix]).min + bzero
+            high = np.iinfo(BITPIX_TO_DTYPE[bitpix]).max + bzero
+        if low <= min_val and max_val <= high:
+            return bitpix, bzero
+
+    raise Exception("Unsupported image type: {}.".format(dtype))
+
+
+def get_fits_header(shape, bitpix, bzero=0):
+    """
+    Return the header of a primary HDU of the given shape (in the Numpy
+    order) and type.
+    """
+    from astropy.io import fits
+
+    cards = [("SIMPLE", True), ("BITPIX", bitpix), ("NAXIS", len(shape))]
+    cards += [("NAXIS{}".format(axis), dim) for axis, dim in enumerate(reversed(shape), 1)]
+    if bzero != 0:
+        cards += [("BSCALE", 1), ("BZERO", bzero)]
+
+    return fits.Header(cards)
+
+
+def write_image_data(fd, image_array, bitpix, bzero=0):
+    """
+    Write the pixels of the 2D or 3D (band, row, column) image `image_array`
+    to `fd` as FITS data of the given type (without padding).
+
+    Rows are converted (flipped, byte-swapped and offset by BZERO) by blocks
+    of WRITE_CHUNK_SIZE pixels: the image isn't copied as a whole.
+
+    Return the number of bytes written.
+    """
+    if bzero == 0:
+        fits_dtype = BITPIX_TO_DTYPE[bitpix].newbyteorder('>')
+    else:
+        # Unsigned values are written as signed ones: adding -BZERO (i.e.
+        # 2**(BITPIX-1)) is flipping the sign bit
+        fits_dtype = np.dtype('uint{}'.format(bitpix)).newbyteorder('>')
+        sign_bit = fits_dtype.type(1 << (bitpix - 1))
+
+    height, width = image_array.shape[-2:]
+    num_rows = max(1, WRITE_CHUNK_SIZE // max(width, 1))
+    num_bytes = 0
+
+    planes = image_array[np.newaxis] if image_array.ndim == 2 else image_array
+
+    for plane in planes:
+        # WARNING: with fits, the (0,0) point is at the BOTTOM left corner
+        #          whereas with pillow, the (0,0) point is at the TOP left corner
+        #          thus rows are written from the last one
+        for stop in range(height, 0, -num_rows):
+            chunk = np.ascontiguousarray(plane[max(stop - num_rows, 0):stop][::-1], dtype=fits_dtype)
+            if bzero != 0:
+                chunk ^= sign_bit
+            fd.write(chunk.data)
+            num_bytes += chunk.nbytes
+
+    return num_bytes
+
+
 def save_fits_file(image_array, output_file_path):
     """
-    image_array is the image and it should be a 2D numpy array with values in
-    the range [0,255].
+    Write the 2D or 3D (band, row, column) image `image_array` (in the PIL
+    order, see `load_image`) to the primary HDU of `output_file_path`
+    (overwritten if it exists), with the smallest BITPIX that can hold its
+    values.
     """
+    bitpix, bzero = get_bitpix(image_array)
+    header = get_fits_header(image_array.shape, bitpix, bzero)
+
+    with open(output_file_path, "wb") as fd:
+        fd.write(header.tostring().encode("ascii"))
+        num_bytes = write_image_data(fd, image_array, bitpix, bzero)
+        fd.write(bytes(-num_bytes % BLOCK_SIZE))
 
-    # FLIP THE IMAGE IN THE UP/DOWN DIRECTION #############
-    # WARNING: with fits, the (0,0) point is at the BOTTOM left corner
-    #          whereas with pillow, the (0,0) point is at the TOP left corner
-    #          thus the image should be converted
 
-    image_array = np.flipud(image_array)
+def convert_image_file(input_file_path, output_file_path=None):
+    """
+    Convert `input_file_path` to a FITS file (the input file with the .fits
+    extension by default).
+
+    Return the path of the written file.
+    """
+    if output_file_path is None:
+        output_file_path = os.path.splitext(input_file_path)[0] + ".fits"
 
-    # CREATE THE FITS STRUCTURE ###########################
+    save_fits_file(load_image(input_file_path), output_file_path)
 
-    hdu = fits.PrimaryHDU(image_array)
+    return output_file_path
 
-    # SAVE THE FITS FILE ##################################
 
-    # Save the FITS file (overwrite the file if it already exists)
+def iter_images(input_file_path_list, jobs=1):
+    """
+    Iterate over the (input_file_path, image_array) pairs of the given image
+    files, in order.
+
+    With `jobs` > 1, images are decoded in advance by `jobs` worker
+    processes (at most STACK_PREFETCH images per process are kept in memory).
+    Errors are raised with the path of the file.
+    """
+    if (jobs <= 1) or (len(input_file_path_list) <= 1):
+        for input_file_path in input_file_path_list:
+            try:
+                image_array = load_image(input_file_path)
+            except Exception as e:
+                raise Exception("{}: {}".format(input_file_path, e)) from e
+            yield input_file_path, image_array
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        input_file_paths = iter(input_file_path_list)
+        futures = collections.deque((input_file_path, executor.submit(load_image, input_file_path))
+                                    for input_file_path in itertools.islice(input_file_paths, jobs * STACK_PREFETCH))
+        try:
+            while futures:
+                input_file_path, future = futures.popleft()
+                try:
+                    image_array = future.result()
+                except Exception as e:
+                    raise Exception("{}: {}".format(input_file_path, e)) from e
+
+                for next_input_file_path in itertools.islice(input_file_paths, 1):
+                    futures.append((next_input_file_path, executor.submit(load_image, next_input_file_path)))
+
+                yield input_file_path, image_array
+        finally:
+            # Stop the decoding of the remaining images on errors
+            for input_file_path, future in futures:
+                future.cancel()
+
+
+def save_fits_cube(images, num_images, output_file_path):
+    """
+    Write the `num_images` images of the (input_file_path, image_array)
+    pairs `images` (see `iter_images`) to the 3D (or 4D for color images)
+    primary HDU of `output_file_path` (overwritten if it exists).
+
+    Images are written one at a time: the header (with the final NAXIS3) is
+    written first, then each image is appended, thus only one image is kept
+    in memory.  All images must have the shape and the dtype of the first
+    one (whose dtype gives the BITPIX of the cube).
+    """
+    fd = None
+
     try:
-        hdu.writeto(output_file_path, overwrite=True)
-    except TypeError:
-        hdu.writeto(output_file_path, clobber=True)
+        for input_file_path, image_array in images:
+            if fd is None:
+                shape, dtype = image_array.shape, image_array.dtype
+                bitpix, bzero = get_bitpix(image_array, minimal=False)
+                header = get_fits_header((num_images,) + shape, bitpix, bzero)
+
+                fd = open(output_file_path, "wb")
+                fd.write(header.tostring().encode("ascii"))
+                num_bytes = 0
+
+            elif (image_array.shape, image_array.dtype) != (shape, dtype):
+                raise Exception("{}: the image shape ({}, {}) differs from the first image "
+                                "({}, {}).".format(input_file_path, image_array.shape, image_array.dtype, shape, dtype))
+
+            num_bytes += write_image_data(fd, image_array, bitpix, bzero)
+
+        if fd is None:
+            raise Exception("No image to stack.")
+
+        fd.write(bytes(-num_bytes % BLOCK_SIZE))
+    except BaseException:
+        # Don't leave an incomplete file
+        if fd is not None:
+            fd.close()
+            os.remove(output_file_path)
+        raise
+
+    fd.close()
 
 
 def main():
@@ -51,17 +268,66 @@ def main():
 
     desc = "Convert PNG or JPEG files to FITS images"
     parser = argparse.ArgumentParser(description=desc)
-    parser.add_argument("filearg", nargs=1, metavar="FILE",
-                        help="the FITS file to convert")
+    parser.add_argument("--output", "-o", default=None, metavar="FILE",
+                        help="the output file when a single file is converted "
+                             "(default: the input file with the .fits extension)")
+    parser.add_argument("--stack", default=None, metavar="FILE",
+                        help="write all the images (of the same shape), in the order of the arguments, "
+                             "to the 3D FITS image FILE (one plane per image) instead of one FITS file per image")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), metavar="INTEGER",
+                        help="the number of files converted (or decoded for --stack) in parallel "
+                             "(default: the number of CPUs)")
+    parser.add_argument("filearg", nargs="+", metavar="FILE",
+                        help="the image files to convert (files, directories or glob patterns)")
     args = parser.parse_args()
-    input_file_path = args.filearg[0]
 
-    output_file_path = os.path.splitext(input_file_path)[0] + ".fits"
+    # Files matched by several arguments are converted only once
+    input_file_path_list = list_input_files(args.filearg, IMAGE_EXTENSIONS)
+
+    if (args.output is not None) and (args.stack is not None):
+        parser.error("--output and --stack can't be used together")
+
+    if (args.output is not None) and (len(input_file_path_list) > 1):
+        parser.error("--output can only be used with a single input file (use --stack to make a 3D FITS image)")
+
+    # STACK THE IMAGES ########################################################
+
+    if args.stack is not None:
+        try:
+            save_fits_cube(iter_images(input_file_path_list, args.jobs), len(input_file_path_list), args.stack)
+        except Exception as e:
+            print("Error: {}".format(e), file=sys.stderr)
+            sys.exit(1)
+        return
 
     # READ AND SAVE DATA ######################################################
 
-    image_array = load_image(input_file_path) # image_array is a 2D numpy array
-    save_fits_file(image_array, output_file_path)
+    num_converted_files = 0
+
+    start_time = time.time()
+
+    def count_result(input_file_path, output_file_path):
+        nonlocal num_converted_files
+        num_converted_files += 1
+
+    num_failed_files = run_batch(convert_image_file,
+                                 input_file_path_list,
+                                 args.jobs,
+                                 on_result=count_result,
+                                 get_args=lambda input_file_path: (args.output,))
+
+    elapsed_time = time.time() - start_time
+
+    # PRINT A SUMMARY #########################################################
+
+    if len(input_file_path_list) > 1:
+        print("{} files converted in {:.1f} s: {:.1f} files/s; {} failed".format(num_converted_files,
+                                                                               elapsed_time,
+                                                                               num_converted_files / max(elapsed_time, 1e-9),
+                                                                               num_failed_files))
+
+    if num_failed_files > 0:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -67,7 +67,7 @@ PACKAGES = find_packages()
 # The following list contains all dependencies that Python will try to
 # install with this project
 #INSTALL_REQUIRES = ['pyserial >= 2.6', 'docutils >= 0.3']
-INSTALL_REQUIRES = ['astropy', ' numpy', 'matplotlib', 'Pillow']
+INSTALL_REQUIRES = ['astropy', ' numpy', 'matplotlib >= 3.5', 'Pillow']
 
 
 # Entry point can be used to create plugins or to automatically generate
@@ -79,6 +79,12 @@ ENTRY_POINTS = {
   'console_scripts': [
       'fits2png = fitsviewer.utils.fits2png:main',
       'png2fits = fitsviewer.utils.png2fits:main',
+      'fitsstats = fitsviewer.utils.fitsstats:main',
+      'fitsindex = fitsviewer.utils.fitsindex:main',
+      'fitsinfo = fitsviewer.utils.fitsinfo:main',
+      'fits2gif = fitsviewer.utils.fits2gif:main',
+      'fits2mp4 = fitsviewer.utils.fits2gif:main_video',
+      'fitsviewer-nox = fitsviewer.gui.nox:main',
   ],
   'gui_scripts': [
       'fitsviewer = fitsviewer.gui.tk_matplotlib:main',
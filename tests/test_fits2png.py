@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Round-trip tests of fits2png (and png2fits): FITS images converted to PNG
+images are read back and compared to the FITS pixels.
+
+Run with: python -m pytest tests -v
+"""
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from fitsviewer.core.scaling import get_interval
+from fitsviewer.utils import fits2png
+from fitsviewer.utils import png2fits
+
+###############################################################################
+
+def make_int_image(shape=(64, 96), seed=0):
+    """Return a noisy int32 image whose range fits in 16 bits, with outliers."""
+    rng = np.random.default_rng(seed)
+    image_array = rng.normal(loc=1000., scale=50., size=shape).astype(np.int32)
+    image_array[0, :4] = (-500, 40000, 500, 60000)    # outside the zscale interval
+    return image_array
+
+
+def convert(tmp_path, image_array, **kwargs):
+    """Convert `image_array` with fits2png and return the PNG image (in the FITS order)."""
+    input_file_path = str(tmp_path / "image.fits")
+    fits.PrimaryHDU(image_array).writeto(input_file_path, overwrite=True)
+
+    assert fits2png.convert_fits_file(input_file_path, force=True, **kwargs) == 1
+
+    return png2fits.load_image(str(tmp_path / "image.png"))[::-1]
+
+
+@pytest.mark.parametrize("bit_depth", fits2png.BIT_DEPTHS)
+@pytest.mark.parametrize("interval", ["minmax", "zscale"])
+def test_round_trip(tmp_path, bit_depth, interval):
+    image_array = make_int_image()
+    vmin, vmax = get_interval(image_array, interval=interval)
+    max_level = 2**bit_depth - 1
+
+    png_array = convert(tmp_path, image_array, interval=interval, bit_depth=bit_depth)
+
+    assert png_array.dtype == (np.uint16 if bit_depth == 16 else np.uint8)
+    assert png_array.shape == image_array.shape
+
+    if (interval == "minmax") and (bit_depth == 16):
+        # Lossless: pixels are only shifted by the minimum
+        np.testing.assert_array_equal(png_array, image_array - image_array.min())
+    else:
+        # The interval is applied: values out of it are clipped
+        assert np.all(png_array[image_array <= vmin] == 0)
+        assert np.all(png_array[image_array >= vmax] == max_level)
+
+        expected_array = np.clip((image_array - vmin) / (vmax - vmin), 0., 1.) * max_level
+        assert np.max(np.abs(png_array - expected_array)) <= 1.
+
+
+@pytest.mark.parametrize("lossless", [False, True])
+def test_integral_interval_16_bits(tmp_path, lossless):
+    # Integral bounds (e.g. zscale or percentile bounds) with a range that
+    # fits in 16 bits: values above max_val are clipped in any case
+    image_array = make_int_image()
+    output_file_path = str(tmp_path / "image.png")
+    fits2png.save_to_png(image_array, output_file_path, 900, 1100, bit_depth=16, lossless=lossless)
+
+    png_array = png2fits.load_image(output_file_path)[::-1]
+
+    if lossless:
+        np.testing.assert_array_equal(png_array, np.clip(image_array - 900, 0, 200))
+    else:
+        assert png_array.max() == 65535
+        np.testing.assert_array_equal(png_array[image_array >= 1100], 65535)
+
+
+def test_png2fits_round_trip(tmp_path):
+    image_array = make_int_image()
+    png_array = convert(tmp_path, image_array, interval="minmax", bit_depth=16)
+
+    output_file_path = str(tmp_path / "image_2.fits")
+    png2fits.convert_image_file(str(tmp_path / "image.png"), output_file_path)
+
+    with fits.open(output_file_path) as hdu_list:
+        np.testing.assert_array_equal(hdu_list[0].data, image_array - image_array.min())
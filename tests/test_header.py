@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the header-only FITS parser (fitsviewer.core.header) against
+Astropy.
+
+Run with: python -m pytest tests -v
+"""
+
+import gzip
+import shutil
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from fitsviewer.core.header import read_headers, parse_card, get_header_values, get_hdu_type, get_hdu_shape
+
+###############################################################################
+
+@pytest.fixture
+def fits_file(tmp_path):
+    """A FITS file with an image, a binary table, an ASCII table and a compressed image."""
+    primary_hdu = fits.PrimaryHDU(np.zeros((3, 20, 30), dtype=np.int16))
+    header = primary_hdu.header
+    header["OBJECT"] = ("M31 'Andromeda'", "a string with quotes")
+    header["EXPTIME"] = (1.5e-3, "a float")
+    header["NCOMBINE"] = 12
+    header["FLAG"] = False
+    header["LONGSTR"] = "x" * 100 + " end"
+    header["HIERARCH ESO DET CHIP TEMP"] = -120.5
+    header["COMMENT"] = "a comment"
+    header["HISTORY"] = "an history line"
+
+    table_hdu = fits.BinTableHDU.from_columns([fits.Column(name="ENERGY", format="E", array=np.arange(7.)),
+                                               fits.Column(name="NAME", format="5A", array=["a"] * 7)])
+    table_hdu.header["EXTNAME"] = "EVENTS"
+
+    ascii_hdu = fits.TableHDU.from_columns([fits.Column(name="ID", format="I5", array=np.arange(4))])
+
+    compressed_hdu = fits.CompImageHDU(np.ones((40, 50), dtype=np.float32))
+
+    file_path = str(tmp_path / "file.fits")
+    fits.HDUList([primary_hdu, table_hdu, ascii_hdu, compressed_hdu]).writeto(file_path)
+    return file_path
+
+
+def get_astropy_values(header):
+    """Return the {keyword: value} dictionary of the non commentary cards of an Astropy header."""
+    return {card.keyword: card.value for card in header.cards if card.keyword not in ("COMMENT", "HISTORY", "")}
+
+
+def check_headers(file_path, expected_file_path):
+    headers = read_headers(file_path)
+
+    with fits.open(expected_file_path, disable_image_compression=True) as hdu_list:
+        assert [hdu_index for hdu_index, cards in headers] == list(range(len(hdu_list)))
+
+        for (hdu_index, cards), hdu in zip(headers, hdu_list):
+            values = get_header_values(cards)
+            expected_values = get_astropy_values(hdu.header)
+
+            assert set(values) == set(expected_values)
+            for keyword, expected_value in expected_values.items():
+                assert values[keyword] == expected_value, keyword
+
+    return headers
+
+###############################################################################
+
+def test_read_headers(fits_file):
+    headers = check_headers(fits_file, fits_file)
+
+    types = [get_hdu_type(get_header_values(cards)) for hdu_index, cards in headers]
+    assert types == ["image", "binary table", "ascii table", "compressed image"]
+
+    shapes = [get_hdu_shape(get_header_values(cards)) for hdu_index, cards in headers]
+    assert shapes[0] == [30, 20, 3]
+    assert shapes[3] == [50, 40]
+
+
+def test_read_gzip_headers(fits_file, tmp_path):
+    gzip_file_path = str(tmp_path / "file.fits.gz")
+    with open(fits_file, "rb") as input_fd, gzip.open(gzip_file_path, "wb") as output_fd:
+        shutil.copyfileobj(input_fd, output_fd)
+
+    check_headers(gzip_file_path, fits_file)
+
+
+def test_read_one_header(fits_file):
+    headers = read_headers(fits_file, hdu_index=1)
+
+    assert [hdu_index for hdu_index, cards in headers] == [1]
+    assert get_header_values(headers[0][1])["EXTNAME"] == "EVENTS"
+
+
+def test_parse_card():
+    for card in fits.Header([("BITPIX", -32, "bits"),
+                             ("DATE-OBS", "2020-01-01", ""),
+                             ("QUOTE", "it's", ""),
+                             ("EMPTY", "", ""),
+                             ("CPLX", 1 + 2j, "")]).cards:
+        keyword, value, comment = parse_card(card.image)
+
+        assert keyword == card.keyword
+        assert value == card.value
+        assert comment == card.comment
+
+    # The text of commentary cards is returned as their comment
+    card = fits.Card("COMMENT", "some text")
+    assert parse_card(card.image) == ("COMMENT", None, card.value)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the streaming statistics (fitsviewer.core.stats) and histograms
+(fitsviewer.core.histogram) against Numpy.
+
+Run with: python -m pytest tests -v
+"""
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from fitsviewer.core.hdu import open_fits, get_image_data
+from fitsviewer.core.histogram import compute_histogram
+from fitsviewer.core.stats import compute_statistics, PERCENTILE_BINS
+
+# Small blocks: the statistics of many blocks are merged
+CHUNK_SIZE = 1000
+
+###############################################################################
+
+def make_float_image(shape=(300, 200), seed=0):
+    """Return a float32 image with NaN and infinite values."""
+    rng = np.random.default_rng(seed)
+    image_array = rng.normal(loc=1e4, scale=30., size=shape).astype(np.float32)
+    image_array[5, :10] = np.nan
+    image_array[7, :3] = np.inf
+    image_array[9, :2] = -np.inf
+    return image_array
+
+
+def check_statistics(stats, values):
+    """Compare `stats` to the statistics of the finite `values` computed by Numpy."""
+    values = values.astype(np.float64)
+
+    assert stats.num_values == values.size
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.var == pytest.approx(values.var(), rel=1e-9)
+
+    # Percentiles are approximated within a bin of the histogram
+    tolerance = 2. * (values.max() - values.min()) / PERCENTILE_BINS
+    for percent, value in stats.percentiles.items():
+        assert value == pytest.approx(np.percentile(values, percent), abs=max(tolerance, 1.))
+
+
+def test_float_statistics():
+    image_array = make_float_image()
+    stats = compute_statistics(image_array, chunk_size=CHUNK_SIZE)
+
+    assert stats.num_nan == 10
+    assert stats.num_inf == 5
+    check_statistics(stats, image_array[np.isfinite(image_array)])
+
+
+def test_int_statistics():
+    image_array = np.random.default_rng(1).integers(-1000, 1000, size=(250, 120), dtype=np.int16)
+    stats = compute_statistics(image_array, chunk_size=CHUNK_SIZE)
+
+    assert (stats.num_nan, stats.num_inf) == (0, 0)
+    check_statistics(stats, image_array.ravel())
+
+
+def test_scaled_file_statistics(tmp_path):
+    # Scaled integers are read by blocks through hdu.section
+    file_path = str(tmp_path / "image.fits")
+    image_array = np.random.default_rng(2).normal(loc=1e4, scale=30., size=(100, 100))
+    hdu = fits.PrimaryHDU(image_array)
+    hdu.scale('int16', bscale=0.5, bzero=1e4)
+    hdu.writeto(file_path)
+
+    with fits.open(file_path) as hdu_list:
+        expected_array = hdu_list[0].data.copy()
+
+    hdu_list = open_fits(file_path)
+    try:
+        stats = compute_statistics(get_image_data(hdu_list[0]), chunk_size=CHUNK_SIZE)
+    finally:
+        hdu_list.close()
+
+    check_statistics(stats, expected_array[np.isfinite(expected_array)])
+
+
+def test_empty_statistics():
+    stats = compute_statistics(np.full((10, 10), np.nan, dtype=np.float32))
+
+    assert stats.num_values == 0
+    assert stats.num_nan == 100
+    assert np.isnan(stats.mean)
+
+###############################################################################
+
+def test_int_histogram():
+    image_array = np.random.default_rng(3).integers(-50, 150, size=(200, 100), dtype=np.int32)
+    counts, bin_edges = compute_histogram(image_array, num_bins=512)
+
+    # One bin per value, centered on the value
+    values, expected_counts = np.unique(image_array, return_counts=True)
+    np.testing.assert_array_equal(bin_edges[:-1] + 0.5, np.arange(values.min(), values.max() + 1))
+    np.testing.assert_array_equal(counts[values - values.min()], expected_counts)
+    assert counts.sum() == image_array.size
+
+
+def test_int_histogram_bounded_bins():
+    image_array = np.random.default_rng(4).integers(0, 100000, size=(200, 100), dtype=np.int32)
+    counts, bin_edges = compute_histogram(image_array, num_bins=256)
+
+    assert len(counts) <= 256
+    np.testing.assert_array_equal(counts, np.histogram(image_array, bins=bin_edges)[0])
+
+
+def test_float_histogram():
+    image_array = make_float_image()
+    counts, bin_edges = compute_histogram(image_array, num_bins=100)
+
+    finite_values = image_array[np.isfinite(image_array)]
+    expected_counts, expected_edges = np.histogram(finite_values, bins=100)
+
+    assert len(counts) == 100
+    assert counts.sum() == finite_values.size
+    np.testing.assert_allclose(bin_edges, expected_edges, rtol=1e-6)
+    # Values on the edges of bins may fall on either side (float32 rounding)
+    assert np.abs(counts - expected_counts).sum() <= 2
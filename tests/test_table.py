@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the sorting and filtering of table rows (fitsviewer.core.table)
+against Numpy.
+
+Run with: python -m pytest tests -v
+"""
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+
+from fitsviewer.core import table
+from fitsviewer.core.hdu import open_fits
+from fitsviewer.core.table import TableData, parse_filter
+
+NUM_ROWS = 1000
+
+###############################################################################
+
+@pytest.fixture(params=["memmap", "astropy"])
+def table_data(request, tmp_path, monkeypatch):
+    """
+    The TableData of a binary table read from the memory-mapped file or
+    through Astropy, with its expected columns.
+    """
+    # Small chunks: filters are computed on several chunks of rows
+    monkeypatch.setattr(table, "ROW_CHUNK_SIZE", 64)
+
+    rng = np.random.default_rng(0)
+    columns = {
+            "ENERGY": rng.normal(100., 30., NUM_ROWS).astype(np.float32),
+            "COUNT": rng.integers(0, 50, NUM_ROWS).astype(np.int32),
+            "UCOUNT": rng.integers(0, 2**32, NUM_ROWS, dtype=np.uint64).astype(np.uint32),
+            "FLAG": rng.random(NUM_ROWS) > 0.5,
+            "NAME": np.array(["src{}".format(index % 17) for index in range(NUM_ROWS)])
+        }
+
+    hdu = fits.BinTableHDU.from_columns([fits.Column(name="ENERGY", format="E", array=columns["ENERGY"]),
+                                         fits.Column(name="COUNT", format="J", array=columns["COUNT"]),
+                                         fits.Column(name="UCOUNT", format="J", bzero=2**31, array=columns["UCOUNT"]),
+                                         fits.Column(name="FLAG", format="L", array=columns["FLAG"]),
+                                         fits.Column(name="NAME", format="8A", array=columns["NAME"])])
+    file_path = str(tmp_path / "table.fits")
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(file_path)
+
+    hdu_list = open_fits(file_path)
+    yield TableData(hdu_list[1], file_path if request.param == "memmap" else None), columns
+    hdu_list.close()
+
+###############################################################################
+
+@pytest.mark.parametrize("column_name", ["ENERGY", "COUNT", "UCOUNT", "NAME"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_sort(table_data, column_name, descending):
+    table_data, columns = table_data
+    values = columns[column_name]
+
+    order = table_data.get_order(sort_column=column_name, descending=descending)
+
+    sorted_values = values[order]
+    if descending:
+        sorted_values = sorted_values[::-1]
+
+    assert sorted(order) == list(range(NUM_ROWS))
+    assert np.all(sorted_values[:-1] <= sorted_values[1:])
+
+
+@pytest.mark.parametrize("expression, column_name, function, value", [
+        ("ENERGY > 100", "ENERGY", np.greater, 100.),
+        ("COUNT == 7", "COUNT", np.equal, 7),
+        ("UCOUNT <= 3000000000", "UCOUNT", np.less_equal, 3000000000),
+        ("FLAG == T", "FLAG", np.equal, True),
+        ("NAME != 'src3'", "NAME", np.not_equal, "src3"),
+    ])
+def test_filter(table_data, expression, column_name, function, value):
+    table_data, columns = table_data
+
+    order = table_data.get_order(filter_expression=expression)
+
+    np.testing.assert_array_equal(order, np.flatnonzero(function(columns[column_name], value)))
+
+
+def test_sort_and_filter(table_data):
+    table_data, columns = table_data
+
+    order = table_data.get_order(sort_column="ENERGY", descending=True, filter_expression="COUNT < 10")
+
+    expected_rows = np.flatnonzero(columns["COUNT"] < 10)
+    expected_order = expected_rows[np.argsort(-columns["ENERGY"][expected_rows], kind='stable')]
+    np.testing.assert_array_equal(columns["ENERGY"][order], columns["ENERGY"][expected_order])
+
+
+def test_get_rows(table_data):
+    table_data, columns = table_data
+    table_data.order = table_data.get_order(sort_column="COUNT")
+
+    rows = table_data.get_rows(0, 5)
+
+    assert [row_number for row_number, cells in rows] == list(table_data.order[:5])
+    for row_number, cells in rows:
+        assert cells[table_data.column_names.index("NAME")] == columns["NAME"][row_number]
+        assert int(cells[table_data.column_names.index("UCOUNT")]) == columns["UCOUNT"][row_number]
+
+
+def test_parse_filter():
+    assert parse_filter("ENERGY >= 1.5") == ("ENERGY", ">=", "1.5")
+    assert parse_filter("NAME == 'a b'") == ("NAME", "==", "a b")
+
+    with pytest.raises(ValueError):
+        parse_filter("ENERGY")